@@ -2,23 +2,38 @@
 """
 Servidor de inferencia con vLLM + FastAPI - Versión PRODUCCIÓN
 Con control de concurrencia, backpressure y pooling de recursos
+ENGINE_BACKEND=mock permite correrlo sin GPU ni vLLM (benchmarks)
+
+Se ejecuta desde la raíz del proyecto (usa el paquete compartido common/):
+    python -m backend.inference_server
 """
 import os
 import logging
 import asyncio
+import random
+import re
+import string
 import time
 import threading
+import zlib
+from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Literal, Optional, Tuple
+import yaml
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from vllm.engine.arg_utils import AsyncEngineArgs
-from vllm.engine.async_llm_engine import AsyncLLMEngine
-from vllm.sampling_params import SamplingParams
 import uvicorn
 
+from common.log_pipeline import SAMPLED, setup_logging, setup_span_log
+from common.tracing import TRACE_HEADER, span_record
+
 # === CONFIGURACIÓN ===
+ENGINE_BACKEND = os.getenv("ENGINE_BACKEND", "vllm")  # vllm | mock
 MODEL_NAME = os.getenv("MODEL_NAME", "Qwen/Qwen2-7B-Instruct-AWQ")#"Qwen/Qwen2-7B-Instruc"
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8000))
@@ -26,46 +41,354 @@ MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", 32))
 QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", 30.0))
 MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", 60.0))
 KEEP_ALIVE_TIMEOUT = int(os.getenv("KEEP_ALIVE_TIMEOUT", 120))
+MAX_MODEL_LEN = int(os.getenv("MAX_MODEL_LEN", 4096))
+MIN_GENERATION_TOKENS = int(os.getenv("MIN_GENERATION_TOKENS", 64))
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", 2))
+WARMUP_MAX_TOKENS = int(os.getenv("WARMUP_MAX_TOKENS", 16))
+# Motor mock (CPU): tiempo al primer token, tokens/s por secuencia y secuencias simultáneas
+MOCK_TTFT = float(os.getenv("MOCK_TTFT", 0.3))
+MOCK_TOKENS_PER_SECOND = float(os.getenv("MOCK_TOKENS_PER_SECOND", 30.0))
+MOCK_MAX_CONCURRENCY = int(os.getenv("MOCK_MAX_CONCURRENCY", MAX_CONCURRENT_REQUESTS))
+MOCK_OUTPUT_TOKENS = int(os.getenv("MOCK_OUTPUT_TOKENS", 120))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text | json
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))  # fracción de líneas INFO por solicitud
+PROMPTS_FILE = Path(os.getenv(
+    "PROMPTS_FILE",
+    Path(__file__).parent.parent / "frontend" / "bot" / "telegram" / "prompts.yaml"
+))
+# Spans por solicitud (JSON por línea) para unir con los del bot; vacío = desactivado
+SPAN_LOG = os.getenv("SPAN_LOG", str(Path(__file__).parent / "logs" / "spans.jsonl"))
 
 # === LOGGING ===
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Mismo pipeline que el bot (common/log_pipeline.py): el event loop solo
+# encola y un hilo QueueListener escribe en consola. Las líneas por solicitud
+# se marcan con extra=SAMPLED y se pueden muestrear.
+log_listener = setup_logging(
+    logging.INFO,
+    handlers=[logging.StreamHandler()],
+    json_format=LOG_FORMAT == "json",
+    sample_rate=LOG_SAMPLE_RATE,
+    text_format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger("vllm-server")
 
+# === TRAZAS ===
+# El bot envía X-Trace-Id; los spans van a un archivo propio, también fuera del event loop
+current_trace: ContextVar[str] = ContextVar("trace_id", default="")
+span_logger = logging.getLogger("vllm-server.spans")
+span_logger.propagate = False
+if SPAN_LOG:
+    Path(SPAN_LOG).parent.mkdir(parents=True, exist_ok=True)
+    span_listener = setup_span_log(Path(SPAN_LOG), "vllm-server.spans")
+
+def emit_span(name: str, start: float, duration_ms: float, **attrs):
+    """Span del servidor (p=inferencia, formato de common/tracing.py); sin traza no registra nada"""
+    trace_id = current_trace.get()
+    if not SPAN_LOG or not trace_id:
+        return
+    span_logger.info(span_record(trace_id, "inferencia", name, start, duration_ms, **attrs))
+
 # === CONTROL DE CONCURRENCIA ===
 semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 request_queue = asyncio.Queue(maxsize=MAX_CONCURRENT_REQUESTS * 2)
 
-# === INICIALIZAR vLLM ASÍNCRONO ===
+# === BACKENDS DEL MOTOR ===
+class EngineBackend(ABC):
+    """
+    Contrato mínimo del motor que usa el servidor (el de AsyncLLMEngine):
+    generate() produce salidas parciales con .outputs[0].text / .token_ids
+    """
+    name = "base"
+
+    @abstractmethod
+    async def get_tokenizer(self):
+        ...
+
+    @abstractmethod
+    def sampling_params(self, **kwargs):
+        ...
+
+    @abstractmethod
+    def generate(self, prompt: dict, sampling_params, request_id: str):
+        ...
+
+    async def shutdown(self):
+        pass
+
+
+class VLLMBackend(EngineBackend):
+    """Motor real: AsyncLLMEngine de vLLM sobre GPU"""
+    name = "vllm"
+
+    def __init__(self):
+        from vllm.engine.arg_utils import AsyncEngineArgs
+        from vllm.engine.async_llm_engine import AsyncLLMEngine
+        from vllm.sampling_params import SamplingParams
+
+        self._sampling_params_cls = SamplingParams
+
+        # Configuración optimizada para producción
+        engine_args = AsyncEngineArgs(
+            model=MODEL_NAME,
+            quantization="awq",          # ← Obligatorio para AWQ( si no es GPTQ)
+            dtype="float16",              # GPTQ-Int4 usa float16 para pesos no cuantizados
+            trust_remote_code=True,       # ← Obligatorio para Qwen
+            gpu_memory_utilization=0.85,  # Deja ~2.5 GB libres en A4000 (16 GB)
+            max_model_len=MAX_MODEL_LEN,  # 4096 por defecto, o 8192 si necesitas más
+            enforce_eager=True,           # recomendado para GPUs de 16 GB
+            enable_prefix_caching=True,
+            max_num_seqs=MAX_CONCURRENT_REQUESTS,
+            max_num_batched_tokens=4096,  # o 8192 si ajustas memoria
+            tensor_parallel_size=1
+            )
+        self.engine = AsyncLLMEngine.from_engine_args(engine_args)
+
+    async def get_tokenizer(self):
+        return await self.engine.get_tokenizer()
+
+    def sampling_params(self, **kwargs):
+        return self._sampling_params_cls(**kwargs)
+
+    def generate(self, prompt: dict, sampling_params, request_id: str):
+        return self.engine.generate(prompt, sampling_params, request_id=request_id)
+
+    async def shutdown(self):
+        await self.engine.shutdown()
+
+
+class MockTokenizer:
+    """Tokenizador determinista aproximado (~4 caracteres por token)"""
+    PIECE_RE = re.compile(r"\w{1,4}|\s+|[^\w\s]")
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        return [zlib.crc32(piece.encode("utf-8")) % 50000 for piece in self.PIECE_RE.findall(text)]
+
+
+class MockBackend(EngineBackend):
+    """
+    Motor determinista en CPU para benchmarks sin GPU: respeta un límite de
+    secuencias simultáneas, espera MOCK_TTFT y emite MOCK_TOKENS_PER_SECOND.
+    La misma entrada produce siempre la misma salida.
+    """
+    name = "mock"
+    WORDS = (
+        "la", "universidad", "ofrece", "carreras", "de", "grado", "en", "física",
+        "becas", "inscripción", "exactas", "información", "consultá", "sede", "central",
+    )
+
+    def __init__(self):
+        if MOCK_TOKENS_PER_SECOND <= 0:
+            raise ValueError(f"MOCK_TOKENS_PER_SECOND debe ser mayor a 0 (es {MOCK_TOKENS_PER_SECOND})")
+        if MOCK_MAX_CONCURRENCY < 1:
+            raise ValueError(f"MOCK_MAX_CONCURRENCY debe ser al menos 1 (es {MOCK_MAX_CONCURRENCY})")
+        self.tokenizer = MockTokenizer()
+        self.slots = asyncio.Semaphore(MOCK_MAX_CONCURRENCY)
+
+    async def get_tokenizer(self):
+        return self.tokenizer
+
+    def sampling_params(self, **kwargs):
+        return SimpleNamespace(**kwargs)
+
+    async def generate(self, prompt: dict, sampling_params, request_id: str):
+        prompt_ids = prompt["prompt_token_ids"]
+        rng = random.Random(zlib.crc32(str(prompt_ids).encode()))
+        n_tokens = min(sampling_params.max_tokens, MOCK_OUTPUT_TOKENS)
+
+        async with self.slots:
+            await asyncio.sleep(MOCK_TTFT)
+            words, token_ids = [], []
+            for i in range(n_tokens):
+                if i:
+                    await asyncio.sleep(1 / MOCK_TOKENS_PER_SECOND)
+                words.append(rng.choice(self.WORDS))
+                token_ids.append(rng.randrange(50000))
+                yield SimpleNamespace(
+                    request_id=request_id,
+                    outputs=[SimpleNamespace(text=" ".join(words), token_ids=list(token_ids))]
+                )
+
+
+ENGINE_BACKENDS = {"vllm": VLLMBackend, "mock": MockBackend}
+
+# === PLANTILLAS PRE-TOKENIZADAS ===
+class PromptTemplate:
+    """
+    Plantilla de prompts.yaml con sus segmentos estáticos tokenizados una sola vez.
+    En cada solicitud solo se tokenizan las variables ({context}, {msg}, ...).
+    """
+    def __init__(self, name: str, text: str, tokenizer):
+        self.name = name
+        self.text = text
+        self.segments = []  # [(token_ids_literal, nombre_variable | None)]
+        self.fields = set()
+
+        for literal, field, _, _ in string.Formatter().parse(text):
+            literal_ids = tokenizer.encode(literal, add_special_tokens=False) if literal else []
+            self.segments.append((literal_ids, field))
+            if field:
+                self.fields.add(field)
+
+        self.static_tokens = sum(len(ids) for ids, _ in self.segments)
+
+    def render_parts(self, variables: Dict[str, str], tokenizer) -> List[Tuple[List[int], Optional[str]]]:
+        """
+        Tokeniza solo las variables y devuelve las partes del prompt final
+        como [(token_ids, nombre_variable | None)] (CPU: llamar fuera del event loop)
+        """
+        missing = self.fields - variables.keys()
+        if missing:
+            raise KeyError(f"Faltan variables para la plantilla '{self.name}': {sorted(missing)}")
+
+        parts = []
+        for literal_ids, field in self.segments:
+            parts.append((literal_ids, None))
+            if field:
+                parts.append((tokenizer.encode(str(variables[field]), add_special_tokens=False), field))
+        return parts
+
+
+def load_templates(path: Path, tokenizer) -> Dict[str, PromptTemplate]:
+    """Carga las plantillas 'llm' de prompts.yaml y pre-tokeniza sus partes fijas"""
+    if not path.exists():
+        logger.warning(f"⚠️ Archivo de prompts no encontrado ({path}), /generate_template deshabilitado")
+        return {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        prompts = yaml.safe_load(f) or {}
+
+    return {
+        name: PromptTemplate(name, text, tokenizer)
+        for name, text in prompts.get("llm", {}).items()
+    }
+
+# === CONTROL DE LONGITUD DEL PROMPT ===
+# Variables de plantilla que se pueden recortar por el medio (bloques de contexto).
+# El prompt crudo de /generate no: cortarle el medio se lleva instrucciones o la pregunta
+TRUNCATABLE_FIELDS = ("context", "careers_list")
+
+class PromptTooLongError(Exception):
+    """El prompt no entra en max_model_len con los max_tokens pedidos"""
+    def __init__(self, prompt_tokens: int, max_tokens: int):
+        self.prompt_tokens = prompt_tokens
+        self.max_tokens = max_tokens
+        super().__init__(
+            f"Prompt de {prompt_tokens} tokens + max_tokens={max_tokens} excede max_model_len={MAX_MODEL_LEN}"
+        )
+
+
+def _trim_middle(token_ids: List[int], excess: int) -> List[int]:
+    """Elimina 'excess' tokens del medio conservando el inicio y el final"""
+    keep = len(token_ids) - excess
+    head = keep // 2
+    tail = keep - head
+    return token_ids[:head] + (token_ids[-tail:] if tail else [])
+
+
+def fit_prompt(parts: List[Tuple[List[int], Optional[str]]], max_tokens: int, policy: str) -> Tuple[List[int], int, int]:
+    """
+    Ajusta prompt + max_tokens a MAX_MODEL_LEN según la política pedida:
+    - "error": no modifica nada, falla si no entra
+    - "max_tokens": reduce max_tokens a lo que queda libre (mínimo MIN_GENERATION_TOKENS)
+    - "middle": recorta el medio del bloque de contexto; sin bloque de contexto
+      (prompt crudo de /generate) se comporta como "max_tokens"
+    Retorna (prompt_ids, max_tokens, tokens_recortados) o lanza PromptTooLongError.
+    """
+    prompt_tokens = sum(len(ids) for ids, _ in parts)
+    excess = prompt_tokens + max_tokens - MAX_MODEL_LEN
+    candidates = [i for i, (ids, field) in enumerate(parts) if field in TRUNCATABLE_FIELDS]
+    if policy == "middle" and not candidates:
+        policy = "max_tokens"
+
+    if excess > 0:
+        if policy == "max_tokens" and MAX_MODEL_LEN - prompt_tokens >= MIN_GENERATION_TOKENS:
+            max_tokens = MAX_MODEL_LEN - prompt_tokens
+        elif policy == "middle":
+            target = max(candidates, key=lambda i: len(parts[i][0]))
+            if len(parts[target][0]) <= excess:
+                raise PromptTooLongError(prompt_tokens, max_tokens)
+            parts = list(parts)
+            parts[target] = (_trim_middle(parts[target][0], excess), parts[target][1])
+        else:
+            raise PromptTooLongError(prompt_tokens, max_tokens)
+
+    prompt_ids = [token_id for ids, _ in parts for token_id in ids]
+    return prompt_ids, max_tokens, max(prompt_tokens - len(prompt_ids), 0)
+
+# === WARMUP DEL MOTOR ===
+async def warmup_engine(app: FastAPI):
+    """
+    Genera sobre el prefijo fijo de cada plantilla antes de aceptar tráfico:
+    calienta kernels CUDA / allocator y deja los prefijos en el prefix cache.
+    """
+    start_time = time.time()
+    logger.info(f"🔥 Warmup iniciado ({len(app.state.templates)} plantillas, {WARMUP_ROUNDS} rondas)")
+
+    sampling_params = app.state.engine.sampling_params(temperature=0.0, max_tokens=WARMUP_MAX_TOKENS)
+
+    async def run_one(name: str, prompt_ids: List[int], round_idx: int):
+        async for _ in app.state.engine.generate(
+            {"prompt_token_ids": prompt_ids},
+            sampling_params,
+            request_id=f"warmup_{name}_{round_idx}"
+        ):
+            pass
+
+    try:
+        prompts = {}
+        for template in app.state.templates.values():
+            # Variables vacías: el prompt queda reducido a los segmentos fijos
+            parts = template.render_parts({field: "" for field in template.fields}, app.state.tokenizer)
+            prompts[template.name] = [token_id for ids, _ in parts for token_id in ids]
+        if not prompts:
+            prompts["default"] = app.state.tokenizer.encode("Hola")
+
+        for round_idx in range(WARMUP_ROUNDS):
+            round_start = time.time()
+            # Todas las plantillas en paralelo para ejercitar también el batching
+            await asyncio.wait_for(
+                asyncio.gather(*(run_one(name, ids, round_idx) for name, ids in prompts.items())),
+                MODEL_TIMEOUT
+            )
+            logger.info(f"🔥 Warmup ronda {round_idx + 1}/{WARMUP_ROUNDS} en {time.time() - round_start:.2f}s")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"⚠️ Warmup incompleto, se habilita el tráfico igualmente: {e}")
+
+    app.state.readiness = "ready"
+    logger.info(f"✅ Warmup finalizado en {time.time() - start_time:.2f}s")
+
+# === INICIALIZAR MOTOR ASÍNCRONO ===
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manejar el ciclo de vida de la aplicación"""
-    logger.info("🚀 Inicializando vLLM asíncrono...")
-    
-    # Configuración optimizada para producción
-    engine_args = AsyncEngineArgs(
-        model=MODEL_NAME,
-        quantization="awq",          # ← Obligatorio para AWQ( si no es GPTQ)
-        dtype="float16",              # GPTQ-Int4 usa float16 para pesos no cuantizados
-        trust_remote_code=True,       # ← Obligatorio para Qwen
-        gpu_memory_utilization=0.85,  # Deja ~2.5 GB libres en A4000 (16 GB)
-        max_model_len=4096,           # o 8192 si necesitas más
-        enforce_eager=True,           # recomendado para GPUs de 16 GB
-        enable_prefix_caching=True,
-        max_num_seqs=MAX_CONCURRENT_REQUESTS,
-        max_num_batched_tokens=4096,  # o 8192 si ajustas memoria
-        tensor_parallel_size=1
-        )
-    
-    app.state.engine = AsyncLLMEngine.from_engine_args(engine_args)
-    logger.info("✅ vLLM inicializado correctamente")
+    logger.info(f"🚀 Inicializando motor '{ENGINE_BACKEND}'...")
     
+    app.state.engine = ENGINE_BACKENDS[ENGINE_BACKEND]()
+    logger.info(f"✅ Motor '{app.state.engine.name}' inicializado correctamente")
+
+    # Tokenizador cacheado + plantillas pre-tokenizadas
+    app.state.tokenizer = await app.state.engine.get_tokenizer()
+    app.state.templates = await asyncio.to_thread(load_templates, PROMPTS_FILE, app.state.tokenizer)
+    for template in app.state.templates.values():
+        logger.info(f"📄 Plantilla '{template.name}' pre-tokenizada ({template.static_tokens} tokens fijos)")
+
+    # Readiness: "warming" hasta que termine el warmup, luego "ready"
+    app.state.warmup_task = None
+    if WARMUP_ENABLED:
+        app.state.readiness = "warming"
+        app.state.warmup_task = asyncio.create_task(warmup_engine(app))
+    else:
+        app.state.readiness = "ready"
+
     yield
     
     # Limpiar recursos
-    logger.info("🛑 Apagando servidor vLLM...")
+    logger.info("🛑 Apagando servidor de inferencia...")
+    if app.state.warmup_task and not app.state.warmup_task.done():
+        app.state.warmup_task.cancel()
     try:
         await app.state.engine.shutdown()
     except Exception as e:
@@ -79,24 +402,41 @@ app = FastAPI(
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 # === MODELOS DE DATOS ===
-class InferenceRequest(BaseModel):
-    prompt: str
+class SamplingRequest(BaseModel):
     temperature: float = 0.2
     max_tokens: int = 850
     user_id: str = "anonymous"
     top_p: float = 0.9
     top_k: int = 50
+    truncation: Literal["error", "max_tokens", "middle"] = "error"
+
+class InferenceRequest(SamplingRequest):
+    prompt: str
+
+class TemplateInferenceRequest(SamplingRequest):
+    template: str
+    variables: Dict[str, str] = {}
 
 class InferenceResponse(BaseModel):
     response: str
     model: str = MODEL_NAME
     tokens_used: int
     processing_time: float
+    prompt_tokens: int = 0
+    truncated_tokens: int = 0
 
 # === MIDDLEWARE DE CONTROL DE CARGA ===
 @app.middleware("http")
 async def load_control_middleware(request: Request, call_next):
     """Control de carga y backpressure real"""
+    readiness = getattr(request.app.state, "readiness", "starting")
+    if readiness != "ready" and request.url.path.startswith("/generate"):
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "5"},
+            content={"error": "Servidor en calentamiento, intenta nuevamente en unos segundos.", "status": readiness}
+        )
+
     if request_queue.qsize() >= request_queue.maxsize:
         logger.warning(f"🚨 Cola llena ({request_queue.qsize()}/{request_queue.maxsize}). Rechazando solicitud.")
         return JSONResponse(
@@ -105,6 +445,9 @@ async def load_control_middleware(request: Request, call_next):
         )
     
     start_time = time.time()
+    # La traza del bot (si viene) la heredan los endpoints y queda en cada span
+    trace_id = request.headers.get(TRACE_HEADER, "")[:64]
+    current_trace.set(trace_id)
     
     try:
         # Agregar a cola con timeout
@@ -115,6 +458,7 @@ async def load_control_middleware(request: Request, call_next):
         acquired = await asyncio.wait_for(semaphore.acquire(), QUEUE_TIMEOUT)
         if not acquired:
             raise asyncio.TimeoutError("Timeout adquiriendo recurso")
+        emit_span("cola", start_time, (time.time() - start_time) * 1000, queue_size=request_queue.qsize())
         
         try:
             response = await call_next(request)
@@ -124,6 +468,10 @@ async def load_control_middleware(request: Request, call_next):
                 request_queue.get_nowait()
                 request_queue.task_done()
         
+        emit_span("servidor", start_time, (time.time() - start_time) * 1000,
+                  path=request.url.path, status=response.status_code)
+        if trace_id:
+            response.headers[TRACE_HEADER] = trace_id
         return response
         
     except asyncio.TimeoutError:
@@ -137,17 +485,42 @@ async def load_control_middleware(request: Request, call_next):
         raise
 
 # === ENDPOINT DE INFERENCIA OPTIMIZADO ===
-@app.post("/generate", response_model=InferenceResponse)
-async def generate(request: InferenceRequest):
-    """Endpoint optimizado para chat interactivo - aprovecha continuous batching de vLLM"""
+async def _prepare_prompt(request: SamplingRequest, build_parts) -> Tuple[List[int], int, int]:
+    """
+    Cuenta tokens con el tokenizador cacheado (fuera del event loop) y aplica la
+    política de truncado. Responde 413 rápido si el prompt no entra.
+    """
+    def _build():
+        return fit_prompt(build_parts(), request.max_tokens, request.truncation)
+
+    start_time = time.time()
+    try:
+        prepared = await asyncio.to_thread(_build)
+        emit_span("tokenizar", start_time, (time.time() - start_time) * 1000,
+                  prompt_tokens=len(prepared[0]), truncated=prepared[2])
+        return prepared
+    except PromptTooLongError as e:
+        logger.warning(f"📏 [Usuario: {request.user_id}] {e}")
+        raise HTTPException(status_code=413, detail={
+            "error": "El prompt excede la longitud máxima del modelo",
+            "prompt_tokens": e.prompt_tokens,
+            "max_tokens": e.max_tokens,
+            "max_model_len": MAX_MODEL_LEN
+        })
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+async def _generate_response(request: SamplingRequest, prompt_ids: List[int], max_tokens: int, truncated: int) -> InferenceResponse:
+    """Ejecuta la generación en vLLM - aprovecha continuous batching"""
     start_time = time.time()
     
     try:
-        logger.info(f"👤 [Usuario: {request.user_id}] Procesando solicitud...")
+        trace_id = current_trace.get()
+        logger.info(f"👤 [Usuario: {request.user_id} | Traza: {trace_id or '-'}] Procesando solicitud...", extra=SAMPLED)
         
-        sampling_params = SamplingParams(
+        sampling_params = app.state.engine.sampling_params(
             temperature=request.temperature,
-            max_tokens=request.max_tokens,
+            max_tokens=max_tokens,
             stop=["<|im_end|>", "</s>", "###"],
             repetition_penalty=1.1,
             skip_special_tokens=True,
@@ -156,15 +529,21 @@ async def generate(request: InferenceRequest):
         )
         
         # Usar vLLM asíncrono - esto permite continuous batching REAL
+        first_token_time = None
+
         async def generate_with_timeout():
+            nonlocal first_token_time
             results_generator = app.state.engine.generate(
-                request.prompt,
+                {"prompt_token_ids": prompt_ids},
                 sampling_params,
-                request_id=str(time.time()) + "_" + request.user_id
+                # La traza identifica la solicitud también en los logs de vLLM
+                request_id=f"{trace_id or time.time()}_{request.user_id}_{time.monotonic_ns()}"
             )
             
             final_output = None
             async for request_output in results_generator:
+                if first_token_time is None:
+                    first_token_time = time.time()
                 final_output = request_output
             
             return final_output
@@ -177,14 +556,21 @@ async def generate(request: InferenceRequest):
         
         response_text = output.outputs[0].text.strip()
         tokens_used = len(output.outputs[0].token_ids)
-        processing_time = time.time() - start_time
+        end_time = time.time()
+        processing_time = end_time - start_time
+        # prefill = hasta la primera salida del motor (incluye la espera en el scheduler); decode = el resto
+        first_token_time = first_token_time or end_time
+        emit_span("prefill", start_time, (first_token_time - start_time) * 1000, prompt_tokens=len(prompt_ids))
+        emit_span("decode", first_token_time, (end_time - first_token_time) * 1000, tokens=tokens_used)
         
-        logger.info(f"✅ [Usuario: {request.user_id}] Respuesta generada ({tokens_used} tokens) en {processing_time:.2f}s")
+        logger.info(f"✅ [Usuario: {request.user_id} | Traza: {trace_id or '-'}] Respuesta generada ({tokens_used} tokens) en {processing_time:.2f}s", extra=SAMPLED)
         
         return InferenceResponse(
             response=response_text,
             tokens_used=tokens_used,
-            processing_time=processing_time
+            processing_time=processing_time,
+            prompt_tokens=len(prompt_ids),
+            truncated_tokens=truncated
         )
     
     except asyncio.TimeoutError:
@@ -194,6 +580,31 @@ async def generate(request: InferenceRequest):
         logger.error(f"❌ [Usuario: {request.user_id}] Error en generación: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error procesando solicitud: {str(e)}")
 
+@app.post("/generate", response_model=InferenceResponse)
+async def generate(request: InferenceRequest):
+    """Endpoint optimizado para chat interactivo con el prompt completo"""
+    prompt_ids, max_tokens, truncated = await _prepare_prompt(
+        request,
+        lambda: [(app.state.tokenizer.encode(request.prompt), "prompt")]
+    )
+    return await _generate_response(request, prompt_ids, max_tokens, truncated)
+
+@app.post("/generate_template", response_model=InferenceResponse)
+async def generate_template(request: TemplateInferenceRequest):
+    """
+    Genera a partir de una plantilla de prompts.yaml + variables.
+    Los segmentos fijos ya están tokenizados; se envían prompt_token_ids al motor.
+    """
+    template = app.state.templates.get(request.template)
+    if template is None:
+        raise HTTPException(status_code=404, detail=f"Plantilla desconocida: {request.template}")
+
+    prompt_ids, max_tokens, truncated = await _prepare_prompt(
+        request,
+        lambda: template.render_parts(request.variables, app.state.tokenizer)
+    )
+    return await _generate_response(request, prompt_ids, max_tokens, truncated)
+
 # === HEALTH CHECK MEJORADO ===
 @app.get("/health")
 async def health_check():
@@ -201,23 +612,35 @@ async def health_check():
     queue_load = request_queue.qsize() / request_queue.maxsize * 100 if request_queue.maxsize > 0 else 0
     semaphore_load = (MAX_CONCURRENT_REQUESTS - semaphore._value) / MAX_CONCURRENT_REQUESTS * 100
     
+    readiness = getattr(app.state, "readiness", "starting")
+    if readiness != "ready":
+        # 503 para que balanceadores y el bot retengan tráfico durante el warmup
+        return JSONResponse(
+            status_code=503,
+            content={"status": readiness, "model": MODEL_NAME, "timestamp": time.time()}
+        )
+
     status = "healthy" if queue_load < 80 and semaphore_load < 90 else "degraded"
     
     return {
         "status": status,
+        "readiness": readiness,
         "model": MODEL_NAME,
+        "backend": ENGINE_BACKEND,
         "queue_size": request_queue.qsize(),
         "queue_max": request_queue.maxsize,
         "queue_load_percent": round(queue_load, 1),
         "concurrent_requests": MAX_CONCURRENT_REQUESTS - semaphore._value,
         "max_concurrent": MAX_CONCURRENT_REQUESTS,
         "semaphore_load_percent": round(semaphore_load, 1),
+        "max_model_len": MAX_MODEL_LEN,
+        "templates": sorted(getattr(app.state, "templates", {})),
         "version": "2.0",
         "timestamp": time.time()
     }
 
 if __name__ == "__main__":
-    logger.info(f"🔧 Configuración: MAX_CONCURRENT_REQUESTS={MAX_CONCURRENT_REQUESTS}, MODEL_NAME={MODEL_NAME}")
+    logger.info(f"🔧 Configuración: ENGINE_BACKEND={ENGINE_BACKEND}, MAX_CONCURRENT_REQUESTS={MAX_CONCURRENT_REQUESTS}, MODEL_NAME={MODEL_NAME}")
     logger.info(f"🔌 Iniciando servidor en {HOST}:{PORT}")
     uvicorn.run(
         app,
@@ -225,5 +648,7 @@ if __name__ == "__main__":
         port=PORT,
         log_level="info",
         timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        log_config=None,  # los logs de uvicorn pasan por la cola del logger raíz
         workers=1  # ¡Siempre 1 worker con vLLM! (no usar múltiples workers)
     )
+    log_listener.stop()
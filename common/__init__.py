@@ -0,0 +1,2 @@
+# ./common/__init__.py
+# Utilidades compartidas por el bot (frontend) y el servidor de inferencia (backend)
@@ -0,0 +1,113 @@
+# ./common/log_pipeline.py
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import List
+
+# Marcar con extra=SAMPLED las líneas INFO de alto volumen (una o más por mensaje)
+SAMPLED = {"sampled": True}
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro (para ingestión estructurada)"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Deja pasar solo una fracción de los registros marcados como muestreables"""
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno > logging.INFO or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    QueueHandler para un listener del mismo proceso. El prepare() estándar
+    formatea el registro antes de encolarlo (el formato quedaba duplicado) y
+    borra exc_info (el JsonFormatter perdía "exc"); aquí solo se resuelve
+    el mensaje y el formato queda a cargo de los handlers del listener.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _stop_listener(listener: QueueListener):
+    """Vacía la cola al salir (tolera que ya se haya detenido)"""
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+
+def setup_logging(
+    level: int,
+    handlers: List[logging.Handler],
+    json_format: bool = False,
+    sample_rate: float = 1.0,
+    text_format: str = TEXT_FORMAT
+) -> QueueListener:
+    """
+    Configura el logger raíz con un QueueHandler: el event loop solo encola
+    registros y un hilo (QueueListener) los escribe en archivo/consola.
+    Lo usan el bot y el servidor de inferencia.
+    """
+    formatter = JsonFormatter() if json_format else logging.Formatter(text_format)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LocalQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def setup_span_log(path: Path, name: str = "unsa_bot.spans") -> QueueListener:
+    """
+    Registros de spans (una línea JSON cada uno) en un archivo propio, sin
+    muestreo ni formato de log: los une scripts/trace_waterfall.py.
+    """
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    span_logger = logging.getLogger(name)
+    span_logger.addHandler(LocalQueueHandler(log_queue))
+    span_logger.setLevel(logging.INFO)
+    span_logger.propagate = False
+
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
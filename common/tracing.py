@@ -0,0 +1,16 @@
+# ./common/tracing.py
+import json
+
+# Encabezado con el que el servidor de inferencia recibe (y devuelve) la traza
+TRACE_HEADER = "X-Trace-Id"
+
+
+def span_record(trace_id: str, process: str, name: str, start: float, duration_ms: float, **attrs) -> str:
+    """
+    Línea JSON de un span: t=traza, p=proceso, n=nombre, ts=inicio (epoch),
+    ms=duración, más atributos. Mismo formato en el bot y en el servidor de
+    inferencia: scripts/trace_waterfall.py une ambos archivos.
+    """
+    record = {"t": trace_id, "p": process, "n": name, "ts": round(start, 6), "ms": round(duration_ms, 2)}
+    record.update(attrs)
+    return json.dumps(record, ensure_ascii=False, default=str)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Detección de fragmentos casi duplicados con MinHash + LSH
+Etapa online de la ingesta: el primer fragmento de cada grupo queda como canónico
+y los siguientes con similitud Jaccard estimada >= umbral se registran como alias
+(fragmentos_alias) en lugar de insertarse. Costo ~O(n): cada fragmento solo se
+compara contra los candidatos que comparten alguna banda LSH.
+
+Alcance: el índice se arma en memoria en cada corrida y no se persisten las
+firmas, así que solo detecta duplicados entre los fragmentos de esa corrida.
+cargar_conocimiento.py recorre todas las fuentes y queda cubierto; una ingesta
+parcial (ingesta_documentos.py con algunos archivos) no se compara contra las
+filas que ya están en la base.
+
+Uso (reporte sin tocar la base): python database/deduplicacion.py --umbral 0.8
+"""
+import argparse
+import hashlib
+import re
+import time
+import unicodedata
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ========== CONFIG ==========
+UMBRAL_DEFECTO = 0.85
+NUM_PERMUTACIONES = 128
+TAM_SHINGLE = 3        # shingles de 3 palabras
+SEMILLA = 20240501     # fija: las firmas deben coincidir entre procesos y corridas
+
+# a, b y los crc32 son < 2**32, así que a*x + b < 2**64 y el producto no da la vuelta
+# en uint64. _PRIMO > 2**32: el módulo puede dejar valores en [2**32, _PRIMO), que
+# la máscara recorta a 32 bits para la firma uint32.
+_PRIMO = np.uint64(4294967311)
+_MAX_HASH = np.uint64(2**32 - 1)
+
+# ========== FIRMAS ==========
+def _normalizar(texto: str) -> List[str]:
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r"\w+", texto)
+
+
+def shingles(texto: str, k: int = TAM_SHINGLE) -> np.ndarray:
+    """Hashes crc32 de los k-gramas de palabras (la bolsa de palabras si es más corto)"""
+    palabras = _normalizar(texto)
+    if len(palabras) < k:
+        grams = palabras or [texto.strip().lower()]
+    else:
+        grams = (" ".join(palabras[i:i + k]) for i in range(len(palabras) - k + 1))
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64))
+
+
+def _permutaciones(num_perm: int):
+    rng = np.random.RandomState(SEMILLA)
+    a = rng.randint(1, 2**32 - 1, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+_PERMS = {}
+
+
+def firma_minhash(texto: str, num_perm: int = NUM_PERMUTACIONES) -> np.ndarray:
+    """Firma MinHash (num_perm enteros de 32 bits); función pura, apta para un pool de procesos"""
+    if num_perm not in _PERMS:
+        _PERMS[num_perm] = _permutaciones(num_perm)
+    a, b = _PERMS[num_perm]
+    hashes = shingles(texto)
+    valores = (np.outer(hashes, a) + b) % _PRIMO & _MAX_HASH
+    return valores.min(axis=0).astype(np.uint32)
+
+
+def parametros_lsh(umbral: float, num_perm: int):
+    """
+    Bandas x filas con el mayor punto de corte (1/b)^(1/r) que no supere el umbral:
+    se prefieren falsos positivos (se verifican con la firma) a falsos negativos.
+    """
+    opciones = []
+    for filas in range(1, num_perm + 1):
+        if num_perm % filas == 0:
+            bandas = num_perm // filas
+            opciones.append(((1 / bandas) ** (1 / filas), bandas, filas))
+    debajo = [o for o in opciones if o[0] <= umbral]
+    corte, bandas, filas = max(debajo) if debajo else min(opciones)
+    return bandas, filas
+
+# ========== ÍNDICE LSH ==========
+class Deduplicador:
+    """
+    Clustering online: líder por grupo (el primero visto), el resto son alias.
+    Solo conoce los fragmentos agregados en esta instancia (la corrida actual).
+    """
+    def __init__(self, umbral: float = UMBRAL_DEFECTO, num_perm: int = NUM_PERMUTACIONES):
+        self.umbral = umbral
+        self.num_perm = num_perm
+        self.bandas, self.filas = parametros_lsh(umbral, num_perm)
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bandas)]
+        self.canonicos: List[dict] = []   # solo clave + firma, no el contenido
+        self.stats = {"vistos": 0, "canonicos": 0, "alias": 0, "comparaciones": 0, "segundos": 0.0}
+
+    def _bandas(self, firma: np.ndarray):
+        for i in range(self.bandas):
+            yield i, firma[i * self.filas:(i + 1) * self.filas].tobytes()
+
+    def agregar(self, frag: dict, firma: Optional[np.ndarray] = None) -> Optional[dict]:
+        """
+        Indexa un fragmento. Devuelve None si es canónico o el registro de alias
+        {fuente, hash_contenido, fuente_canonica, hash_canonico, similitud}.
+        """
+        inicio = time.perf_counter()
+        self.stats["vistos"] += 1
+        if firma is None:
+            firma = firma_minhash(frag["contenido"], self.num_perm)
+        frag_hash = frag.get("hash_contenido")
+        if frag_hash is None:
+            # Mismo sha256 que cargar_conocimiento.hash_contenido; se guarda para no recalcularlo
+            frag_hash = frag["hash_contenido"] = hashlib.sha256(frag["contenido"].encode("utf-8")).hexdigest()
+
+        candidatos = set()
+        for i, clave in self._bandas(firma):
+            candidatos.update(self.buckets[i].get(clave, ()))
+
+        mejor, similitud = None, 0.0
+        for idx in candidatos:
+            self.stats["comparaciones"] += 1
+            sim = float(np.count_nonzero(self.canonicos[idx]["firma"] == firma)) / self.num_perm
+            if sim > similitud:
+                mejor, similitud = idx, sim
+
+        if mejor is not None and similitud >= self.umbral:
+            canonico = self.canonicos[mejor]
+            self.stats["alias"] += 1
+            self.stats["segundos"] += time.perf_counter() - inicio
+            return {
+                "fuente": frag["fuente"],
+                "hash_contenido": frag_hash,
+                "fuente_canonica": canonico["fuente"],
+                "hash_canonico": canonico["hash_contenido"],
+                "similitud": round(similitud, 4),
+            }
+
+        idx = len(self.canonicos)
+        self.canonicos.append({"fuente": frag["fuente"], "hash_contenido": frag_hash, "firma": firma})
+        for i, clave in self._bandas(firma):
+            self.buckets[i].setdefault(clave, []).append(idx)
+        self.stats["canonicos"] += 1
+        self.stats["segundos"] += time.perf_counter() - inicio
+        return None
+
+    def filtrar(self, fragmentos, alias: list):
+        """Stream de fragmentos canónicos; los alias se acumulan en la lista `alias`"""
+        for frag in fragmentos:
+            registro = self.agregar(frag, frag.pop("firma_minhash", None))
+            if registro is None:
+                yield frag
+            elif (registro["fuente"], registro["hash_contenido"]) != (registro["fuente_canonica"], registro["hash_canonico"]):
+                # Repeticiones exactas dentro de la misma fuente no son alias, solo se descartan
+                alias.append(registro)
+
+    def resumen(self) -> str:
+        s = self.stats
+        ritmo = s["vistos"] / s["segundos"] if s["segundos"] else 0.0
+        return (f"🧬 Dedup (umbral={self.umbral}, {self.bandas}x{self.filas}): "
+                f"{s['canonicos']} canónicos, {s['alias']} alias de {s['vistos']} "
+                f"({ritmo:,.0f} frag/s, {s['comparaciones']} comparaciones)")
+
+
+def main():
+    from cargar_conocimiento import iterar_todas_las_fuentes
+
+    parser = argparse.ArgumentParser(description="Reporte de casi duplicados en las fuentes")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_DEFECTO)
+    parser.add_argument("--num-perm", type=int, default=NUM_PERMUTACIONES)
+    parser.add_argument("--mostrar", type=int, default=10, help="alias a listar")
+    args = parser.parse_args()
+
+    dedup = Deduplicador(args.umbral, args.num_perm)
+    alias = []
+    for _ in dedup.filtrar(iterar_todas_las_fuentes(), alias):
+        pass
+    print(dedup.resumen())
+    for registro in alias[:args.mostrar]:
+        print(f"  • {registro['fuente']} ≈ {registro['fuente_canonica']} (sim={registro['similitud']})")
+
+
+if __name__ == "__main__":
+    main()
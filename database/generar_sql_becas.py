@@ -7,46 +7,62 @@ SQL_OUT = Path("becas.sql")
 def limpiar(t):
     return t.strip().replace("'", "''")
 
-with CSV_FILE.open(encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    inserts = []
+def iterar_becas(csv_file: Path = CSV_FILE):
+    """Produce un fragmento por beca con los valores sin escapar"""
+    with csv_file.open(encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+
+        for fila in reader:
+            nombre = fila["nombre"].strip()
+            tipo = fila["tipo"]
+            descripcion = fila["descripcion"].strip()
+            requisitos = fila["requisitos"].strip()
+            dirigido = fila["dirigido_a"].strip()
+            facultad = fila["facultad"]
+            sede = fila["sede"]
+            fa = fila["fecha_apertura"]
+            fc = fila["fecha_cierre"]
+            link = fila["link"]
+
+            keywords = [k.strip().lower() for k in fila["keywords"].split(",") if k.strip()]
 
-    for fila in reader:
-        nombre = limpiar(fila["nombre"])
-        tipo = fila["tipo"]
-        descripcion = limpiar(fila["descripcion"])
-        requisitos = limpiar(fila["requisitos"])
-        dirigido = limpiar(fila["dirigido_a"])
-        facultad = fila["facultad"]
-        sede = fila["sede"]
-        fa = fila["fecha_apertura"]
-        fc = fila["fecha_cierre"]
-        link = fila["link"]
-
-        keywords = [k.strip().lower() for k in fila["keywords"].split(",") if k.strip()]
-        kw_sql = ", ".join(f"'{k}'" for k in keywords)
-
-        contenido = (
-            f"{nombre}. "
-            f"Tipo: {tipo}. "
-            f"Descripción: {descripcion}. "
-            f"Requisitos: {requisitos}. "
-            f"Dirigido a: {dirigido}. "
-            f"Sede: {sede}. "
-            f"Inscripción: del {fa} al {fc}. "
-            f"Más info: {link}"
-        )
+            contenido = (
+                f"{nombre}. "
+                f"Tipo: {tipo}. "
+                f"Descripción: {descripcion}. "
+                f"Requisitos: {requisitos}. "
+                f"Dirigido a: {dirigido}. "
+                f"Sede: {sede}. "
+                f"Inscripción: del {fa} al {fc}. "
+                f"Más info: {link}"
+            )
 
+            yield {
+                "contenido": contenido,
+                "categoria": "beca",
+                "facultad": facultad,
+                "palabras_clave": keywords,
+                "descripcion": None,
+                "fuente": csv_file.name,
+            }
+
+def main():
+    inserts = []
+    for frag in iterar_becas():
+        kw_sql = ", ".join(f"'{limpiar(k)}'" for k in frag["palabras_clave"])
         sql = f"""INSERT INTO fragmentos_conocimiento
 (contenido, categoria, facultad, palabras_clave)
 VALUES (
-  '{contenido}',
+  '{limpiar(frag["contenido"])}',
   'beca',
-  '{facultad}',
+  '{frag["facultad"]}',
   ARRAY[{kw_sql}]
 );
 """
         inserts.append(sql)
 
-SQL_OUT.write_text("\n".join(inserts), encoding="utf-8")
-print(f"✅ Generado {SQL_OUT}")
+    SQL_OUT.write_text("\n".join(inserts), encoding="utf-8")
+    print(f"✅ Generado {SQL_OUT}")
+
+if __name__ == "__main__":
+    main()
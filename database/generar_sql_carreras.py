@@ -35,17 +35,20 @@ def validar_fila(fila, nro):
         print(f"⚠️  Fila {nro}: {', '.join(errores)}")
         sys.exit(1)
 
-# ================= MAIN =================
-def main():
-    if not CSV_FILE.exists():
-        print(f"❌ CSV no encontrado: {CSV_FILE}")
+# ================= LECTURA =================
+def iterar_carreras(csv_file: Path = CSV_FILE):
+    """
+    Valida el CSV y produce un fragmento por carrera con los valores sin escapar
+    (lo usan tanto los INSERT de este script como el cargador por COPY).
+    """
+    if not csv_file.exists():
+        print(f"❌ CSV no encontrado: {csv_file}")
         sys.exit(1)
 
     # Asumiendo que tu CSV ahora tiene las columnas: nombre,nivel,facultad,sede,duracion,descripcion,keywords
     COLUMNAS_ESPERADAS = {"nombre", "nivel", "facultad", "sede", "duracion", "descripcion", "keywords"}
 
-    inserts = []
-    with open(CSV_FILE, newline='', encoding='utf-8') as csvfile:
+    with open(csv_file, newline='', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile, delimiter=',')
 
         # Validar columnas
@@ -57,15 +60,13 @@ def main():
         for i, fila in enumerate(reader, start=2):
             validar_fila(fila, i)
 
-            nombre = limpiar(fila["nombre"])
-            nivel = limpiar(fila["nivel"])
-            facultad = limpiar(fila["facultad"])
-            sede = limpiar(fila["sede"])
-            duracion = limpiar(fila["duracion"])
-            # Nueva línea: Obtener la descripción
-            descripcion_raw = fila.get("descripcion", "").strip() # Manejar posibles valores vacíos
-            descripcion = limpiar(descripcion_raw) if descripcion_raw else "" # Limpiarla si existe, sino dejar string vacío
-            keywords = [limpiar(k) for k in fila["keywords"].split(",") if k.strip()]
+            nombre = fila["nombre"].strip()
+            nivel = fila["nivel"].strip()
+            facultad = fila["facultad"].strip()
+            sede = fila["sede"].strip()
+            duracion = fila["duracion"].strip()
+            descripcion = (fila.get("descripcion") or "").strip() # Manejar posibles valores vacíos
+            keywords = [k.strip() for k in fila["keywords"].split(",") if k.strip()]
 
             # Opción A: Incluir la descripción en el contenido principal (opcional)
             contenido_detalle = f" {descripcion}" if descripcion else ""
@@ -74,16 +75,27 @@ def main():
             # Opción B: Dejar el contenido principal como antes, y solo usar 'descripcion' como campo extra (Recomendado)
             # contenido = f"{nombre}. Carrera de {nivel}. Sede: {sede}. Duración: {duracion}."
 
+            yield {
+                "contenido": contenido,
+                "categoria": CATEGORIA_FIJA,
+                "facultad": facultad,
+                "palabras_clave": keywords,
+                "descripcion": descripcion,
+                "fuente": csv_file.name,
+            }
 
-            kw_sql = ", ".join(f"'{k}'" for k in keywords)
-            # Modificar la sentencia INSERT para incluir la columna descripcion
-            # Usamos COALESCE para manejar el caso donde descripcion sea una cadena vacía, insertándola como NULL si es necesario.
-            # Pero para la base de datos y el retriever, probablemente sea mejor insertar la cadena vacía si no hay descripción.
-            # Si se prefiere NULL: sql = f"""... VALUES ('{contenido}', '{CATEGORIA_FIJA}', '{facultad}', ARRAY[{kw_sql}], {'NULL' if not descripcion else f"'{descripcion}'"});"""
-            # Versión que inserta la cadena vacía si no hay descripción:
-            sql = f"""INSERT INTO fragmentos_conocimiento(contenido, categoria, facultad, palabras_clave, descripcion) -- Añadida descripcion
+# ================= MAIN =================
+def main():
+    inserts = []
+    for frag in iterar_carreras():
+        contenido = limpiar(frag["contenido"])
+        facultad = limpiar(frag["facultad"])
+        descripcion = limpiar(frag["descripcion"])
+        kw_sql = ", ".join(f"'{limpiar(k)}'" for k in frag["palabras_clave"])
+        # Se inserta la cadena vacía si no hay descripción (mejor para la base y el retriever que NULL)
+        sql = f"""INSERT INTO fragmentos_conocimiento(contenido, categoria, facultad, palabras_clave, descripcion) -- Añadida descripcion
                       VALUES ('{contenido}', '{CATEGORIA_FIJA}', '{facultad}', ARRAY[{kw_sql}], '{descripcion}');""" # Usar descripcion
-            inserts.append(sql)
+        inserts.append(sql)
 
     # Escribir el archivo SQL
     try:
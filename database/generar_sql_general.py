@@ -59,7 +59,9 @@ def extraer_keywords(texto, max_keywords=8):
         "una", "unos", "unas", "desde", "hacia", "tiene", "ser", "son",
         "fue", "para", "todo", "toda", "más", "muy", "puede", "info"
     }
-    keywords = list(set(p for p in palabras if p not in stopwords))
+    # Orden de aparición (determinista): un set cambiaría el orden entre corridas
+    # y la ingesta incremental lo vería como una actualización
+    keywords = list(dict.fromkeys(p for p in palabras if p not in stopwords))
     return keywords[:max_keywords]
 
 def generar_insert(contenido, categoria, facultad, keywords):
@@ -76,12 +78,26 @@ def generar_insert(contenido, categoria, facultad, keywords):
         array_sql = "ARRAY[]::text[]"
     return f"INSERT INTO fragmentos_conocimiento (contenido, categoria, facultad, palabras_clave) VALUES ('{contenido_limpio}', '{categoria}', '{facultad}', {array_sql});"
 
-# ========== PROCESAR CADA FUENTE ==========
-inserts = []
+def fragmento(contenido, categoria, facultad, keywords, fuente):
+    """Fragmento sin escapar (para COPY); None si el contenido es demasiado corto."""
+    contenido = (contenido or "").strip()
+    if len(contenido) < 5:
+        return None
+    return {
+        "contenido": contenido,
+        "categoria": categoria,
+        "facultad": facultad,
+        "palabras_clave": keywords,
+        "descripcion": None,
+        "fuente": fuente,
+    }
 
-# ---- 1. Contactos desde JSONL (si existe) ----
-contactos_file = SOURCES_DIR / "contactos.jsonl"
-if contactos_file.exists():
+# ========== PROCESAR CADA FUENTE ==========
+def iterar_contactos():
+    """Contactos desde JSONL (si existe)"""
+    contactos_file = SOURCES_DIR / "contactos.jsonl"
+    if not contactos_file.exists():
+        return
     with open(contactos_file, "r", encoding="utf-8") as f:
         for line_num, line in enumerate(f, 1):
             line = line.strip()
@@ -100,16 +116,16 @@ if contactos_file.exists():
             contenido = f"{nombre}: {contacto}".strip()
             if not contenido:
                 continue
-            categoria = detectar_categoria(contenido)
-            facultad = detectar_facultad(contenido)
-            keywords = extraer_keywords(contenido)
-            sql = generar_insert(contenido, categoria, facultad, keywords)
-            if sql:
-                inserts.append(sql)
-
-# ---- 2. Información general desde .txt ----
-general_txt = KNOWLEDGE_BASE / "informacion_general.txt"
-if general_txt.exists():
+            frag = fragmento(contenido, detectar_categoria(contenido), detectar_facultad(contenido),
+                             extraer_keywords(contenido), contactos_file.name)
+            if frag:
+                yield frag
+
+def iterar_informacion_general():
+    """Información general desde .txt"""
+    general_txt = KNOWLEDGE_BASE / "informacion_general.txt"
+    if not general_txt.exists():
+        return
     with open(general_txt, "r", encoding="utf-8") as f:
         for line_num, line in enumerate(f, 1):
             line = line.strip()
@@ -118,17 +134,16 @@ if general_txt.exists():
             # Descartar líneas muy cortas o con solo signos
             if len(line) < 5:
                 continue
-            contenido = line
-            categoria = detectar_categoria(line)
-            facultad = detectar_facultad(line)
-            keywords = extraer_keywords(line)
-            sql = generar_insert(contenido, categoria, facultad, keywords)
-            if sql:
-                inserts.append(sql)
-
-# ---- 3. Calendario desde becas_y_calendario.txt ----
-becas_cal = KNOWLEDGE_BASE / "becas_y_calendario.txt"
-if becas_cal.exists():
+            frag = fragmento(line, detectar_categoria(line), detectar_facultad(line),
+                             extraer_keywords(line), general_txt.name)
+            if frag:
+                yield frag
+
+def iterar_calendario():
+    """Calendario desde becas_y_calendario.txt"""
+    becas_cal = KNOWLEDGE_BASE / "becas_y_calendario.txt"
+    if not becas_cal.exists():
+        return
     with open(becas_cal, "r", encoding="utf-8") as f:
         for line_num, line in enumerate(f, 1):
             line = line.strip()
@@ -136,35 +151,48 @@ if becas_cal.exists():
                 continue
             # Solo líneas que parezcan de calendario (para no repetir becas)
             if "calendario" in line.lower() or "clases" in line.lower() or "exámenes" in line.lower() or "mesa" in line.lower():
-                contenido = line
-                categoria = "Calendario"
-                facultad = detectar_facultad(line)
-                keywords = extraer_keywords(line)
-                sql = generar_insert(contenido, categoria, facultad, keywords)
-                if sql:
-                    inserts.append(sql)
-
-# ---- 4. Fragmentos varios desde all_chunks.txt ----
-all_chunks = KNOWLEDGE_BASE / "all_chunks.txt"
-if all_chunks.exists():
+                frag = fragmento(line, "Calendario", detectar_facultad(line),
+                                 extraer_keywords(line), becas_cal.name)
+                if frag:
+                    yield frag
+
+def iterar_all_chunks():
+    """Fragmentos varios desde all_chunks.txt"""
+    all_chunks = KNOWLEDGE_BASE / "all_chunks.txt"
+    if not all_chunks.exists():
+        return
     with open(all_chunks, "r", encoding="utf-8") as f:
         for line_num, line in enumerate(f, 1):
             line = line.strip()
             if not line or len(line) < 5:
                 continue
-            contenido = line
-            categoria = detectar_categoria(line)
-            facultad = detectar_facultad(line)
-            keywords = extraer_keywords(line)
-            sql = generar_insert(contenido, categoria, facultad, keywords)
-            if sql:
-                inserts.append(sql)
+            frag = fragmento(line, detectar_categoria(line), detectar_facultad(line),
+                             extraer_keywords(line), all_chunks.name)
+            if frag:
+                yield frag
+
+def iterar_fragmentos():
+    """Todas las fuentes de información general, en orden, como stream"""
+    yield from iterar_contactos()
+    yield from iterar_informacion_general()
+    yield from iterar_calendario()
+    yield from iterar_all_chunks()
 
 # ========== ESCRIBIR ARCHIVO SQL ==========
-OUTPUT_SQL.parent.mkdir(parents=True, exist_ok=True)
-with open(OUTPUT_SQL, "w", encoding="utf-8") as f:
-    f.write("-- Información general generada automáticamente\n")
-    for sql in inserts:
-        f.write(sql + "\n")
+def main():
+    inserts = []
+    for frag in iterar_fragmentos():
+        sql = generar_insert(frag["contenido"], frag["categoria"], frag["facultad"], frag["palabras_clave"])
+        if sql:
+            inserts.append(sql)
+
+    OUTPUT_SQL.parent.mkdir(parents=True, exist_ok=True)
+    with open(OUTPUT_SQL, "w", encoding="utf-8") as f:
+        f.write("-- Información general generada automáticamente\n")
+        for sql in inserts:
+            f.write(sql + "\n")
+
+    print(f"✅ Generados {len(inserts)} inserts en {OUTPUT_SQL}")
 
-print(f"✅ Generados {len(inserts)} inserts en {OUTPUT_SQL}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Ingesta paralela de documentos (PDF, imágenes escaneadas y texto)
+Pipeline en streaming: descubrir → extraer texto / OCR → fragmentar + keywords → cargar.
+Las etapas de CPU corren en un pool de procesos y se comunican con colas acotadas,
+así la memoria queda plana aunque haya miles de documentos. Cada lote cargado se
+registra en un checkpoint para poder retomar la ingesta.
+
+Uso: python database/ingesta_documentos.py [--dir DIR] [--workers 4] [--sin-db]
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    from PyPDF2 import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:
+    pytesseract = None
+    Image = None
+
+from deduplicacion import UMBRAL_DEFECTO, Deduplicador, firma_minhash
+from generar_sql_general import (
+    KNOWLEDGE_BASE, detectar_categoria, detectar_facultad, extraer_keywords, fragmento
+)
+
+# ========== CONFIG ==========
+DOCUMENTOS_DIR = KNOWLEDGE_BASE / "documentos"
+CHECKPOINT_FILE = DOCUMENTOS_DIR / ".ingesta_checkpoint.json"
+
+EXT_PDF = {".pdf"}
+EXT_IMAGEN = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp"}
+EXT_TEXTO = {".txt", ".md"}
+
+MIN_TEXTO_PAGINA = 20   # menos caracteres → página escaneada, se aplica OCR
+MAX_CHARS_FRAGMENTO = 800
+MAX_LARGO_FUENTE = 100  # fragmentos_conocimiento.fuente es VARCHAR(100)
+
+FIN = None  # centinela de fin de etapa
+
+# ========== DESCUBRIMIENTO ==========
+def extensiones_soportadas() -> set:
+    """Extensiones procesables con las dependencias instaladas"""
+    ext = set(EXT_TEXTO)
+    if PdfReader:
+        ext |= EXT_PDF
+    if pytesseract:
+        ext |= EXT_IMAGEN
+    return ext
+
+
+def descubrir_documentos(base: Path):
+    """Recorre el directorio en orden estable (generador, no lista)"""
+    soportadas = extensiones_soportadas()
+    for raiz, dirs, archivos in os.walk(base):
+        dirs.sort()
+        for nombre in sorted(archivos):
+            ruta = Path(raiz) / nombre
+            if ruta.suffix.lower() in soportadas:
+                yield ruta
+
+
+def fuente_de(ruta: Path, base: Path) -> str:
+    """Identificador estable del documento para la columna fuente"""
+    relativa = ruta.relative_to(base).as_posix()
+    if len(relativa) <= MAX_LARGO_FUENTE:
+        return relativa
+    sufijo = hashlib.sha256(relativa.encode("utf-8")).hexdigest()[:12]
+    return f"{relativa[:MAX_LARGO_FUENTE - 13]}~{sufijo}"
+
+
+def firma_archivo(ruta: Path) -> str:
+    st = ruta.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+# ========== ETAPAS DE CPU (corren en el pool de procesos) ==========
+def _ocr_pagina_pdf(pagina, idioma: str) -> str:
+    """OCR de las imágenes embebidas en una página PDF escaneada"""
+    textos = []
+    for imagen in pagina.images:
+        with Image.open(io.BytesIO(imagen.data)) as img:
+            textos.append(pytesseract.image_to_string(img, lang=idioma))
+    return "\n".join(textos)
+
+
+def extraer_texto(ruta: str, idioma: str) -> dict:
+    """Texto de un documento; las páginas sin texto pasan por OCR si está disponible"""
+    inicio = time.perf_counter()
+    ext = Path(ruta).suffix.lower()
+    paginas = []
+    ocr = 0
+
+    if ext in EXT_PDF:
+        for pagina in PdfReader(ruta).pages:
+            texto = (pagina.extract_text() or "").strip()
+            if len(texto) < MIN_TEXTO_PAGINA and pytesseract:
+                texto = _ocr_pagina_pdf(pagina, idioma)
+                ocr += 1
+            paginas.append(texto)
+    elif ext in EXT_IMAGEN:
+        with Image.open(ruta) as img:
+            paginas.append(pytesseract.image_to_string(img, lang=idioma))
+        ocr = 1
+    else:
+        paginas.append(Path(ruta).read_text(encoding="utf-8", errors="replace"))
+
+    return {
+        "texto": "\n\n".join(paginas),
+        "paginas": len(paginas),
+        "ocr": ocr,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+
+def dividir_en_fragmentos(texto: str, max_chars: int = MAX_CHARS_FRAGMENTO):
+    """Agrupa párrafos hasta max_chars; los párrafos largos se cortan por oraciones"""
+    actual = ""
+    for parrafo in re.split(r"\n\s*\n", texto):
+        parrafo = " ".join(parrafo.split())
+        if not parrafo:
+            continue
+        partes = [parrafo] if len(parrafo) <= max_chars else re.split(r"(?<=[.!?;])\s+", parrafo)
+        for parte in partes:
+            while len(parte) > max_chars:
+                if actual:
+                    yield actual
+                    actual = ""
+                yield parte[:max_chars]
+                parte = parte[max_chars:]
+            if actual and len(actual) + len(parte) + 1 > max_chars:
+                yield actual
+                actual = ""
+            actual = f"{actual} {parte}" if actual else parte
+    if actual:
+        yield actual
+
+
+def fragmentar_documento(texto: str, fuente: str, max_chars: int, con_firma: bool = False) -> dict:
+    """Fragmentos con categoría, facultad y keywords (y firma MinHash), listos para cargar()"""
+    inicio = time.perf_counter()
+    fragmentos = []
+    for chunk in dividir_en_fragmentos(texto, max_chars):
+        frag = fragmento(chunk, detectar_categoria(chunk), detectar_facultad(chunk),
+                         extraer_keywords(chunk), fuente)
+        if frag:
+            if con_firma:
+                frag["firma_minhash"] = firma_minhash(chunk)
+            fragmentos.append(frag)
+    return {"fragmentos": fragmentos, "segundos": time.perf_counter() - inicio}
+
+# ========== CHECKPOINT ==========
+class Checkpoint:
+    """Firma (tamaño:mtime) de cada documento ya cargado"""
+    def __init__(self, ruta: Path, reiniciar: bool = False):
+        self.ruta = ruta
+        self.documentos = {}
+        if ruta.exists() and not reiniciar:
+            self.documentos = json.loads(ruta.read_text(encoding="utf-8"))
+
+    def pendiente(self, fuente: str, firma: str) -> bool:
+        return self.documentos.get(fuente) != firma
+
+    def marcar(self, fuente: str, firma: str):
+        self.documentos[fuente] = firma
+
+    def guardar(self):
+        """Escritura atómica: un corte a mitad no deja el checkpoint corrupto"""
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.ruta.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.documentos, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.ruta)
+
+# ========== MÉTRICAS ==========
+class EtapaMetricas:
+    """Items procesados, tiempo ocupado (suma de workers) y tiempo de pared por etapa"""
+    def __init__(self, nombre: str, unidad: str):
+        self.nombre = nombre
+        self.unidad = unidad
+        self.items = 0
+        self.errores = 0
+        self.ocupado = 0.0
+        self.inicio = None
+        self.fin = None
+
+    def registrar(self, items: int, segundos: float):
+        ahora = time.perf_counter()
+        if self.inicio is None:
+            self.inicio = ahora - segundos
+        self.fin = ahora
+        self.items += items
+        self.ocupado += segundos
+
+    def linea(self) -> str:
+        pared = (self.fin - self.inicio) if self.inicio is not None else 0.0
+        ritmo = self.items / pared if pared > 0 else 0.0
+        return (f"  • {self.nombre:<11} {self.items:>8} {self.unidad:<11} "
+                f"{ritmo:>10,.1f}/s  pared={pared:7.2f}s  ocupado={self.ocupado:7.2f}s  "
+                f"errores={self.errores}")
+
+# ========== PIPELINE ==========
+async def _etapa(entrada: asyncio.Queue, salida, procesar, concurrencia: int, siguientes: int):
+    """Corre `concurrencia` trabajadores y al terminar propaga un FIN por trabajador siguiente"""
+    async def trabajador():
+        while (item := await entrada.get()) is not FIN:
+            resultado = await procesar(item)
+            if resultado is not None and salida is not None:
+                await salida.put(resultado)
+
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    if salida is not None:
+        for _ in range(siguientes):
+            await salida.put(FIN)
+
+
+async def ejecutar(args) -> dict:
+    base = Path(args.dir)
+    checkpoint = Checkpoint(Path(args.checkpoint), reiniciar=args.reiniciar)
+    metricas = {
+        "descubrir": EtapaMetricas("descubrir", "documentos"),
+        "extraer": EtapaMetricas("extraer", "páginas"),
+        "fragmentar": EtapaMetricas("fragmentar", "fragmentos"),
+        "cargar": EtapaMetricas("cargar", "filas"),
+    }
+    # Un índice LSH para toda la corrida: detecta duplicados entre lotes
+    dedup = Deduplicador(args.umbral_dedup) if args.umbral_dedup > 0 else None
+    q_docs = asyncio.Queue(maxsize=args.cola)
+    q_textos = asyncio.Queue(maxsize=args.cola)
+    q_frags = asyncio.Queue(maxsize=args.cola)
+    loop = asyncio.get_running_loop()
+
+    conn = None
+    if not args.sin_db:
+        import asyncpg
+        from cargar_conocimiento import DATABASE_URL
+        conn = await asyncpg.connect(DATABASE_URL)
+
+    async def descubrir():
+        omitidos = 0
+        for ruta in descubrir_documentos(base):
+            inicio = time.perf_counter()
+            fuente, firma = fuente_de(ruta, base), firma_archivo(ruta)
+            if not checkpoint.pendiente(fuente, firma):
+                omitidos += 1
+                continue
+            metricas["descubrir"].registrar(1, time.perf_counter() - inicio)
+            await q_docs.put({"ruta": str(ruta), "fuente": fuente, "firma": firma})
+        if omitidos:
+            print(f"⏭️  {omitidos} documentos sin cambios según el checkpoint")
+        for _ in range(args.workers):
+            await q_docs.put(FIN)
+
+    async def extraer(doc):
+        try:
+            res = await loop.run_in_executor(pool, extraer_texto, doc["ruta"], args.idioma)
+        except Exception as e:
+            metricas["extraer"].errores += 1
+            print(f"⚠️ No se pudo extraer {doc['fuente']}: {e}")
+            return None
+        metricas["extraer"].registrar(res["paginas"], res["segundos"])
+        return {**doc, "texto": res["texto"]}
+
+    async def fragmentar(doc):
+        try:
+            res = await loop.run_in_executor(
+                pool, fragmentar_documento, doc.pop("texto"), doc["fuente"], args.max_chars, dedup is not None
+            )
+        except Exception as e:
+            metricas["fragmentar"].errores += 1
+            print(f"⚠️ No se pudo fragmentar {doc['fuente']}: {e}")
+            return None
+        metricas["fragmentar"].registrar(len(res["fragmentos"]), res["segundos"])
+        return {**doc, "fragmentos": res["fragmentos"]}
+
+    async def cargar_lotes():
+        # Lotes de documentos completos: el diff de cargar() abarca solo sus fuentes
+        lote = []
+
+        async def volcar():
+            filas, alias = [f for doc in lote for f in doc["fragmentos"]], []
+            if dedup is not None:
+                filas = list(dedup.filtrar(filas, alias))
+            if conn is not None:
+                from cargar_conocimiento import cargar
+                try:
+                    m = await cargar(conn, filas, dry_run=args.dry_run, alias=alias)
+                except Exception as e:
+                    metricas["cargar"].errores += 1
+                    print(f"❌ Error cargando lote de {len(lote)} documentos: {e}")
+                    lote.clear()
+                    return
+                metricas["cargar"].registrar(len(filas), m["t_copy"] + m["t_diff"])
+                print(f"📥 Lote: {len(lote)} docs, +{m['insertados']} ~{m['actualizados']} "
+                      f"-{m['eliminados']} ({m['alias']} alias)")
+                if not args.dry_run:
+                    for doc in lote:
+                        checkpoint.marcar(doc["fuente"], doc["firma"])
+                    checkpoint.guardar()
+            else:
+                metricas["cargar"].registrar(len(filas), 0.0)
+            lote.clear()
+
+        while (doc := await q_frags.get()) is not FIN:
+            lote.append(doc)
+            if len(lote) >= args.lote or sum(len(d["fragmentos"]) for d in lote) >= args.lote_filas:
+                await volcar()
+        if lote:
+            await volcar()
+
+    inicio = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            await asyncio.gather(
+                descubrir(),
+                _etapa(q_docs, q_textos, extraer, args.workers, args.workers),
+                _etapa(q_textos, q_frags, fragmentar, args.workers, 1),
+                cargar_lotes(),
+            )
+    finally:
+        if conn is not None:
+            await conn.close()
+
+    return {"metricas": metricas, "dedup": dedup, "total": time.perf_counter() - inicio}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta paralela de documentos PDF / imágenes / texto")
+    parser.add_argument("--dir", default=str(DOCUMENTOS_DIR), help="directorio de documentos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="procesos del pool")
+    parser.add_argument("--cola", type=int, default=8, help="capacidad de cada cola entre etapas")
+    parser.add_argument("--lote", type=int, default=50, help="documentos por transacción de carga")
+    parser.add_argument("--lote-filas", type=int, default=5000, help="fragmentos por transacción de carga")
+    parser.add_argument("--max-chars", type=int, default=MAX_CHARS_FRAGMENTO)
+    parser.add_argument("--idioma", default="spa", help="idioma de Tesseract")
+    parser.add_argument("--umbral-dedup", type=float, default=UMBRAL_DEFECTO,
+                        help="similitud Jaccard para casi duplicados (0 desactiva)")
+    parser.add_argument("--checkpoint", default=str(CHECKPOINT_FILE))
+    parser.add_argument("--reiniciar", action="store_true", help="ignora el checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="calcula el diff sin aplicarlo")
+    parser.add_argument("--sin-db", action="store_true", help="solo extrae y fragmenta (benchmark)")
+    args = parser.parse_args()
+
+    if not Path(args.dir).is_dir():
+        print(f"❌ No existe el directorio de documentos: {args.dir}")
+        sys.exit(1)
+    if not PdfReader:
+        print("⚠️ PyPDF2 no instalado: se omiten los PDF")
+    if not pytesseract:
+        print("⚠️ pytesseract/Pillow no instalados: sin OCR para imágenes ni páginas escaneadas")
+
+    print(f"📚 Ingesta de documentos desde {args.dir} con {args.workers} procesos...")
+    resultado = asyncio.run(ejecutar(args))
+
+    print("📊 Throughput por etapa:")
+    for etapa in resultado["metricas"].values():
+        print(etapa.linea())
+    if resultado["dedup"]:
+        print(resultado["dedup"].resumen())
+    print(f"✅ Ingesta de documentos completa en {resultado['total']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+-- ====================================================
+-- MIGRACIÓN 002: Ingesta incremental por hash de contenido
+-- ====================================================
+-- Cada fragmento queda identificado por (fuente, hash_contenido).
+-- database/cargar_conocimiento.py calcula el diff contra la base y aplica
+-- solo inserciones, actualizaciones y eliminaciones, registrándolas en
+-- cambios_conocimiento (feed para índices y cachés del bot).
+
+-- ==================== COLUMNAS ====================
+
+ALTER TABLE fragmentos_conocimiento ADD COLUMN IF NOT EXISTS fuente VARCHAR(100);
+ALTER TABLE fragmentos_conocimiento ADD COLUMN IF NOT EXISTS hash_contenido CHAR(64);
+ALTER TABLE fragmentos_conocimiento ADD COLUMN IF NOT EXISTS version INTEGER DEFAULT 1;
+ALTER TABLE fragmentos_conocimiento ADD COLUMN IF NOT EXISTS fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+-- Hash de los fragmentos existentes (sha256 del contenido en UTF-8, igual que en Python)
+UPDATE fragmentos_conocimiento
+SET hash_contenido = encode(sha256(convert_to(contenido, 'UTF8')), 'hex')
+WHERE hash_contenido IS NULL;
+
+-- ==================== ÍNDICES ====================
+
+-- Clave natural del fragmento (los legados sin fuente no colisionan: NULL es distinto)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_fragmentos_fuente_hash
+ON fragmentos_conocimiento(fuente, hash_contenido);
+
+CREATE INDEX IF NOT EXISTS idx_fragmentos_hash
+ON fragmentos_conocimiento(hash_contenido);
+
+-- Reemplazado por la clave (fuente, hash_contenido)
+DROP INDEX IF EXISTS idx_fragmentos_contenido_md5;
+
+-- ==================== FEED DE CAMBIOS ====================
+
+CREATE TABLE IF NOT EXISTS cambios_conocimiento (
+    id BIGSERIAL PRIMARY KEY,
+    fragmento_id TEXT NOT NULL, -- TEXT: el id es UUID o SERIAL según el esquema
+    operacion VARCHAR(10) NOT NULL CHECK (operacion IN ('insert', 'update', 'delete')),
+    fuente VARCHAR(100),
+    hash_contenido CHAR(64),
+    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_cambios_fecha
+ON cambios_conocimiento(fecha DESC);
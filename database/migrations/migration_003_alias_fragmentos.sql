@@ -0,0 +1,19 @@
+-- ====================================================
+-- MIGRACIÓN 003: Alias de fragmentos casi duplicados
+-- ====================================================
+-- database/deduplicacion.py agrupa fragmentos casi iguales (MinHash/LSH):
+-- solo el canónico se inserta en fragmentos_conocimiento y el resto queda
+-- registrado aquí, apuntando a su (fuente, hash) canónico.
+
+CREATE TABLE IF NOT EXISTS fragmentos_alias (
+    fuente VARCHAR(100) NOT NULL,
+    hash_contenido CHAR(64) NOT NULL,
+    fuente_canonica VARCHAR(100) NOT NULL,
+    hash_canonico CHAR(64) NOT NULL,
+    similitud REAL NOT NULL,
+    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (fuente, hash_contenido)
+);
+
+CREATE INDEX IF NOT EXISTS idx_alias_canonico
+ON fragmentos_alias(fuente_canonica, hash_canonico);
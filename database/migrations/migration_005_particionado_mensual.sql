@@ -0,0 +1,150 @@
+-- ====================================================
+-- MIGRACIÓN 005: Particionado mensual de logs y estadísticas
+-- ====================================================
+-- sistema_logs y estadisticas_anonimas pasan a tablas particionadas por mes
+-- con índices BRIN en el tiempo; la retención deja de ser un DELETE masivo
+-- y pasa a ser DETACH/DROP de particiones (ver politica_particiones).
+-- La política y las funciones de particiones se definen en un solo lugar:
+-- aplicar antes database/schema/03_particiones.sql.
+
+-- ==================== REQUISITOS ====================
+
+DO $$
+BEGIN
+    IF to_regprocedure('crear_particion_mensual(text, date)') IS NULL
+       OR to_regclass('politica_particiones') IS NULL THEN
+        RAISE EXCEPTION 'Falta database/schema/03_particiones.sql: aplicarlo antes de migration_005';
+    END IF;
+END $$;
+
+-- ==================== TABLAS ANTERIORES ====================
+
+DO $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF to_regclass('sistema_logs') IS NOT NULL THEN
+        ALTER TABLE sistema_logs RENAME TO sistema_logs_legado;
+    END IF;
+    IF to_regclass('estadisticas_anonimas') IS NOT NULL THEN
+        ALTER TABLE estadisticas_anonimas RENAME TO estadisticas_anonimas_legado;
+    END IF;
+
+    -- Liberar nombres de constraints e índices para las tablas nuevas
+    FOR r IN
+        SELECT conname, conrelid::regclass AS tabla
+        FROM pg_constraint
+        WHERE conrelid IN (to_regclass('sistema_logs_legado'), to_regclass('estadisticas_anonimas_legado'))
+          AND contype IN ('p', 'u')
+    LOOP
+        EXECUTE format('ALTER TABLE %s RENAME CONSTRAINT %I TO %I',
+                       r.tabla, r.conname, left('legado_' || r.conname, 63));
+    END LOOP;
+END $$;
+
+DROP INDEX IF EXISTS idx_logs_fecha;
+DROP INDEX IF EXISTS idx_logs_nivel;
+DROP INDEX IF EXISTS idx_logs_modulo;
+DROP INDEX IF EXISTS idx_estadisticas_fecha;
+DROP INDEX IF EXISTS idx_estadisticas_tipo;
+
+-- ==================== TABLAS PARTICIONADAS ====================
+
+-- Tabla de logs del sistema (sin datos de usuario)
+-- Particionada por mes: ver schema/03_particiones.sql (creación y retención)
+CREATE TABLE sistema_logs (
+    id BIGSERIAL,
+    nivel VARCHAR(20) NOT NULL CHECK (nivel IN ('DEBUG', 'INFO', 'WARNING', 'ERROR')),
+    modulo VARCHAR(100),
+    accion VARCHAR(50),
+    mensaje TEXT NOT NULL,
+    datos JSONB DEFAULT '{}',
+    ip_hash VARCHAR(64), -- Hash para anonimizar IPs
+    duracion_ms INTEGER,
+    fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+CREATE TABLE sistema_logs_default PARTITION OF sistema_logs DEFAULT;
+
+-- Tabla de estadísticas anónimas para analítica
+-- Particionada por (año, mes): la clave de agregación ya los incluye y así
+-- el UNIQUE puede seguir usándose para el upsert
+CREATE TABLE estadisticas_anonimas (
+    id BIGSERIAL,
+    tipo_consulta VARCHAR(50),
+    facultad_id INTEGER,
+    categoria_id INTEGER,
+    palabras_clave VARCHAR(100)[],
+    hora_dia INTEGER, -- 0-23
+    dia_semana INTEGER, -- 1-7
+    mes INTEGER NOT NULL,
+    año INTEGER NOT NULL,
+    consultas_count INTEGER DEFAULT 1,
+    sin_respuesta_count INTEGER DEFAULT 0,
+    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, año, mes),
+    UNIQUE(tipo_consulta, facultad_id, categoria_id, hora_dia, dia_semana, mes, año)
+) PARTITION BY RANGE (año, mes);
+
+CREATE TABLE estadisticas_anonimas_default PARTITION OF estadisticas_anonimas DEFAULT;
+
+-- ==================== COPIA DE DATOS ====================
+
+DO $$
+DECLARE
+    mes_inicio DATE;
+BEGIN
+    IF to_regclass('sistema_logs_legado') IS NOT NULL THEN
+        FOR mes_inicio IN
+            SELECT DISTINCT date_trunc('month', COALESCE(fecha, CURRENT_TIMESTAMP))::DATE
+            FROM sistema_logs_legado
+        LOOP
+            PERFORM crear_particion_mensual('sistema_logs', mes_inicio);
+        END LOOP;
+
+        INSERT INTO sistema_logs (id, nivel, modulo, accion, mensaje, datos, ip_hash, duracion_ms, fecha)
+        SELECT id, nivel, modulo, accion, mensaje, datos, ip_hash, duracion_ms,
+               COALESCE(fecha, CURRENT_TIMESTAMP)
+        FROM sistema_logs_legado;
+
+        PERFORM setval(pg_get_serial_sequence('sistema_logs', 'id'),
+                       (SELECT COALESCE(MAX(id), 0) + 1 FROM sistema_logs), false);
+        DROP TABLE sistema_logs_legado;
+    END IF;
+
+    IF to_regclass('estadisticas_anonimas_legado') IS NOT NULL THEN
+        FOR mes_inicio IN
+            SELECT DISTINCT make_date(
+                COALESCE(año, extract(year FROM COALESCE(fecha, CURRENT_TIMESTAMP))::INT),
+                COALESCE(mes, extract(month FROM COALESCE(fecha, CURRENT_TIMESTAMP))::INT), 1)
+            FROM estadisticas_anonimas_legado
+        LOOP
+            PERFORM crear_particion_mensual('estadisticas_anonimas', mes_inicio);
+        END LOOP;
+
+        INSERT INTO estadisticas_anonimas
+            (id, tipo_consulta, facultad_id, categoria_id, palabras_clave, hora_dia, dia_semana,
+             mes, año, consultas_count, sin_respuesta_count, fecha)
+        SELECT id, tipo_consulta, facultad_id, categoria_id, palabras_clave, hora_dia, dia_semana,
+               COALESCE(mes, extract(month FROM COALESCE(fecha, CURRENT_TIMESTAMP))::INT),
+               COALESCE(año, extract(year FROM COALESCE(fecha, CURRENT_TIMESTAMP))::INT),
+               consultas_count, sin_respuesta_count, fecha
+        FROM estadisticas_anonimas_legado;
+
+        PERFORM setval(pg_get_serial_sequence('estadisticas_anonimas', 'id'),
+                       (SELECT COALESCE(MAX(id), 0) + 1 FROM estadisticas_anonimas), false);
+        DROP TABLE estadisticas_anonimas_legado;
+    END IF;
+END $$;
+
+-- ==================== ÍNDICES ====================
+
+CREATE INDEX IF NOT EXISTS idx_logs_fecha ON sistema_logs USING brin(fecha);
+CREATE INDEX IF NOT EXISTS idx_logs_nivel ON sistema_logs(nivel);
+CREATE INDEX IF NOT EXISTS idx_logs_modulo ON sistema_logs(modulo);
+CREATE INDEX IF NOT EXISTS idx_estadisticas_fecha ON estadisticas_anonimas USING brin(fecha);
+CREATE INDEX IF NOT EXISTS idx_estadisticas_tipo ON estadisticas_anonimas(tipo_consulta);
+
+-- Particiones del mes actual y los siguientes, y retención inicial
+SELECT * FROM mantener_particiones();
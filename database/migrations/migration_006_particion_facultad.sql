@@ -0,0 +1,112 @@
+-- ====================================================
+-- MIGRACIÓN 006: fragmentos_conocimiento particionada por facultad
+-- ====================================================
+-- El bot detecta la facultad de la consulta (frontend/bot/faculty_router.py)
+-- y filtra con facultad = ANY(...): el planner solo recorre la partición de
+-- esa facultad y la partición compartida 'General'.
+-- Las etiquetas son las de database/generar_sql_general.detectar_facultad.
+-- Requiere las migraciones 002 y 003.
+
+-- ==================== TABLA ANTERIOR ====================
+
+UPDATE fragmentos_conocimiento SET facultad = 'General' WHERE facultad IS NULL OR facultad = '';
+
+ALTER TABLE fragmentos_conocimiento RENAME TO fragmentos_conocimiento_legado;
+
+-- Liberar nombres de constraints e índices para la tabla nueva
+DO $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = 'fragmentos_conocimiento_legado'::regclass AND contype IN ('p', 'u')
+    LOOP
+        EXECUTE format('ALTER TABLE fragmentos_conocimiento_legado RENAME CONSTRAINT %I TO %I',
+                       r.conname, left('legado_' || r.conname, 63));
+    END LOOP;
+
+    FOR r IN
+        SELECT i.indexrelid::regclass::TEXT AS indice, c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'fragmentos_conocimiento_legado'::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+    LOOP
+        EXECUTE format('ALTER INDEX %s RENAME TO %I', r.indice, left('legado_' || r.relname, 63));
+    END LOOP;
+END $$;
+
+-- ==================== TABLA PARTICIONADA ====================
+
+-- Mismas columnas, defaults y CHECKs; la PK y los UNIQUE deben incluir la clave
+CREATE TABLE fragmentos_conocimiento (
+    LIKE fragmentos_conocimiento_legado INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED
+) PARTITION BY LIST (facultad);
+
+ALTER TABLE fragmentos_conocimiento ALTER COLUMN facultad SET NOT NULL;
+ALTER TABLE fragmentos_conocimiento ALTER COLUMN facultad SET DEFAULT 'General';
+ALTER TABLE fragmentos_conocimiento ADD PRIMARY KEY (id, facultad);
+
+CREATE TABLE fragmentos_general     PARTITION OF fragmentos_conocimiento FOR VALUES IN ('General');
+CREATE TABLE fragmentos_exactas     PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Exactas');
+CREATE TABLE fragmentos_ingenieria  PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Ingeniería');
+CREATE TABLE fragmentos_humanidades PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Humanidades');
+CREATE TABLE fragmentos_salud       PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Salud');
+CREATE TABLE fragmentos_naturales   PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Naturales');
+CREATE TABLE fragmentos_economicas  PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Económicas');
+CREATE TABLE fragmentos_oran        PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Orán');
+CREATE TABLE fragmentos_tartagal    PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Tartagal');
+-- Facultades nuevas caen aquí hasta tener su propia partición
+CREATE TABLE fragmentos_otras       PARTITION OF fragmentos_conocimiento DEFAULT;
+
+-- ==================== COPIA DE DATOS ====================
+
+INSERT INTO fragmentos_conocimiento SELECT * FROM fragmentos_conocimiento_legado;
+
+-- El id sigue usando la secuencia (o gen_random_uuid) de la tabla anterior
+DO $$
+DECLARE
+    secuencia TEXT := pg_get_serial_sequence('fragmentos_conocimiento_legado', 'id');
+    r RECORD;
+BEGIN
+    IF secuencia IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY fragmentos_conocimiento.id', secuencia);
+    END IF;
+
+    -- Triggers de fila (tsvector, etc.) se recrean sobre la tabla particionada
+    FOR r IN
+        SELECT pg_get_triggerdef(oid) AS definicion
+        FROM pg_trigger
+        WHERE tgrelid = 'fragmentos_conocimiento_legado'::regclass AND NOT tgisinternal
+    LOOP
+        EXECUTE replace(r.definicion, ' ON fragmentos_conocimiento_legado ', ' ON fragmentos_conocimiento ');
+    END LOOP;
+END $$;
+
+DROP TABLE fragmentos_conocimiento_legado;
+
+-- ==================== ÍNDICES ====================
+-- Se crean en cada partición; las búsquedas ILIKE/similarity usan trigramas
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_fragmentos_fuente_hash
+ON fragmentos_conocimiento(fuente, hash_contenido, facultad);
+
+CREATE INDEX IF NOT EXISTS idx_fragmentos_hash
+ON fragmentos_conocimiento(hash_contenido);
+
+CREATE INDEX IF NOT EXISTS idx_fragmentos_palabras_clave
+ON fragmentos_conocimiento USING gin(palabras_clave);
+
+CREATE INDEX IF NOT EXISTS idx_fragmentos_contenido_trgm
+ON fragmentos_conocimiento USING gin(contenido gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_fragmentos_categoria_texto
+ON fragmentos_conocimiento(categoria);
+
+CREATE INDEX IF NOT EXISTS idx_fragmentos_relevancia
+ON fragmentos_conocimiento(relevancia DESC, usado_count DESC);
+
+ANALYZE fragmentos_conocimiento;
@@ -0,0 +1,32 @@
+-- ====================================================
+-- MIGRACIÓN 007: Respuestas precalculadas (FAQ)
+-- ====================================================
+-- El bot cuenta las preguntas normalizadas que no tienen respuesta
+-- precalculada (preguntas_frecuentes). frontend/bot/faq_precompute.py toma
+-- las más frecuentes, ejecuta recuperación + generación en lote y guarda las
+-- respuestas con los fragmentos de los que dependen. Cuando uno de esos
+-- fragmentos cambia, el bot marca la respuesta como no vigente.
+
+CREATE TABLE IF NOT EXISTS preguntas_frecuentes (
+    pregunta_normalizada VARCHAR(200) PRIMARY KEY,
+    pregunta_ejemplo VARCHAR(200) NOT NULL, -- anonimizada
+    consultas INTEGER NOT NULL DEFAULT 0,
+    ultima_consulta TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS respuestas_precalculadas (
+    pregunta_normalizada VARCHAR(200) PRIMARY KEY,
+    pregunta_ejemplo VARCHAR(200) NOT NULL,
+    respuesta TEXT NOT NULL,
+    modo VARCHAR(10) NOT NULL CHECK (modo IN ('direct', 'llm')),
+    fragmento_ids TEXT[] NOT NULL, -- TEXT: el id es UUID o SERIAL según el esquema
+    aprobada BOOLEAN NOT NULL DEFAULT FALSE, -- pasó la validación (o revisión manual)
+    vigente BOOLEAN NOT NULL DEFAULT TRUE,   -- FALSE cuando cambia un fragmento fuente
+    fecha_generacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_preguntas_consultas
+ON preguntas_frecuentes(consultas DESC);
+
+CREATE INDEX IF NOT EXISTS idx_respuestas_fragmentos
+ON respuestas_precalculadas USING gin(fragmento_ids);
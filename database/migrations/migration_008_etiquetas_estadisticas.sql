@@ -0,0 +1,58 @@
+-- ====================================================
+-- MIGRACIÓN 008: Etiquetas cortas → dimensiones de estadísticas
+-- ====================================================
+-- El bot agrega estadisticas_anonimas por la facultad/categoría del mejor
+-- fragmento, que trae las etiquetas cortas de la ingesta ('Exactas', 'beca',
+-- 'General', ...; ver database/generar_sql_general.py y generar_sql_*.py),
+-- no los nombres de facultades/categorias ('Facultad de Ciencias Exactas').
+-- frontend/bot/query_stats.py resuelve los ids con esta tabla.
+-- ref_id NULL = etiqueta conocida sin fila en la dimensión (se guarda como 0).
+-- Requiere migration_001.
+
+CREATE TABLE IF NOT EXISTS etiquetas_dimension (
+    dimension VARCHAR(20) NOT NULL CHECK (dimension IN ('facultad', 'categoria')),
+    etiqueta VARCHAR(100) NOT NULL,
+    ref_id INTEGER,
+    PRIMARY KEY (dimension, etiqueta)
+);
+
+-- Dimensiones que las etiquetas usan y migration_001 no cargaba
+INSERT INTO facultades (nombre, sigla, sede, descripcion) VALUES
+('Facultad de Ciencias Naturales', 'FCN', 'Central', 'Biología, geología, agronomía')
+ON CONFLICT (nombre) DO NOTHING;
+
+INSERT INTO categorias (nombre, padre_id, nivel)
+SELECT 'Ubicación', id, 2 FROM categorias WHERE nombre = 'Administrativo' AND nivel = 1
+ON CONFLICT (nombre, padre_id) DO NOTHING;
+
+-- Mismas etiquetas que detectar_facultad y FACULTY_ALIASES (faculty_router.py)
+INSERT INTO etiquetas_dimension (dimension, etiqueta, ref_id)
+SELECT 'facultad', e.etiqueta, f.id
+FROM (VALUES
+    ('General', NULL),
+    ('Exactas', 'Facultad de Ciencias Exactas'),
+    ('Ingeniería', 'Facultad de Ingeniería'),
+    ('Humanidades', 'Facultad de Humanidades'),
+    ('Salud', 'Facultad de Ciencias de la Salud'),
+    ('Naturales', 'Facultad de Ciencias Naturales'),
+    ('Económicas', 'Facultad de Ciencias Económicas, Jurídicas y Sociales'),
+    ('Orán', 'Facultad Regional Orán'),
+    ('Tartagal', 'Facultad Regional Tartagal')
+) AS e(etiqueta, nombre)
+LEFT JOIN facultades f ON f.nombre = e.nombre
+ON CONFLICT (dimension, etiqueta) DO UPDATE SET ref_id = EXCLUDED.ref_id;
+
+-- detectar_categoria, generar_sql_carreras/becas y el corpus sintético
+INSERT INTO etiquetas_dimension (dimension, etiqueta, ref_id)
+SELECT 'categoria', e.etiqueta, (SELECT MIN(c.id) FROM categorias c WHERE c.nombre = e.nombre)
+FROM (VALUES
+    ('General', 'UNSA'),
+    ('carrera', 'Carreras de Grado'),
+    ('beca', 'Becas'),
+    ('tramite', 'Trámites'),
+    ('Contacto', 'Contacto'),
+    ('Calendario', 'Calendario'),
+    ('Inscripción', 'Inscripción'),
+    ('Ubicación', 'Ubicación')
+) AS e(etiqueta, nombre)
+ON CONFLICT (dimension, etiqueta) DO UPDATE SET ref_id = EXCLUDED.ref_id;
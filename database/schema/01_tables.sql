@@ -0,0 +1,157 @@
+-- Rutas jerárquicas de categorías
+CREATE EXTENSION IF NOT EXISTS ltree;
+
+-- Tabla de facultades (dimension)
+CREATE TABLE facultades (
+    id SERIAL PRIMARY KEY,
+    nombre VARCHAR(150) NOT NULL UNIQUE,
+    sigla VARCHAR(20),
+    sede VARCHAR(50) DEFAULT 'Central',
+    descripcion TEXT,
+    activo BOOLEAN DEFAULT TRUE,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla de categorías jerárquicas (dimension)
+CREATE TABLE categorias (
+    id SERIAL PRIMARY KEY,
+    nombre VARCHAR(150) NOT NULL,
+    padre_id INTEGER REFERENCES categorias(id),
+    nivel INTEGER DEFAULT 0,
+    ruta VARCHAR(500), -- Para búsquedas jerárquicas rápidas
+    ruta_ids LTREE, -- Camino de ids (1.7.42), mantenido por trigger
+    descripcion TEXT,
+    color VARCHAR(7) DEFAULT '#3498db',
+    icono VARCHAR(50),
+    activo BOOLEAN DEFAULT TRUE,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(nombre, padre_id)
+);
+
+-- Tabla principal de fragmentos (hechos)
+-- Particionada por LIST (facultad), como deja migration_006: el bot filtra con
+-- facultad = ANY(...) y solo recorre esa partición y la compartida 'General'.
+-- Las etiquetas son las de database/generar_sql_general.detectar_facultad.
+CREATE TABLE fragmentos_conocimiento (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    contenido TEXT NOT NULL,
+    contenido_vector TEXT, -- Para full-text search
+    categoria VARCHAR(100) DEFAULT 'General', -- Etiqueta corta de la ingesta
+    facultad VARCHAR(100) NOT NULL DEFAULT 'General', -- Clave de partición
+    descripcion TEXT,
+    categoria_id INTEGER REFERENCES categorias(id),
+    facultad_id INTEGER REFERENCES facultades(id),
+    metadata JSONB DEFAULT '{}',
+    palabras_clave VARCHAR(500)[], -- Array para búsqueda rápida
+    embedding_vector FLOAT[], -- Para búsqueda vectorial (si agregas pgvector después)
+    relevancia FLOAT DEFAULT 1.0,
+    usado_count INTEGER DEFAULT 0,
+    fecha_ingesta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version INTEGER DEFAULT 1,
+    fuente VARCHAR(100), -- Archivo de origen (ingesta incremental)
+    hash_contenido CHAR(64), -- sha256 del contenido
+    PRIMARY KEY (id, facultad)
+) PARTITION BY LIST (facultad);
+
+CREATE TABLE fragmentos_general     PARTITION OF fragmentos_conocimiento FOR VALUES IN ('General');
+CREATE TABLE fragmentos_exactas     PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Exactas');
+CREATE TABLE fragmentos_ingenieria  PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Ingeniería');
+CREATE TABLE fragmentos_humanidades PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Humanidades');
+CREATE TABLE fragmentos_salud       PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Salud');
+CREATE TABLE fragmentos_naturales   PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Naturales');
+CREATE TABLE fragmentos_economicas  PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Económicas');
+CREATE TABLE fragmentos_oran        PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Orán');
+CREATE TABLE fragmentos_tartagal    PARTITION OF fragmentos_conocimiento FOR VALUES IN ('Tartagal');
+-- Facultades nuevas caen aquí hasta tener su propia partición
+CREATE TABLE fragmentos_otras       PARTITION OF fragmentos_conocimiento DEFAULT;
+
+-- Feed de cambios de la ingesta incremental (para índices y cachés)
+CREATE TABLE cambios_conocimiento (
+    id BIGSERIAL PRIMARY KEY,
+    fragmento_id TEXT NOT NULL,
+    operacion VARCHAR(10) NOT NULL CHECK (operacion IN ('insert', 'update', 'delete')),
+    fuente VARCHAR(100),
+    hash_contenido CHAR(64),
+    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Alias de fragmentos casi duplicados (MinHash/LSH en la ingesta)
+CREATE TABLE fragmentos_alias (
+    fuente VARCHAR(100) NOT NULL,
+    hash_contenido CHAR(64) NOT NULL,
+    fuente_canonica VARCHAR(100) NOT NULL,
+    hash_canonico CHAR(64) NOT NULL,
+    similitud REAL NOT NULL,
+    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (fuente, hash_contenido)
+);
+
+-- Preguntas normalizadas sin respuesta precalculada (las cuenta el bot)
+CREATE TABLE preguntas_frecuentes (
+    pregunta_normalizada VARCHAR(200) PRIMARY KEY,
+    pregunta_ejemplo VARCHAR(200) NOT NULL, -- anonimizada
+    consultas INTEGER NOT NULL DEFAULT 0,
+    ultima_consulta TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Respuestas precalculadas (frontend/bot/faq_precompute.py) y sus fragmentos fuente
+CREATE TABLE respuestas_precalculadas (
+    pregunta_normalizada VARCHAR(200) PRIMARY KEY,
+    pregunta_ejemplo VARCHAR(200) NOT NULL,
+    respuesta TEXT NOT NULL,
+    modo VARCHAR(10) NOT NULL CHECK (modo IN ('direct', 'llm')),
+    fragmento_ids TEXT[] NOT NULL,
+    aprobada BOOLEAN NOT NULL DEFAULT FALSE,
+    vigente BOOLEAN NOT NULL DEFAULT TRUE,
+    fecha_generacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Etiquetas cortas de la ingesta ('Exactas', 'beca') → id de facultades/categorias
+-- para estadisticas_anonimas; las filas se cargan con migration_008
+CREATE TABLE etiquetas_dimension (
+    dimension VARCHAR(20) NOT NULL CHECK (dimension IN ('facultad', 'categoria')),
+    etiqueta VARCHAR(100) NOT NULL,
+    ref_id INTEGER, -- NULL: etiqueta conocida sin dimensión (se guarda como 0)
+    PRIMARY KEY (dimension, etiqueta)
+);
+
+-- Tabla de logs del sistema (sin datos de usuario)
+-- Particionada por mes: ver schema/03_particiones.sql (creación y retención)
+CREATE TABLE sistema_logs (
+    id BIGSERIAL,
+    nivel VARCHAR(20) NOT NULL CHECK (nivel IN ('DEBUG', 'INFO', 'WARNING', 'ERROR')),
+    modulo VARCHAR(100),
+    accion VARCHAR(50),
+    mensaje TEXT NOT NULL,
+    datos JSONB DEFAULT '{}',
+    ip_hash VARCHAR(64), -- Hash para anonimizar IPs
+    duracion_ms INTEGER,
+    fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+CREATE TABLE sistema_logs_default PARTITION OF sistema_logs DEFAULT;
+
+-- Tabla de estadísticas anónimas para analítica
+-- Particionada por (año, mes): la clave de agregación ya los incluye y así
+-- el UNIQUE puede seguir usándose para el upsert
+CREATE TABLE estadisticas_anonimas (
+    id BIGSERIAL,
+    tipo_consulta VARCHAR(50),
+    facultad_id INTEGER,
+    categoria_id INTEGER,
+    palabras_clave VARCHAR(100)[],
+    hora_dia INTEGER, -- 0-23
+    dia_semana INTEGER, -- 1-7
+    mes INTEGER NOT NULL,
+    año INTEGER NOT NULL,
+    consultas_count INTEGER DEFAULT 1,
+    sin_respuesta_count INTEGER DEFAULT 0,
+    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, año, mes),
+    UNIQUE(tipo_consulta, facultad_id, categoria_id, hora_dia, dia_semana, mes, año)
+) PARTITION BY RANGE (año, mes);
+
+CREATE TABLE estadisticas_anonimas_default PARTITION OF estadisticas_anonimas DEFAULT;
@@ -0,0 +1,181 @@
+-- Índices optimizados para PostgreSQL
+-- Índices para fragmentos_conocimiento
+CREATE INDEX idx_fragmentos_contenido_fts
+ON fragmentos_conocimiento USING gin(to_tsvector('spanish', contenido_vector));
+
+CREATE INDEX idx_fragmentos_palabras_clave
+ON fragmentos_conocimiento USING gin(palabras_clave);
+
+CREATE INDEX idx_fragmentos_metadata
+ON fragmentos_conocimiento USING gin(metadata);
+
+CREATE INDEX idx_fragmentos_categoria
+ON fragmentos_conocimiento(categoria_id);
+
+CREATE INDEX idx_fragmentos_facultad
+ON fragmentos_conocimiento(facultad_id);
+
+CREATE INDEX idx_fragmentos_fecha_ingesta
+ON fragmentos_conocimiento(fecha_ingesta DESC);
+
+CREATE INDEX idx_fragmentos_relevancia
+ON fragmentos_conocimiento(relevancia DESC, usado_count DESC);
+
+-- Clave de la ingesta incremental (database/cargar_conocimiento.py);
+-- incluye facultad porque un índice único debe contener la clave de partición
+CREATE UNIQUE INDEX idx_fragmentos_fuente_hash
+ON fragmentos_conocimiento(fuente, hash_contenido, facultad);
+
+-- Búsquedas ILIKE/similarity del retriever y filtro por categoría
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX idx_fragmentos_contenido_trgm
+ON fragmentos_conocimiento USING gin(contenido gin_trgm_ops);
+
+CREATE INDEX idx_fragmentos_categoria_texto
+ON fragmentos_conocimiento(categoria);
+
+CREATE INDEX idx_fragmentos_hash
+ON fragmentos_conocimiento(hash_contenido);
+
+CREATE INDEX idx_cambios_fecha
+ON cambios_conocimiento(fecha DESC);
+
+CREATE INDEX idx_alias_canonico
+ON fragmentos_alias(fuente_canonica, hash_canonico);
+
+CREATE INDEX idx_preguntas_consultas
+ON preguntas_frecuentes(consultas DESC);
+
+CREATE INDEX idx_respuestas_fragmentos
+ON respuestas_precalculadas USING gin(fragmento_ids);
+
+-- Índices para categorías (búsqueda jerárquica)
+CREATE INDEX idx_categorias_padre
+ON categorias(padre_id);
+
+CREATE INDEX idx_categorias_ruta
+ON categorias(ruta);
+
+CREATE INDEX idx_categorias_nivel
+ON categorias(nivel);
+
+-- Subárboles: WHERE ruta_ids <@ '1.7' (descendientes) o @> (ancestros)
+CREATE INDEX idx_categorias_ruta_ids
+ON categorias USING gist(ruta_ids);
+
+-- Índices para estadísticas (BRIN: tablas particionadas, solo inserción por fecha)
+CREATE INDEX idx_estadisticas_fecha
+ON estadisticas_anonimas USING brin(fecha);
+
+CREATE INDEX idx_estadisticas_tipo
+ON estadisticas_anonimas(tipo_consulta);
+
+-- Índices para logs
+CREATE INDEX idx_logs_fecha
+ON sistema_logs USING brin(fecha);
+
+CREATE INDEX idx_logs_nivel
+ON sistema_logs(nivel);
+
+CREATE INDEX idx_logs_modulo
+ON sistema_logs(modulo);
+
+-- Ruta de la categoría a partir de la ruta ya guardada del padre: O(1) por fila.
+-- En cargas masivas: SET LOCAL unsa.diferir_rutas = 'on' y al final
+-- SELECT recalcular_rutas_categorias();
+CREATE OR REPLACE FUNCTION calcular_ruta_categoria()
+RETURNS TRIGGER AS $$
+DECLARE
+    padre RECORD;
+BEGIN
+    IF current_setting('unsa.diferir_rutas', true) = 'on' THEN
+        RETURN NEW;
+    END IF;
+
+    IF NEW.padre_id IS NULL THEN
+        NEW.ruta := NEW.nombre;
+        NEW.ruta_ids := text2ltree(NEW.id::TEXT);
+        NEW.nivel := 0;
+        RETURN NEW;
+    END IF;
+
+    SELECT ruta, ruta_ids, nivel INTO padre
+    FROM categorias
+    WHERE id = NEW.padre_id;
+    IF NOT FOUND THEN
+        RETURN NEW; -- la FK informa el error
+    END IF;
+    IF padre.ruta_ids IS NULL THEN
+        RAISE EXCEPTION 'La categoría padre % no tiene ruta (carga diferida sin recalcular_rutas_categorias())', NEW.padre_id;
+    END IF;
+    IF TG_OP = 'UPDATE' AND padre.ruta_ids <@ OLD.ruta_ids THEN
+        RAISE EXCEPTION 'Ciclo: la categoría % no puede depender de su descendiente %', NEW.id, NEW.padre_id;
+    END IF;
+
+    NEW.ruta := padre.ruta || ' > ' || NEW.nombre;
+    NEW.ruta_ids := padre.ruta_ids || NEW.id::TEXT;
+    NEW.nivel := padre.nivel + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Al renombrar o mover una categoría se reescribe solo su subárbol (índice GiST)
+CREATE OR REPLACE FUNCTION propagar_ruta_subarbol()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF current_setting('unsa.diferir_rutas', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF NEW.ruta IS DISTINCT FROM OLD.ruta OR NEW.ruta_ids IS DISTINCT FROM OLD.ruta_ids THEN
+        -- Solo cambia columnas de ruta: no vuelve a disparar los triggers de nombre/padre_id
+        UPDATE categorias
+        SET ruta = NEW.ruta || substr(ruta, length(OLD.ruta) + 1),
+            ruta_ids = NEW.ruta_ids || subpath(ruta_ids, nlevel(OLD.ruta_ids)),
+            nivel = nivel - OLD.nivel + NEW.nivel
+        WHERE ruta_ids <@ OLD.ruta_ids
+          AND id <> NEW.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recalcula todas las rutas en una sola pasada (después de una carga diferida)
+CREATE OR REPLACE FUNCTION recalcular_rutas_categorias()
+RETURNS INTEGER AS $$
+DECLARE
+    filas INTEGER;
+BEGIN
+    WITH RECURSIVE arbol AS (
+        SELECT id, nombre::TEXT AS ruta, text2ltree(id::TEXT) AS ruta_ids, 0 AS nivel
+        FROM categorias
+        WHERE padre_id IS NULL
+        UNION ALL
+        SELECT c.id, a.ruta || ' > ' || c.nombre, a.ruta_ids || c.id::TEXT, a.nivel + 1
+        FROM categorias c
+        JOIN arbol a ON c.padre_id = a.id
+    )
+    UPDATE categorias c
+    SET ruta = a.ruta, ruta_ids = a.ruta_ids, nivel = a.nivel
+    FROM arbol a
+    WHERE c.id = a.id
+      AND (c.ruta IS DISTINCT FROM a.ruta
+           OR c.ruta_ids IS DISTINCT FROM a.ruta_ids
+           OR c.nivel IS DISTINCT FROM a.nivel);
+    GET DIAGNOSTICS filas = ROW_COUNT;
+    RETURN filas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers para mantener rutas actualizadas
+DROP TRIGGER IF EXISTS trigger_actualizar_ruta ON categorias;
+CREATE TRIGGER trigger_actualizar_ruta
+BEFORE INSERT OR UPDATE OF nombre, padre_id ON categorias
+FOR EACH ROW
+EXECUTE FUNCTION calcular_ruta_categoria();
+
+DROP TRIGGER IF EXISTS trigger_ruta_subarbol ON categorias;
+CREATE TRIGGER trigger_ruta_subarbol
+AFTER UPDATE OF nombre, padre_id ON categorias
+FOR EACH ROW
+EXECUTE FUNCTION propagar_ruta_subarbol();
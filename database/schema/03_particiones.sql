@@ -0,0 +1,142 @@
+-- ====================================================
+-- Particionado mensual de sistema_logs y estadisticas_anonimas
+-- ====================================================
+-- Única definición de la política y las funciones: la usan la instalación
+-- nueva (docker-entrypoint-initdb.d, después de 01_tables.sql) y
+-- migration_005, que exige aplicar este archivo antes.
+-- No crea particiones: eso lo hace 04_mantenimiento.sql (o la migración)
+-- cuando las tablas ya existen. Mantenimiento diario (cron o pg_cron):
+--   SELECT * FROM mantener_particiones();
+-- o bien: python database/mantener_particiones.py
+-- Las consultas por rango de fecha (logs) o de (año, mes) (estadísticas)
+-- solo recorren las particiones de ese rango (partition pruning).
+
+-- ==================== POLÍTICA DE RETENCIÓN ====================
+
+CREATE TABLE IF NOT EXISTS politica_particiones (
+    tabla VARCHAR(100) PRIMARY KEY,
+    meses_adelante INTEGER NOT NULL DEFAULT 3,
+    meses_retencion INTEGER NOT NULL,
+    accion VARCHAR(10) NOT NULL DEFAULT 'drop' CHECK (accion IN ('drop', 'detach'))
+);
+
+-- detach: la partición queda como tabla suelta (para archivar con pg_dump)
+INSERT INTO politica_particiones (tabla, meses_retencion, accion) VALUES
+    ('sistema_logs', 3, 'drop'),
+    ('estadisticas_anonimas', 24, 'detach')
+ON CONFLICT (tabla) DO NOTHING;
+
+-- ==================== FUNCIONES ====================
+
+-- Límites FOR VALUES del mes: sistema_logs por fecha, estadísticas por (año, mes)
+CREATE OR REPLACE FUNCTION limites_particion(nombre_tabla TEXT, mes DATE)
+RETURNS TEXT AS $$
+DECLARE
+    siguiente DATE := (mes + INTERVAL '1 month')::DATE;
+BEGIN
+    IF nombre_tabla = 'estadisticas_anonimas' THEN
+        RETURN format('FROM (%s, %s) TO (%s, %s)',
+                      extract(year FROM mes)::INT, extract(month FROM mes)::INT,
+                      extract(year FROM siguiente)::INT, extract(month FROM siguiente)::INT);
+    END IF;
+    RETURN format('FROM (%L) TO (%L)', mes, siguiente);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Filas del mes (para moverlas desde la partición DEFAULT)
+CREATE OR REPLACE FUNCTION filtro_particion(nombre_tabla TEXT, mes DATE)
+RETURNS TEXT AS $$
+BEGIN
+    IF nombre_tabla = 'estadisticas_anonimas' THEN
+        RETURN format('año = %s AND mes = %s', extract(year FROM mes)::INT, extract(month FROM mes)::INT);
+    END IF;
+    RETURN format('fecha >= %L AND fecha < %L', mes, (mes + INTERVAL '1 month')::DATE);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Crea <tabla>_YYYY_MM; si la DEFAULT ya recibió filas de ese mes, las mueve
+CREATE OR REPLACE FUNCTION crear_particion_mensual(nombre_tabla TEXT, mes DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    inicio DATE := date_trunc('month', mes)::DATE;
+    particion TEXT := format('%s_%s', nombre_tabla, to_char(inicio, 'YYYY_MM'));
+    defecto TEXT := nombre_tabla || '_default';
+    filtro TEXT := filtro_particion(nombre_tabla, inicio);
+    con_filas BOOLEAN;
+BEGIN
+    IF to_regclass(particion) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %s)', defecto, filtro) INTO con_filas;
+    IF con_filas THEN
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', nombre_tabla, defecto);
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES %s',
+                       particion, nombre_tabla, limites_particion(nombre_tabla, inicio));
+        EXECUTE format('WITH movidas AS (DELETE FROM %I WHERE %s RETURNING *) INSERT INTO %I SELECT * FROM movidas',
+                       defecto, filtro, nombre_tabla);
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', nombre_tabla, defecto);
+    ELSE
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES %s',
+                       particion, nombre_tabla, limites_particion(nombre_tabla, inicio));
+    END IF;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Retira (DETACH + DROP, o solo DETACH) las particiones fuera de la retención:
+-- operación de catálogo, sin DELETE masivo ni bloat
+CREATE OR REPLACE FUNCTION aplicar_retencion(nombre_tabla TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    pol RECORD;
+    part RECORD;
+    limite DATE;
+    retiradas INTEGER := 0;
+BEGIN
+    SELECT * INTO pol FROM politica_particiones WHERE tabla = nombre_tabla;
+    IF NOT FOUND THEN
+        RETURN 0;
+    END IF;
+    limite := (date_trunc('month', CURRENT_DATE) - make_interval(months => pol.meses_retencion))::DATE;
+
+    FOR part IN
+        SELECT c.relname::TEXT AS nombre,
+               to_date(substring(c.relname FROM '(\d{4}_\d{2})$'), 'YYYY_MM') AS mes
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = nombre_tabla::regclass
+          AND c.relname ~ '_\d{4}_\d{2}$'
+        ORDER BY 2
+    LOOP
+        EXIT WHEN part.mes >= limite;
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', nombre_tabla, part.nombre);
+        IF pol.accion = 'drop' THEN
+            EXECUTE format('DROP TABLE %I', part.nombre);
+        END IF;
+        retiradas := retiradas + 1;
+    END LOOP;
+    RETURN retiradas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Mantenimiento periódico (diario): particiones futuras + retención
+CREATE OR REPLACE FUNCTION mantener_particiones()
+RETURNS TABLE(nombre_tabla TEXT, creadas INTEGER, retiradas INTEGER) AS $$
+DECLARE
+    pol RECORD;
+    i INTEGER;
+BEGIN
+    FOR pol IN SELECT * FROM politica_particiones ORDER BY tabla LOOP
+        nombre_tabla := pol.tabla;
+        creadas := 0;
+        FOR i IN 0..pol.meses_adelante LOOP
+            IF crear_particion_mensual(pol.tabla, (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::DATE) THEN
+                creadas := creadas + 1;
+            END IF;
+        END LOOP;
+        retiradas := aplicar_retencion(pol.tabla);
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,8 @@
+-- ====================================================
+-- Particiones iniciales (instalación nueva)
+-- ====================================================
+-- Corre al final de docker-entrypoint-initdb.d: las tablas (01_tables.sql) y
+-- las funciones (03_particiones.sql) ya existen.
+
+-- Particiones del mes actual y los siguientes
+SELECT * FROM mantener_particiones();
@@ -0,0 +1,109 @@
+# ./frontend/bot/debounce.py
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import logger
+from .tracing import emit_span
+
+# handler(update del último mensaje, contexto, texto unido, cantidad de mensajes)
+BurstHandler = Callable[[Any, Any, str, int], Awaitable[None]]
+
+
+@dataclass
+class _Burst:
+    parts: List[str] = field(default_factory=list)
+    first_at: float = 0.0
+    first_wall: float = 0.0         # epoch del primer mensaje (para el span)
+    update: Any = None
+    context: Any = None
+    timer: Optional[asyncio.Task] = None
+
+
+class MessageDebouncer:
+    """
+    Agrupa ráfagas de mensajes de un mismo chat en una sola consulta.
+    La ráfaga se procesa cuando pasan `window` segundos sin mensajes nuevos, o
+    a los `max_wait` segundos del primero. Si el último mensaje parece completo
+    (termina en ?/./! o la ráfaga llega a `complete_words` palabras) se procesa
+    enseguida: la espera queda solo para fragmentos sueltos. Las ráfagas de un
+    chat se procesan en orden: la siguiente espera a que termine la anterior.
+    """
+    COMPLETE_ENDINGS = ("?", ".", "!")
+
+    def __init__(self, handler: BurstHandler, window: float = 0.4, max_wait: float = 4.0,
+                 complete_words: int = 8):
+        self.handler = handler
+        self.window = window
+        self.max_wait = max_wait
+        self.complete_words = complete_words
+        self.bursts: Dict[int, _Burst] = {}
+        self.running: Dict[int, asyncio.Task] = {}
+        self.stats = {"messages": 0, "bursts": 0, "merged": 0, "max_burst": 0, "immediate": 0}
+
+    def submit(self, chat_id: int, update, context, text: str):
+        """Encola el mensaje y reprograma el cierre de la ráfaga (no bloquea)"""
+        now = time.monotonic()
+        burst = self.bursts.get(chat_id)
+        if burst is None:
+            burst = self.bursts[chat_id] = _Burst(first_at=now, first_wall=time.time())
+        burst.parts.append(text)
+        burst.update, burst.context = update, context
+        self.stats["messages"] += 1
+
+        if burst.timer:
+            burst.timer.cancel()
+        if self._looks_complete(burst):
+            self.stats["immediate"] += 1
+            delay = 0.0
+        else:
+            delay = min(self.window, max(0.0, burst.first_at + self.max_wait - now))
+        burst.timer = asyncio.create_task(self._close_after(chat_id, burst, delay))
+
+    def _looks_complete(self, burst: _Burst) -> bool:
+        if burst.parts[-1].rstrip().endswith(self.COMPLETE_ENDINGS):
+            return True
+        return sum(len(part.split()) for part in burst.parts) >= self.complete_words
+
+    async def _close_after(self, chat_id: int, burst: _Burst, delay: float):
+        await asyncio.sleep(delay)
+        if self.bursts.get(chat_id) is not burst:
+            return
+        del self.bursts[chat_id]
+        previous = self.running.get(chat_id)
+        task = asyncio.create_task(self._run(chat_id, burst, previous))
+        self.running[chat_id] = task
+
+    async def _run(self, chat_id: int, burst: _Burst, previous: Optional[asyncio.Task]):
+        if previous and not previous.done():
+            await asyncio.wait([previous])
+        count = len(burst.parts)
+        # La tarea hereda la traza del último update de la ráfaga
+        emit_span("rafaga", burst.first_wall, (time.time() - burst.first_wall) * 1000, parts=count)
+        self.stats["bursts"] += 1
+        self.stats["merged"] += count - 1
+        self.stats["max_burst"] = max(self.stats["max_burst"], count)
+        if count > 1:
+            logger.debug("🧩 %d mensajes unidos en una consulta", count)
+        try:
+            await self.handler(burst.update, burst.context, " ".join(burst.parts), count)
+        except Exception as e:
+            logger.error("❌ Error procesando ráfaga de mensajes: %s", e)
+        finally:
+            if self.running.get(chat_id) is asyncio.current_task():
+                del self.running[chat_id]
+
+    @property
+    def calls_saved(self) -> int:
+        """Ejecuciones del pipeline evitadas (cada mensaje unido habría sido una)"""
+        return self.stats["merged"]
+
+    async def close(self):
+        """Al apagar: descarta ráfagas sin cerrar y espera las que están en curso"""
+        for burst in self.bursts.values():
+            if burst.timer:
+                burst.timer.cancel()
+        self.bursts.clear()
+        if self.running:
+            await asyncio.wait(list(self.running.values()), timeout=self.max_wait)
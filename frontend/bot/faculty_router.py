@@ -0,0 +1,78 @@
+# ./frontend/bot/faculty_router.py
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Partición compartida: siempre se consulta junto con la facultad detectada
+GENERAL = "General"
+
+# Mismas etiquetas que database/generar_sql_general.detectar_facultad
+# (alias sin acentos; frases de varias palabras permitidas)
+FACULTY_ALIASES: Dict[str, List[str]] = {
+    "Exactas": [
+        "exactas", "ciencias exactas", "fisica", "matematica", "informatica",
+        "computacion", "estadistica", "energias renovables", "energia renovable",
+    ],
+    "Ingeniería": ["ingenieria", "ingeniero", "ingeniera"],
+    "Humanidades": [
+        "humanidades", "letras", "filosofia", "historia", "antropologia",
+        "ciencias de la educacion", "comunicacion social",
+    ],
+    "Salud": ["salud", "ciencias de la salud", "enfermeria", "nutricion", "medicina"],
+    "Naturales": ["naturales", "ciencias naturales", "biologia", "geologia", "agronomia", "recursos naturales"],
+    "Económicas": ["economicas", "ciencias economicas", "economia", "contador", "contaduria", "administracion"],
+    "Orán": ["oran", "sede oran"],
+    "Tartagal": ["tartagal", "sede tartagal"],
+}
+
+
+@dataclass
+class RouteDecision:
+    """Decisión de ruteo de una consulta (expuesta para depuración)"""
+    faculties: Optional[List[str]]            # None = todas las particiones
+    matches: Dict[str, List[str]] = field(default_factory=dict)
+    reason: str = ""
+
+    def describe(self) -> str:
+        if self.faculties is None:
+            return f"todas las facultades ({self.reason})"
+        found = ", ".join(f"{fac} ← {'/'.join(words)}" for fac, words in self.matches.items())
+        return f"{' + '.join(self.faculties)} ({found})"
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text))
+
+
+class FacultyRouter:
+    """Detecta la(s) facultad(es) que nombra la consulta para podar particiones"""
+    def __init__(self, aliases: Dict[str, List[str]] = None, max_faculties: int = 2):
+        self.max_faculties = max_faculties
+        self.patterns = {
+            faculty: re.compile(r"\b(" + "|".join(re.escape(a) for a in sorted(words, key=len, reverse=True)) + r")\b")
+            for faculty, words in (aliases or FACULTY_ALIASES).items()
+        }
+        self.stats: Dict[str, int] = {"routed": 0, "global": 0, "fallbacks": 0}
+
+    def route(self, query: str) -> RouteDecision:
+        text = _normalize(query)
+        matches = {}
+        for faculty, pattern in self.patterns.items():
+            found = pattern.findall(text)
+            if found:
+                matches[faculty] = sorted(set(found))
+
+        if not matches:
+            self.stats["global"] += 1
+            return RouteDecision(None, reason="sin facultad en la consulta")
+        if len(matches) > self.max_faculties:
+            self.stats["global"] += 1
+            return RouteDecision(None, matches, reason=f"{len(matches)} facultades mencionadas")
+
+        self.stats["routed"] += 1
+        for faculty in matches:
+            self.stats[faculty] = self.stats.get(faculty, 0) + 1
+        return RouteDecision(list(matches) + [GENERAL], matches)
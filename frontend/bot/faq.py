@@ -0,0 +1,221 @@
+# ./frontend/bot/faq.py
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+from .config import logger
+from .spelling import normalize_word_text
+from .utils import anonymize_message
+
+# Preguntas más largas son demasiado específicas para reutilizar una respuesta
+MAX_FAQ_TERMS = 6
+
+# Relleno que no cambia la respuesta: "hola, quisiera saber qué becas hay" == "becas"
+FAQ_STOPWORDS = {
+    'a', 'al', 'con', 'de', 'del', 'en', 'para', 'por', 'sobre', 'el', 'la', 'lo', 'los', 'las',
+    'un', 'una', 'unos', 'unas', 'y', 'o', 'u', 'que', 'cual', 'cuales', 'como', 'hay', 'es', 'son',
+    'me', 'mi', 'se', 'te', 'tu', 'quiero', 'quisiera', 'saber', 'podes', 'podrias', 'decir',
+    'decime', 'informacion', 'info', 'favor', 'gracias', 'hola', 'buenas', 'existen', 'tienen',
+}
+
+SELECT_ANSWERS = """
+SELECT pregunta_normalizada, respuesta, modo, fragmento_ids
+FROM respuestas_precalculadas
+WHERE aprobada AND vigente
+"""
+
+UPSERT_MISSES = """
+INSERT INTO preguntas_frecuentes (pregunta_normalizada, pregunta_ejemplo, consultas)
+SELECT * FROM unnest($1::VARCHAR[], $2::VARCHAR[], $3::INT[])
+ON CONFLICT (pregunta_normalizada) DO UPDATE SET
+    consultas = preguntas_frecuentes.consultas + EXCLUDED.consultas,
+    ultima_consulta = CURRENT_TIMESTAMP
+"""
+
+
+SELECT_INSERTED = """
+SELECT f.contenido, f.categoria, f.palabras_clave
+FROM fragmentos_conocimiento f
+JOIN unnest($1::TEXT[], $2::TEXT[]) AS c(fuente, hash)
+  ON f.fuente = c.fuente AND f.hash_contenido = c.hash::CHAR(64)
+"""
+
+
+def _word_forms(words) -> set:
+    """Palabras con su singular aproximado: 'becas' y 'beca' deben coincidir"""
+    forms = set()
+    for w in words:
+        forms.add(w)
+        if len(w) > 3 and w.endswith("s"):
+            forms.add(w[:-1])
+            if w.endswith("es"):
+                forms.add(w[:-2])
+    return forms
+
+
+def normalize_question(msg: str, spelling=None) -> str:
+    """
+    Clave de FAQ: términos significativos sin acentos, corregidos y ordenados.
+    Cadena vacía si la pregunta no es candidata (sin términos o demasiado larga).
+    """
+    words = re.findall(r"[a-z0-9]+", normalize_word_text(msg))
+    terms = [w for w in words if w not in FAQ_STOPWORDS and len(w) >= 2]
+    if not terms or len(terms) > MAX_FAQ_TERMS:
+        return ""
+    if spelling is not None:
+        terms = spelling.correct_terms(terms)
+    return " ".join(sorted(set(terms)))[:200]
+
+
+@dataclass
+class FaqAnswer:
+    answer: str
+    mode: str
+    fragment_ids: FrozenSet[str]
+
+
+class FaqStore:
+    """
+    Respuestas precalculadas en memoria (clave normalizada → respuesta) y
+    contador de preguntas sin respuesta para alimentar el job offline.
+    """
+    def __init__(self, get_pool: Callable, get_spelling: Callable = lambda: None,
+                 reload_interval: float = 300.0, max_misses: int = 5000):
+        self.get_pool = get_pool
+        self.get_spelling = get_spelling
+        self.reload_interval = reload_interval
+        self.max_misses = max_misses
+        self.answers: Dict[str, FaqAnswer] = {}
+        self.misses: Dict[str, List] = {}  # clave → [consultas, ejemplo anonimizado]
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0, "loads": 0, "errors": 0}
+
+    def key(self, msg: str) -> str:
+        return normalize_question(msg, self.get_spelling())
+
+    def match(self, key: str) -> Optional[FaqAnswer]:
+        """Búsqueda O(1) de la respuesta precalculada"""
+        answer = self.answers.get(key) if key else None
+        if answer:
+            self.stats["hits"] += 1
+        return answer
+
+    def record_miss(self, key: str, msg: str):
+        """Cuenta una pregunta candidata que no tenía respuesta precalculada"""
+        if not key:
+            return
+        self.stats["misses"] += 1
+        entry = self.misses.get(key)
+        if entry is None:
+            if len(self.misses) >= self.max_misses:
+                return
+            entry = self.misses[key] = [0, anonymize_message(msg)]
+        entry[0] += 1
+
+    async def load(self) -> int:
+        """Recarga las respuestas aprobadas y vigentes (tabla pequeña)"""
+        pool = self.get_pool()
+        if pool is None:
+            return 0
+        try:
+            rows = await pool.fetch(SELECT_ANSWERS)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning("⚠️ Respuestas precalculadas no disponibles: %s", e)
+            return 0
+        self.answers = {
+            r["pregunta_normalizada"]: FaqAnswer(r["respuesta"], r["modo"], frozenset(r["fragmento_ids"]))
+            for r in rows
+        }
+        self.stats["loads"] += 1
+        logger.debug("📚 %d respuestas precalculadas cargadas", len(self.answers))
+        return len(self.answers)
+
+    async def flush_misses(self) -> int:
+        pool = self.get_pool()
+        if not self.misses or pool is None:
+            return 0
+        batch, self.misses = self.misses, {}
+        try:
+            await pool.execute(
+                UPSERT_MISSES,
+                list(batch), [example for _, example in batch.values()], [count for count, _ in batch.values()]
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("❌ Error volcando preguntas frecuentes: %s", e)
+            for key, (count, example) in batch.items():
+                if key in self.misses or len(self.misses) < self.max_misses:
+                    self.misses.setdefault(key, [0, example])[0] += count
+            return 0
+        return len(batch)
+
+    async def _keys_for_inserts(self, inserted) -> List[str]:
+        """
+        Claves cuyas respuestas pueden quedar incompletas con los fragmentos nuevos:
+        las que comparten algún término con su contenido, categoría o palabras clave
+        (una beca nueva invalida "becas", aunque la respuesta no la referencie).
+        """
+        pool = self.get_pool()
+        if pool is None or not self.answers:
+            return []
+        try:
+            rows = await pool.fetch(
+                SELECT_INSERTED, [c["fuente"] for c in inserted], [c["hash_contenido"] for c in inserted]
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("❌ Error leyendo fragmentos nuevos para invalidar FAQ: %s", e)
+            return []
+        words = set()
+        for r in rows:
+            text = " ".join([r["contenido"] or "", r["categoria"] or "", " ".join(r["palabras_clave"] or [])])
+            words.update(re.findall(r"[a-z0-9]+", normalize_word_text(text)))
+        forms = _word_forms(words)
+        return [key for key in self.answers if _word_forms(key.split()) & forms]
+
+    async def on_changes(self, cambios):
+        """
+        Listener del feed de cambios: invalida respuestas cuyos fragmentos cambiaron
+        o se borraron, y las que tocan los temas de fragmentos insertados.
+        """
+        changed = {c["fragmento_id"] for c in cambios if c["operacion"] in ("update", "delete")}
+        inserted = [c for c in cambios if c["operacion"] == "insert"]
+        if not changed and not inserted:
+            return
+        stale = {k for k, a in self.answers.items() if a.fragment_ids & changed}
+        if inserted:
+            stale.update(await self._keys_for_inserts(inserted))
+        for key in stale:
+            self.answers.pop(key, None)
+        self.stats["invalidated"] += len(stale)
+
+        pool = self.get_pool()
+        if pool is None:
+            return
+        try:
+            updated = await pool.execute(
+                """
+                UPDATE respuestas_precalculadas SET vigente = FALSE
+                WHERE vigente AND (fragmento_ids && $1::TEXT[] OR pregunta_normalizada = ANY($2::TEXT[]))
+                """,
+                list(changed), list(stale)
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("❌ Error invalidando respuestas precalculadas: %s", e)
+            return
+        if stale:
+            logger.info("📚 %d respuestas precalculadas invalidadas (%s)", len(stale), updated)
+
+    async def run(self, stop_event: asyncio.Event):
+        """Recarga periódica (recoge lo que genera el job) y volcado de preguntas sin respuesta"""
+        await self.load()
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.reload_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush_misses()
+            if not stop_event.is_set():
+                await self.load()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Precálculo offline de respuestas frecuentes (FAQ)
+Toma las preguntas normalizadas más consultadas (preguntas_frecuentes, que
+alimenta el bot) y las semillas de PREGUNTAS_SEMILLA, ejecuta recuperación y
+generación en lote y guarda cada respuesta validada con los ids de los
+fragmentos de los que depende. El bot las sirve desde memoria sin llamar al
+LLM y las marca como no vigentes cuando uno de esos fragmentos cambia; la
+siguiente corrida del job solo regenera esas.
+
+Uso: python -m frontend.bot.faq_precompute --top 50 --min-consultas 5 [--dry-run]
+"""
+import argparse
+import asyncio
+import re
+import sys
+import time
+from typing import List, Optional
+
+from .config import DATABASE_URL, logger
+from .faq import normalize_question
+from .models import ResponseMode
+from .retriever import PostgresRetriever
+from .spelling import normalize_word_text
+from .telegram.telegram_bot_postgres import BotManager, load_prompts
+
+# Siempre presentes aunque todavía no haya tráfico registrado
+PREGUNTAS_SEMILLA = [
+    "carreras de física",
+    "qué becas hay",
+    "inscripción",
+    "fechas de inscripción",
+    "contacto de exactas",
+    "qué carreras hay",
+]
+
+CANDIDATAS = """
+SELECT p.pregunta_normalizada, p.pregunta_ejemplo, p.consultas
+FROM preguntas_frecuentes p
+LEFT JOIN respuestas_precalculadas r USING (pregunta_normalizada)
+WHERE p.consultas >= $1
+  AND ($2 OR r.pregunta_normalizada IS NULL OR NOT r.vigente)
+ORDER BY p.consultas DESC
+LIMIT $3
+"""
+
+VIGENTES = "SELECT pregunta_normalizada FROM respuestas_precalculadas WHERE vigente"
+
+GUARDAR = """
+INSERT INTO respuestas_precalculadas
+    (pregunta_normalizada, pregunta_ejemplo, respuesta, modo, fragmento_ids, aprobada, vigente)
+VALUES ($1, $2, $3, $4, $5, $6, TRUE)
+ON CONFLICT (pregunta_normalizada) DO UPDATE SET
+    pregunta_ejemplo = EXCLUDED.pregunta_ejemplo,
+    respuesta = EXCLUDED.respuesta,
+    modo = EXCLUDED.modo,
+    fragmento_ids = EXCLUDED.fragmento_ids,
+    aprobada = EXCLUDED.aprobada,
+    vigente = TRUE,
+    fecha_generacion = CURRENT_TIMESTAMP
+"""
+
+SIN_INFORMACION = ("no tengo información", "no encontré", "no cuento con", "no dispongo")
+
+
+def validar_respuesta(respuesta: str, contexto: str, modo: str) -> Optional[str]:
+    """Motivo de rechazo, o None si la respuesta puede servirse sin revisión"""
+    if not respuesta:
+        return "respuesta vacía"
+    if not 20 <= len(respuesta) <= 3000:
+        return f"longitud fuera de rango ({len(respuesta)})"
+    texto = normalize_word_text(respuesta)
+    if any(frase in texto for frase in (normalize_word_text(f) for f in SIN_INFORMACION)):
+        return "el modelo no encontró información"
+    if modo == "llm":
+        # Respaldo: la mitad de las palabras largas de la respuesta deben estar en el contexto
+        palabras = set(re.findall(r"[a-z]{6,}", texto))
+        contexto_palabras = set(re.findall(r"[a-z]{6,}", normalize_word_text(contexto)))
+        if palabras and len(palabras & contexto_palabras) / len(palabras) < 0.5:
+            return "poco respaldo en el contexto recuperado"
+    return None
+
+
+async def precalcular(manager: BotManager, clave: str, pregunta: str) -> Optional[dict]:
+    retriever = manager.retriever
+    contexto, resultados, modo = await retriever.retrieve(pregunta, limit=20, track_usage=False)
+    if modo == ResponseMode.FALLBACK:
+        return None
+
+    if modo == ResponseMode.DIRECT:
+        respuesta = retriever.build_direct_response(resultados)
+        usados = resultados[:3]
+    else:
+        respuesta = await manager._call_llm('main', {"context": contexto, "question": pregunta}, "faq")
+        usados = resultados
+
+    return {
+        "clave": clave,
+        "pregunta": pregunta,
+        "respuesta": respuesta,
+        "modo": modo.value,
+        "fragmentos": [str(r.id) for r in usados],
+        "motivo": validar_respuesta(respuesta, contexto, modo.value),
+    }
+
+
+async def main_async(args):
+    retriever = PostgresRetriever(DATABASE_URL)
+    manager = BotManager(retriever, prompts=load_prompts())
+    inicio = time.perf_counter()
+    try:
+        if not await retriever.connect():
+            raise ConnectionError("no se pudo conectar a PostgreSQL")
+        await manager.init_session()
+        # Las claves deben coincidir con las del bot, que corrige ortografía
+        if retriever.spelling_task:
+            await retriever.spelling_task
+
+        async with retriever.pool.acquire() as conn:
+            filas = await conn.fetch(CANDIDATAS, args.min_consultas, args.todas, args.top)
+            vigentes = {r["pregunta_normalizada"] for r in await conn.fetch(VIGENTES)}
+
+        candidatas = {r["pregunta_normalizada"]: r["pregunta_ejemplo"] for r in filas}
+        for pregunta in PREGUNTAS_SEMILLA:
+            clave = normalize_question(pregunta, retriever.spelling)
+            if clave and clave not in candidatas and (args.todas or clave not in vigentes):
+                candidatas[clave] = pregunta
+        print(f"📋 {len(candidatas)} preguntas a precalcular ({len(vigentes)} vigentes)")
+
+        semaforo = asyncio.Semaphore(args.concurrencia)
+
+        async def tarea(clave, pregunta):
+            async with semaforo:
+                return await precalcular(manager, clave, pregunta)
+
+        generadas: List[dict] = [
+            r for r in await asyncio.gather(*(tarea(c, p) for c, p in candidatas.items())) if r
+        ]
+
+        aprobadas = [g for g in generadas if g["motivo"] is None]
+        for g in generadas:
+            if g["motivo"]:
+                print(f"  ⚠️ '{g['pregunta']}': {g['motivo']}")
+
+        if not args.dry_run and generadas:
+            async with retriever.pool.acquire() as conn:
+                await conn.executemany(GUARDAR, [
+                    (g["clave"], g["pregunta"], g["respuesta"], g["modo"], g["fragmentos"], g["motivo"] is None)
+                    for g in generadas
+                ])
+
+        llm = sum(1 for g in generadas if g["modo"] == "llm")
+        print(f"✅ {len(generadas)} generadas ({llm} con LLM), {len(aprobadas)} aprobadas, "
+              f"{len(candidatas) - len(generadas)} sin información"
+              f"{' [dry-run]' if args.dry_run else ''} en {time.perf_counter() - inicio:.1f}s")
+    finally:
+        await manager.close_resources()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precalcula respuestas para las preguntas frecuentes")
+    parser.add_argument("--top", type=int, default=50, help="máximo de preguntas registradas a procesar")
+    parser.add_argument("--min-consultas", type=int, default=5)
+    parser.add_argument("--concurrencia", type=int, default=4, help="preguntas en paralelo")
+    parser.add_argument("--todas", action="store_true", help="regenerar también las respuestas vigentes")
+    parser.add_argument("--dry-run", action="store_true", help="generar y validar sin guardar")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args))
+    except Exception as e:
+        logger.error("❌ Error en el precálculo de FAQ: %s", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# ./frontend/bot/greetings.py
+import os
+import random
+import re
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import List
+
+import yaml
+
+from .config import logger
+
+GREETINGS_PATH = Path(__file__).parent / "telegram" / "greetings.yaml"
+
+GREETING_WORDS = {
+    "hola", "buenas", "buen", "hey", "saludos", "como va", "hi", "holaa", "holaaa"
+}
+
+# Relleno de cortesía: "hola, buen día, ¿cómo estás?" sigue siendo solo un saludo
+SMALL_TALK_WORDS = GREETING_WORDS | {
+    "dia", "dias", "tarde", "tardes", "noche", "noches", "como", "va", "estas", "esta", "andas",
+    "todo", "bien", "que", "tal", "che", "yogui", "bot", "gracias", "ola", "hello", "y", "vos",
+}
+
+DEFAULT_GREETING = (
+    "👋 YoguI A, el asistente no oficial te saluda.\n\n"
+    "Podés preguntarme sobre becas, carreras, inscripciones o trámites.\n"
+    "Usá /help para ver los comandos."
+)
+
+
+def greeting_tokens(msg: str) -> List[str]:
+    text = msg.lower()
+    for acc, no_acc in (("á", "a"), ("é", "e"), ("í", "i"), ("ó", "o"), ("ú", "u")):
+        text = text.replace(acc, no_acc)
+    return re.sub(r"[^\w\s]", "", text).split()
+
+
+def is_greeting(tokens: List[str]) -> bool:
+    return any(t in GREETING_WORDS for t in tokens)
+
+
+def is_small_talk(tokens: List[str]) -> bool:
+    """Saludo puro: ningún término fuera del saludo/cortesía (si no, es una consulta)"""
+    return bool(tokens) and all(t in SMALL_TALK_WORDS for t in tokens)
+
+
+class GreetingPool:
+    """
+    Respuestas de saludo pregeneradas (greetings_refresh.py) servidas desde
+    memoria, rotando y sin repetir las últimas `repeat_window` de cada chat.
+    El archivo se relee cuando cambia (como mucho cada `reload_interval` s).
+    """
+    def __init__(self, path: Path = GREETINGS_PATH, repeat_window: int = 3,
+                 max_chats: int = 10000, reload_interval: float = 60.0):
+        self.path = path
+        self.repeat_window = repeat_window
+        self.max_chats = max_chats
+        self.reload_interval = reload_interval
+        self.responses: List[str] = []
+        self.recent: "OrderedDict[int, deque]" = OrderedDict()  # chat → índices servidos
+        self.mtime = 0.0
+        self.last_check = 0.0
+        self.stats = {"served": 0, "reloads": 0}
+        self.reload()
+
+    def reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if not self.responses:
+                logger.warning("⚠️ Sin pool de saludos en %s: se usa el saludo por defecto", self.path)
+            return
+        if mtime == self.mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+            responses = [r.strip() for r in data.get("responses", []) if isinstance(r, str) and r.strip()]
+        except Exception as e:
+            logger.error("❌ Error leyendo pool de saludos: %s", e)
+            return
+        self.mtime = mtime
+        if responses:
+            self.responses = responses
+            self.recent.clear()
+            self.stats["reloads"] += 1
+            logger.info("👋 Pool de saludos: %d respuestas", len(responses))
+
+    def pick(self, chat_id: int) -> str:
+        """Saludo para el chat, evitando los últimos servidos en ese chat"""
+        now = time.monotonic()
+        if now - self.last_check >= self.reload_interval:
+            self.last_check = now
+            self.reload()
+        if not self.responses:
+            return DEFAULT_GREETING
+
+        recent = self.recent.pop(chat_id, None)
+        # Con pool chico se relaja el límite para que siempre quede una opción
+        window = min(self.repeat_window, len(self.responses) - 1)
+        if recent is None or recent.maxlen != window:
+            recent = deque(recent or (), maxlen=max(window, 0))
+        candidates = [i for i in range(len(self.responses)) if i not in recent]
+        index = random.choice(candidates)
+        if window > 0:
+            recent.append(index)
+
+        self.recent[chat_id] = recent
+        if len(self.recent) > self.max_chats:
+            self.recent.popitem(last=False)
+        self.stats["served"] += 1
+        return self.responses[index]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Regenera offline el pool de saludos a partir de la plantilla 'greeting'
+Llama al servidor de inferencia con saludos variados, descarta respuestas
+vacías, repetidas o fuera de rango y escribe telegram/greetings.yaml de forma
+atómica. El bot relee el archivo al detectar el cambio, sin reiniciarse.
+
+Uso: python -m frontend.bot.greetings_refresh --cantidad 20 [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+import yaml
+
+from .config import DATABASE_URL, logger
+from .greetings import GREETINGS_PATH
+from .retriever import PostgresRetriever
+from .spelling import normalize_word_text
+from .telegram.telegram_bot_postgres import BotManager, load_prompts
+
+SALUDOS_SEMILLA = [
+    "hola", "buenas", "buen día", "buenas tardes", "buenas noches",
+    "hey", "saludos", "holaa", "hola, ¿cómo va?", "hola yogui",
+]
+
+
+def valido(respuesta: str) -> bool:
+    return 15 <= len(respuesta) <= 300 and "{" not in respuesta and "RESPUESTA" not in respuesta
+
+
+async def main_async(args):
+    # Sin conexión a la base: solo se usa la plantilla 'greeting'
+    manager = BotManager(PostgresRetriever(DATABASE_URL), prompts=load_prompts())
+    try:
+        await manager.init_session()
+        semaforo = asyncio.Semaphore(args.concurrencia)
+
+        async def generar(i):
+            async with semaforo:
+                saludo = SALUDOS_SEMILLA[i % len(SALUDOS_SEMILLA)]
+                return await manager._call_llm(
+                    'greeting', {"msg": saludo}, f"saludos-{i}", temperature=args.temperatura
+                )
+
+        respuestas, vistas = [], set()
+        for r in await asyncio.gather(*(generar(i) for i in range(args.cantidad * 2))):
+            clave = normalize_word_text(r.strip())
+            if valido(r.strip()) and clave not in vistas:
+                vistas.add(clave)
+                respuestas.append(r.strip())
+        respuestas = respuestas[:args.cantidad]
+    finally:
+        await manager.close_session()
+
+    print(f"👋 {len(respuestas)} saludos válidos de {args.cantidad * 2} generados")
+    if len(respuestas) < args.minimo:
+        print(f"❌ Menos de {args.minimo} saludos: se conserva el pool actual")
+        sys.exit(1)
+    if args.dry_run:
+        for r in respuestas:
+            print(f"  • {r}")
+        return
+
+    tmp = GREETINGS_PATH.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(f"# Generado por greetings_refresh.py el {datetime.now():%Y-%m-%d %H:%M}\n")
+        yaml.safe_dump({"responses": respuestas}, f, allow_unicode=True, width=1000)
+    os.replace(tmp, GREETINGS_PATH)
+    print(f"✅ Pool escrito en {GREETINGS_PATH}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenera el pool de saludos sin LLM en línea")
+    parser.add_argument("--cantidad", type=int, default=20, help="respuestas en el pool")
+    parser.add_argument("--minimo", type=int, default=5, help="mínimo para reemplazar el pool")
+    parser.add_argument("--temperatura", type=float, default=0.9, help="variedad de las respuestas")
+    parser.add_argument("--concurrencia", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true", help="mostrar sin escribir el archivo")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args))
+    except Exception as e:
+        logger.error("❌ Error regenerando saludos: %s", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# ./frontend/bot/inference_client.py
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Iterable, List, Optional, Set
+
+import aiohttp
+
+from .config import logger
+
+
+class InferenceReplica:
+    """Estado de una réplica del servidor de inferencia"""
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.outstanding = 0          # solicitudes en vuelo desde este bot
+        self.server_load = 0          # concurrent_requests reportado por /health
+        self.sampled_outstanding = 0  # outstanding propio cuando se tomó server_load
+        self.ready = True             # False mientras el servidor hace warmup
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.stats = {"requests": 0, "failures": 0}
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def load(self) -> int:
+        """
+        Carga estimada: lo propio en vuelo ahora más lo ajeno según /health.
+        server_load ya incluía lo que este bot tenía en vuelo al medirlo; sin
+        restarlo, la carga propia se contaba dos veces.
+        """
+        return self.outstanding + max(self.server_load - self.sampled_outstanding, 0)
+
+    def is_available(self, now: float) -> bool:
+        return self.ready and now >= self.ejected_until
+
+
+class InferencePool:
+    """
+    Balanceo del lado del cliente entre réplicas del servidor de inferencia.
+    - Menor cantidad de solicitudes pendientes (locales + las de otros clientes según /health)
+    - Afinidad por clave (usuario o plantilla) con rendezvous hashing, para
+      aprovechar el prefix cache de cada réplica mientras la carga lo permita
+    - Expulsión temporal de réplicas que fallan y reintento posterior
+    """
+    def __init__(
+        self,
+        urls: Iterable[str],
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        sticky_slack: int = 2
+    ):
+        self.replicas = [InferenceReplica(u) for u in urls]
+        if not self.replicas:
+            raise ValueError("Se requiere al menos una réplica de inferencia")
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.sticky_slack = sticky_slack
+
+    @staticmethod
+    def _affinity(key: str, replica: InferenceReplica) -> int:
+        digest = hashlib.md5(f"{key}|{replica.base_url}".encode()).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    def choose(self, key: str, exclude: Optional[Set[str]] = None) -> InferenceReplica:
+        """Elige la réplica preferida por la clave entre las menos cargadas"""
+        exclude = exclude or set()
+        now = time.time()
+        candidates = [
+            r for r in self.replicas
+            if r.base_url not in exclude and r.is_available(now)
+        ]
+        if not candidates:
+            # Ninguna disponible: probar la que antes vuelve de la expulsión
+            candidates = [r for r in self.replicas if r.base_url not in exclude] or self.replicas
+            return min(candidates, key=lambda r: (r.ejected_until, r.load()))
+
+        min_load = min(r.load() for r in candidates)
+        eligible = [r for r in candidates if r.load() <= min_load + self.sticky_slack]
+        return max(eligible, key=lambda r: self._affinity(key, r))
+
+    @asynccontextmanager
+    async def acquire(self, key: str, exclude: Optional[Set[str]] = None):
+        replica = self.choose(key, exclude)
+        replica.outstanding += 1
+        replica.stats["requests"] += 1
+        try:
+            yield replica
+        finally:
+            replica.outstanding -= 1
+
+    def report_success(self, replica: InferenceReplica):
+        if replica.ejections:
+            logger.info("✅ Réplica de inferencia %s recuperada", replica.base_url)
+        replica.consecutive_failures = 0
+        replica.ejections = 0
+        replica.ejected_until = 0.0
+
+    def report_failure(self, replica: InferenceReplica):
+        replica.stats["failures"] += 1
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.max_failures:
+            # Backoff exponencial acotado entre expulsiones sucesivas
+            cooldown = min(self.eject_seconds * (2 ** replica.ejections), self.eject_seconds * 10)
+            replica.ejections += 1
+            replica.consecutive_failures = 0
+            replica.ejected_until = time.time() + cooldown
+            logger.warning("🚫 Réplica %s expulsada por %.0fs", replica.base_url, cooldown)
+
+    async def refresh_health(self, session: aiohttp.ClientSession):
+        """Consulta /health de cada réplica y actualiza su carga y readiness"""
+        async def check(replica: InferenceReplica):
+            try:
+                in_flight = replica.outstanding
+                async with session.get(replica.url("/health"), timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                    data = await resp.json(content_type=None)
+                    if resp.status == 200:
+                        replica.ready = True
+                        replica.server_load = int(data.get("concurrent_requests", 0))
+                        # Lo propio en vuelo durante la medición (mínimo entre antes y después)
+                        replica.sampled_outstanding = min(in_flight, replica.outstanding)
+                        # Responde bien: vuelve al balanceo sin esperar a que venza la expulsión
+                        self.report_success(replica)
+                    elif resp.status == 503:
+                        replica.ready = data.get("status") not in ("warming", "starting")
+                    else:
+                        self.report_failure(replica)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                self.report_failure(replica)
+
+        await asyncio.gather(*(check(r) for r in self.replicas))
+
+    async def health_loop(
+        self,
+        get_session: Callable[[], aiohttp.ClientSession],
+        stop_event: asyncio.Event,
+        interval: float = 5.0
+    ):
+        """Refresco periódico de /health hasta que se detenga el bot"""
+        while not stop_event.is_set():
+            session = get_session()
+            if session is not None and not session.closed:
+                await self.refresh_health(session)
+            try:
+                await asyncio.wait_for(stop_event.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> List[dict]:
+        now = time.time()
+        return [
+            {
+                "url": r.base_url,
+                "available": r.is_available(now),
+                "ready": r.ready,
+                "outstanding": r.outstanding,
+                "server_load": r.server_load,
+                "requests": r.stats["requests"],
+                "failures": r.stats["failures"],
+            }
+            for r in self.replicas
+        ]
@@ -0,0 +1,198 @@
+# ./frontend/bot/metrics.py
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from .config import logger
+
+# Buckets en segundos: de consultas SQL de pocos ms a generaciones del LLM de varios segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in self.values.items()]
+        return lines
+
+
+class Histogram:
+    """
+    Histograma acumulativo por combinación de etiquetas (formato Prometheus) y
+    una ventana de muestras recientes, sin etiquetas, para los percentiles de /stats.
+    """
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = 1000):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series: Dict[Labels, List[float]] = {}   # etiquetas → [conteos por bucket..., +Inf, suma]
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0.0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+        self.recent.append(seconds)
+
+    @contextmanager
+    def time(self, **labels):
+        """Mide el bloque; las etiquetas pueden completarse dentro (dict mutable)"""
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def percentile(self, q: float) -> float:
+        """Percentil de las muestras recientes, en segundos"""
+        samples = sorted(self.recent)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def count(self) -> int:
+        return int(sum(sum(s[:-1]) for s in self.series.values()))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self.series.items():
+            cumulative = 0.0
+            for bound, n in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge o contador leído al momento del scrape (pools, colas, stats existentes)"""
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Tuple[str, ...],
+                 callback: Callable[[], Dict[Labels, float]]):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.debug("Métrica %s no disponible: %s", self.name, e)
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, k)} {float(v)}" for k, v in values.items()]
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), **kwargs) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, **kwargs))
+
+    def callback(self, name: str, help_text: str, callback: Callable[[], Dict[Labels, float]],
+                 labelnames: Tuple[str, ...] = (), kind: str = "gauge") -> CallbackMetric:
+        return self._register(CallbackMetric(name, help_text, kind, labelnames, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+async def start_metrics_server(registry: "MetricsRegistry", host: str, port: int) -> Optional[web.AppRunner]:
+    """Expone GET /metrics en formato de texto de Prometheus (port=0 lo desactiva)"""
+    if not port:
+        return None
+
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Prometheus-Format": "0.0.4"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error("❌ No se pudo abrir el puerto de métricas %s:%d: %s", host, port, e)
+        await runner.cleanup()
+        return None
+    logger.info("📈 Métricas en http://%s:%d/metrics", host, port)
+    return runner
+
+
+# ==================== MÉTRICAS DEL BOT ====================
+
+REGISTRY = MetricsRegistry()
+
+RETRIEVAL_SECONDS = REGISTRY.histogram(
+    "bot_retrieval_sql_seconds", "Tiempo de las consultas SQL de recuperación",
+    ("mode", "route")
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "bot_llm_request_seconds", "Ida y vuelta de cada solicitud al servidor de inferencia",
+    ("template", "status")
+)
+TELEGRAM_SEND_SECONDS = REGISTRY.histogram(
+    "bot_telegram_send_seconds", "Duración de cada send_message a Telegram",
+    ("result",)
+)
+HANDLER_SECONDS = REGISTRY.histogram(
+    "bot_handler_seconds", "Tiempo de punta a punta del pipeline de un mensaje",
+    ("mode", "route")
+)
+RESPONSES_TOTAL = REGISTRY.counter(
+    "bot_responses_total", "Mensajes respondidos por resultado (llm, cache, faq, respaldo...)",
+    ("outcome",)
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "bot_pipeline_stage_seconds", "Tiempo de cada etapa del pipeline",
+    ("stage",)
+)
@@ -0,0 +1,255 @@
+# ./frontend/bot/outbound.py
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+from .config import logger
+from .metrics import TELEGRAM_SEND_SECONDS
+from .tracing import current_trace, emit_span
+
+# Límite de Telegram por mensaje de texto
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Divide en trozos de hasta `limit` caracteres, cortando en párrafo, línea o espacio"""
+    chunks = []
+    while len(text) > limit:
+        cut = -1
+        for sep in ("\n\n", "\n", " "):
+            cut = text.rfind(sep, 0, limit)
+            if cut > limit // 2:
+                break
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class TokenBucket:
+    """Cubeta de tokens: `rate` envíos por segundo con ráfagas de hasta `capacity`"""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0    # RetryAfter de Telegram
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Segundos hasta que haya un token disponible (0 si ya lo hay)"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def reserve(self) -> float:
+        """Toma un token (aunque quede en negativo) y devuelve cuánto esperar"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+@dataclass
+class OutboundMessage:
+    chat_id: int
+    text: str
+    parse_mode: Optional[str] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+    trace_id: str = field(default_factory=current_trace.get)
+
+
+class OutboundDispatcher:
+    """
+    Cola de salida hacia Telegram. Los handlers encolan y siguen; un grupo de
+    workers envía respetando una cubeta global (~30 msj/s) y una por chat
+    (~1 msj/s), parte los textos largos, respeta RetryAfter (frena todos los
+    chats y no cuenta como intento) y reintenta errores de red fuera del
+    camino crítico del handler.
+    Cada chat tiene su propia cola y solo un worker a la vez lo atiende (los
+    mensajes de un chat salen en orden); un chat limitado vuelve a la cola de
+    listos cuando tiene token, sin bloquear a un worker.
+    """
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0, chat_burst: int = 3,
+                 workers: int = 8, max_queue: int = 5000, max_attempts: int = 3, max_chats: int = 10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self.chat_queues: Dict[int, Deque[OutboundMessage]] = {}  # chats con mensajes pendientes
+        self.ready: asyncio.Queue = asyncio.Queue()                 # chats listos para enviar
+        self.max_chats = max_chats
+        self.max_queue = max_queue
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.pending = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.bot = None
+        self.tasks: List[asyncio.Task] = []
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self.stats = {
+            "enqueued": 0, "sent": 0, "chunks": 0, "retries": 0, "flood_waits": 0,
+            "failed": 0, "dropped": 0, "max_latency_ms": 0.0,
+        }
+
+    def start(self, bot):
+        self.bot = bot
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info("📤 Cola de salida: %d workers, %.0f msj/s global, %.1f msj/s por chat",
+                    self.workers, self.global_bucket.rate, self.chat_rate)
+
+    def enqueue(self, chat_id: int, text: str, parse_mode: Optional[str] = None) -> bool:
+        """Encola un mensaje (sin esperar); False si la cola está llena"""
+        chunks = split_message(text)
+        if self.pending + len(chunks) > self.max_queue:
+            self.stats["dropped"] += 1
+            logger.error("❌ Cola de salida llena: se descarta un mensaje para el chat")
+            return False
+        queue = self.chat_queues.get(chat_id)
+        if queue is None:
+            queue = self.chat_queues[chat_id] = deque()
+            self.ready.put_nowait(chat_id)
+        queue.extend(OutboundMessage(chat_id, chunk, parse_mode) for chunk in chunks)
+        self.pending += len(chunks)
+        self.idle.clear()
+        self.stats["enqueued"] += 1
+        self.stats["chunks"] += len(chunks)
+        return True
+
+    def depth(self) -> int:
+        return self.pending
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.pop(chat_id, None)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+        self.chat_buckets[chat_id] = bucket
+        if len(self.chat_buckets) > self.max_chats:
+            self.chat_buckets.popitem(last=False)
+        return bucket
+
+    def _ready_later(self, chat_id: int, delay: float):
+        asyncio.get_running_loop().call_later(delay, self.ready.put_nowait, chat_id)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self.ready.get()
+            queue = self.chat_queues[chat_id]
+            bucket = self._chat_bucket(chat_id)
+            wait = bucket.delay()
+            if wait > 0:
+                self._ready_later(chat_id, wait)
+                continue
+
+            item = queue[0]
+            bucket.reserve()
+            try:
+                await asyncio.sleep(self.global_bucket.reserve())
+                done = await self._send(item, bucket)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error("❌ Error inesperado al enviar mensaje: %s", e)
+                done = True
+
+            if done:
+                queue.popleft()
+                self.pending -= 1
+            if queue:
+                # Al final de la cola de listos: los demás chats no esperan a este
+                self.ready.put_nowait(chat_id)
+            else:
+                del self.chat_queues[chat_id]
+                if not self.pending:
+                    self.idle.set()
+
+    async def _send(self, item: OutboundMessage, bucket: TokenBucket) -> bool:
+        """Un intento de envío; False si hay que reintentar más tarde"""
+        item.attempts += 1
+        started_at, start = time.time(), time.monotonic()
+        result = "error"
+        try:
+            await self.bot.send_message(chat_id=item.chat_id, text=item.text, parse_mode=item.parse_mode)
+            result = "ok"
+        except RetryAfter as e:
+            result = "flood"
+            # int/float según la versión de python-telegram-bot (timedelta en las últimas)
+            delay = e.retry_after
+            if hasattr(delay, "total_seconds"):
+                delay = delay.total_seconds()
+            self.stats["flood_waits"] += 1
+            logger.warning(f"Flood control de Telegram: esperando {delay}s")
+            # El flood wait es de todo el bot: se frenan todos los chats, no solo este.
+            # No es un fallo del mensaje: se reintenta sin gastar un intento
+            bucket.block(float(delay))
+            self.global_bucket.block(float(delay))
+            item.attempts -= 1
+            return False
+        except BadRequest as e:
+            if item.parse_mode and "parse" in str(e).lower():
+                # Markdown inválido (p. ej. texto del LLM): se reenvía como texto plano
+                result = "markdown"
+                logger.warning(f"Markdown inválido, reenviando sin formato: {e}")
+                item.parse_mode = None
+                return self._give_up(item)
+            raise
+        except (TimedOut, NetworkError) as e:
+            result = "network"
+            logger.warning(f"Error de red al enviar mensaje (intento {item.attempts}/{self.max_attempts}): {e}")
+            self.stats["retries"] += 1
+            bucket.block(1.0 * item.attempts)
+            return self._give_up(item)
+        finally:
+            elapsed = time.monotonic() - start
+            TELEGRAM_SEND_SECONDS.observe(elapsed, result=result)
+            emit_span("telegram", started_at, elapsed * 1000, trace_id=item.trace_id, result=result,
+                      attempt=item.attempts, wait_ms=round((start - item.enqueued_at) * 1000, 1))
+
+        latency = (time.monotonic() - item.enqueued_at) * 1000
+        self.latencies.append(latency)
+        self.stats["sent"] += 1
+        self.stats["max_latency_ms"] = max(self.stats["max_latency_ms"], latency)
+        return True
+
+    def _give_up(self, item: OutboundMessage) -> bool:
+        if item.attempts < self.max_attempts:
+            return False
+        self.stats["failed"] += 1
+        logger.error(f"No se pudo enviar mensaje después de {self.max_attempts} intentos: {item.text[:100]}...")
+        return True
+
+    def latency_percentile(self, q: float) -> float:
+        samples = sorted(self.latencies)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    async def close(self, timeout: float = 10.0):
+        """Espera a vaciar la cola (hasta `timeout`) y detiene los workers"""
+        if self.tasks:
+            try:
+                await asyncio.wait_for(self.idle.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning("⚠️ %d mensajes sin enviar al cerrar", self.pending)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
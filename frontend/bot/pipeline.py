@@ -0,0 +1,105 @@
+# ./frontend/bot/pipeline.py
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .metrics import RESPONSES_TOTAL, STAGE_SECONDS
+from .models import ResponseMode, SearchResult
+from .tracing import emit_span
+
+STAGES = ("classify", "retrieve", "decide", "generate", "send")
+
+
+@dataclass
+class Classification:
+    """Resultado de la etapa classify (solo CPU, sin I/O)"""
+    kind: str                       # about | saludo | faq | explicativa | consulta
+    query_type: str                 # tipo para estadisticas_anonimas
+    faq_key: str = ""
+    prev_results: Optional[List[SearchResult]] = None
+    cleaned: Optional[Tuple[List[str], bool]] = None    # _clean_query_terms, una vez por mensaje
+
+
+@dataclass
+class Decision:
+    """Qué responder: texto listo o una única llamada al LLM con su respaldo"""
+    reply: str = ""
+    parse_mode: Optional[str] = None
+    template: Optional[str] = None
+    variables: Dict[str, str] = field(default_factory=dict)
+    fallback: str = ""              # si el LLM falla
+    cache_scope: Optional[str] = None
+    results: List[SearchResult] = field(default_factory=list)
+    mode: Optional[ResponseMode] = None
+
+
+class StageTimer:
+    """Tiempos de las etapas de un mensaje (cada etapa queda además como span de la traza)"""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            emit_span(name, started_at, elapsed)
+
+    def finish(self, **attrs):
+        """Span raíz del mensaje completo"""
+        emit_span("mensaje", self.started_at, self.total_ms(), **attrs)
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def describe(self) -> str:
+        parts = [f"{name}={self.timings[name]:.0f}ms" for name in STAGES if name in self.timings]
+        return " ".join(parts + [f"total={self.total_ms():.0f}ms"])
+
+
+class PipelineMetrics:
+    """Acumulado por etapa (conteo, total, máximo) y muestras recientes para percentiles"""
+    def __init__(self, window: int = 1000):
+        self.count: Dict[str, int] = {}
+        self.total_ms: Dict[str, float] = {}
+        self.max_ms: Dict[str, float] = {}
+        self.recent: Dict[str, Deque[float]] = {}
+        self.window = window
+        self.outcomes: Dict[str, int] = {}
+
+    def observe(self, timer: StageTimer, outcome: str):
+        for name, ms in timer.timings.items():
+            STAGE_SECONDS.observe(ms / 1000, stage=name)
+        RESPONSES_TOTAL.inc(outcome=outcome)
+        timings = dict(timer.timings, total=timer.total_ms())
+        for name, ms in timings.items():
+            self.count[name] = self.count.get(name, 0) + 1
+            self.total_ms[name] = self.total_ms.get(name, 0.0) + ms
+            self.max_ms[name] = max(self.max_ms.get(name, 0.0), ms)
+            self.recent.setdefault(name, deque(maxlen=self.window)).append(ms)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def percentile(self, name: str, q: float) -> float:
+        samples = sorted(self.recent.get(name, ()))
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "count": self.count[name],
+                "avg_ms": self.total_ms[name] / self.count[name],
+                "p95_ms": self.percentile(name, 0.95),
+                "max_ms": self.max_ms[name],
+            }
+            for name in (*STAGES, "total") if name in self.count
+        }
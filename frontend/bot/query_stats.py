@@ -0,0 +1,151 @@
+# ./frontend/bot/query_stats.py
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import logger
+from .models import ResponseMode, SearchResult
+
+# (tipo_consulta, facultad_id, categoria_id, hora_dia, dia_semana, mes, año)
+StatsKey = Tuple[str, int, int, int, int, int, int]
+
+# 0 = sin facultad/categoría: con NULL el UNIQUE no detecta el conflicto
+# y cada volcado insertaría filas nuevas
+SIN_ID = 0
+
+UPSERT_SQL = """
+INSERT INTO estadisticas_anonimas
+    (tipo_consulta, facultad_id, categoria_id, hora_dia, dia_semana, mes, año,
+     consultas_count, sin_respuesta_count)
+SELECT * FROM unnest(
+    $1::VARCHAR[], $2::INT[], $3::INT[], $4::INT[], $5::INT[], $6::INT[], $7::INT[],
+    $8::INT[], $9::INT[]
+)
+ON CONFLICT (tipo_consulta, facultad_id, categoria_id, hora_dia, dia_semana, mes, año)
+DO UPDATE SET
+    consultas_count = estadisticas_anonimas.consultas_count + EXCLUDED.consultas_count,
+    sin_respuesta_count = estadisticas_anonimas.sin_respuesta_count + EXCLUDED.sin_respuesta_count,
+    fecha = CURRENT_TIMESTAMP
+"""
+
+
+class QueryStatsAggregator:
+    """
+    Cuenta consultas anónimas en memoria por bucket y las vuelca periódicamente
+    con un único upsert sobre arrays (unnest), en vez de una escritura por mensaje.
+    """
+    def __init__(self, get_pool: Callable, flush_interval: float = 60.0, max_keys: int = 5000):
+        self.get_pool = get_pool
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self.pending: Dict[StatsKey, List[int]] = defaultdict(lambda: [0, 0])
+        self.faculty_ids: Optional[Dict[str, int]] = None
+        self.category_ids: Optional[Dict[str, int]] = None
+        self._unresolved = set()
+        self.stats = {"recorded": 0, "flushes": 0, "rows_flushed": 0, "flush_errors": 0, "last_flush_ms": 0.0}
+        self._flush_lock = asyncio.Lock()
+
+    def record(self, query_type: str, results: List[SearchResult] = None, mode: ResponseMode = None,
+               now: datetime = None):
+        """Suma una consulta al bucket de la hora actual (O(1), sin I/O)"""
+        now = now or datetime.now()
+        top = results[0] if results else None
+        key = (
+            query_type,
+            top.faculty if top else None,
+            top.category if top else None,
+            now.hour, now.isoweekday(), now.month, now.year,
+        )
+        counts = self.pending[key]
+        counts[0] += 1
+        if mode == ResponseMode.FALLBACK:
+            counts[1] += 1
+        self.stats["recorded"] += 1
+
+    async def _load_dimensions(self, conn):
+        """
+        Mapas etiqueta corta → id de facultades y categorías (una vez). Los
+        resultados traen la etiqueta de la ingesta ('Exactas', 'beca'), no el
+        nombre de la dimensión: la correspondencia está en etiquetas_dimension
+        (migration_008). Id NULL = etiqueta conocida sin dimensión → SIN_ID.
+        """
+        self.faculty_ids, self.category_ids = {}, {}
+        try:
+            rows = await conn.fetch("SELECT dimension, etiqueta, ref_id FROM etiquetas_dimension")
+        except Exception as e:
+            logger.warning("⚠️ Estadísticas sin dimensiones de facultad/categoría: %s", e)
+            return
+        targets = {"facultad": self.faculty_ids, "categoria": self.category_ids}
+        for row in rows:
+            targets[row["dimension"]][row["etiqueta"].lower()] = row["ref_id"] or SIN_ID
+
+    def _resolve(self, dimension: str, labels: Dict[str, int], label: Optional[str]) -> int:
+        if not label:
+            return SIN_ID
+        ref_id = labels.get(label.lower())
+        if ref_id is None:
+            if labels and (dimension, label) not in self._unresolved:
+                # Una vez por etiqueta: se repite en cada consulta que la trae
+                self._unresolved.add((dimension, label))
+                logger.warning("⚠️ Etiqueta de %s sin id en etiquetas_dimension: '%s'", dimension, label)
+            return SIN_ID
+        return ref_id
+
+    async def flush(self) -> int:
+        """Vuelca los contadores acumulados; si falla, los devuelve al buffer"""
+        async with self._flush_lock:
+            if not self.pending:
+                return 0
+            pool = self.get_pool()
+            if pool is None:
+                return 0
+
+            batch, self.pending = self.pending, defaultdict(lambda: [0, 0])
+            start = time.perf_counter()
+            try:
+                async with pool.acquire() as conn:
+                    if self.faculty_ids is None:
+                        await self._load_dimensions(conn)
+
+                    # Facultades/categorías con el mismo id se combinan antes del upsert
+                    rows: Dict[StatsKey, List[int]] = defaultdict(lambda: [0, 0])
+                    for (qtype, faculty, category, hour, dow, month, year), (total, unanswered) in batch.items():
+                        key = (qtype, self._resolve("facultad", self.faculty_ids, faculty),
+                               self._resolve("categoria", self.category_ids, category), hour, dow, month, year)
+                        rows[key][0] += total
+                        rows[key][1] += unanswered
+
+                    columns = list(zip(*(key + tuple(counts) for key, counts in rows.items())))
+                    await conn.execute(UPSERT_SQL, *(list(c) for c in columns))
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                logger.error("❌ Error volcando estadísticas anónimas: %s", e)
+                self._restore(batch)
+                return 0
+
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stats["flushes"] += 1
+            self.stats["rows_flushed"] += len(rows)
+            self.stats["last_flush_ms"] = elapsed
+            logger.debug("📈 Estadísticas volcadas: %d buckets en %.1fms", len(rows), elapsed)
+            return len(rows)
+
+    def _restore(self, batch: Dict[StatsKey, List[int]]):
+        """Reincorpora un lote fallido (acotado: se descarta lo que exceda max_keys)"""
+        for key, (total, unanswered) in batch.items():
+            if key not in self.pending and len(self.pending) >= self.max_keys:
+                continue
+            counts = self.pending[key]
+            counts[0] += total
+            counts[1] += unanswered
+
+    async def run(self, stop_event: asyncio.Event):
+        """Volcado periódico hasta el apagado; al final vuelca lo pendiente"""
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
@@ -1,12 +1,18 @@
 # ./frontend/bot/retriever/retriever.py
 import asyncio
+import json
 import time
 import re
 import logging
-from typing import List, Tuple
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 import asyncpg
 from .models import SearchResult, ResponseMode
-from .config import logger
+from .faculty_router import FacultyRouter, RouteDecision
+from .spelling import SymSpellIndex, corpus_words
+from .metrics import RETRIEVAL_SECONDS
+from .tracing import current_trace, span
+from .config import logger, SPELL_MAX_WORDS
 
 class PostgresRetriever:
     def __init__(self, db_url: str, debug_mode: bool = False):
@@ -22,6 +28,28 @@ class PostgresRetriever:
         self.last_connect_attempt = 0
         self.connect_retry_delay = 2  # segundos entre reintentos
 
+        # --- Feed de cambios (ingesta incremental, migration_002) ---
+        self.change_channel = "cambios_conocimiento"
+        self.change_conn = None
+        self.change_listeners: List[Callable[[List[asyncpg.Record]], Awaitable[None]]] = []
+        self.last_change_id = 0
+        self.change_baseline = False  # last_change_id ya se leyó del feed
+        self.change_lock = asyncio.Lock()             # un solo lector del feed a la vez
+        self.change_tasks: Set[asyncio.Task] = set()  # despachos en curso (referencia fuerte)
+        self.change_watch_task: Optional[asyncio.Task] = None
+        self.change_lost = asyncio.Event()
+        self.change_check_interval = 30.0  # segundos entre chequeos de la conexión LISTEN
+
+        # --- Ruteo por facultad (fragmentos_conocimiento particionada por LIST) ---
+        self.router = FacultyRouter()
+        self.last_route: Optional[RouteDecision] = None
+
+        # --- Corrector ortográfico (vocabulario de contenido/descripcion/palabras_clave) ---
+        self.spelling: Optional[SymSpellIndex] = None
+        self.spelling_stale = 0      # borrados/actualizaciones desde el último rebuild
+        self.spelling_task: Optional[asyncio.Task] = None
+        self.on_knowledge_change(self._update_spelling)
+
         # --- Keywords Carrera (como en la versión combinada anterior) ---
         self.carrera_keywords = {
             # Exactas
@@ -78,7 +106,9 @@ class PostgresRetriever:
                 self.db_url,
                 min_size=2,
                 max_size=20,
-                command_timeout=30
+                command_timeout=30,
+                # Nombre base; retrieve() le agrega la traza y RESET ALL lo restaura al liberar
+                server_settings={"application_name": "unsa_bot"}
             )
             async with self.pool.acquire() as conn:
                 if self.debug_mode:
@@ -92,14 +122,222 @@ class PostgresRetriever:
                 )
                 self.connected = True
                 logger.info("✅ PostgreSQL conectado | Fragmentos: %d", self.stats["fragments"])
-                return True
+            if self.change_conn is None and self.change_watch_task is None:
+                await self._listen_changes()
+            if self.spelling is None and self.spelling_task is None:
+                self._schedule_spelling_rebuild()
+            return True
         except Exception as e:
             self.connected = False
             logger.error("❌ PostgreSQL error: %s", str(e))
             return False
 
+    def on_knowledge_change(self, callback: Callable[[List[asyncpg.Record]], Awaitable[None]]):
+        """Registra un callback async que recibe los cambios de cada ingesta"""
+        self.change_listeners.append(callback)
+
+    async def _listen_changes(self) -> bool:
+        """
+        Conexión dedicada con LISTEN sobre el canal de cambios de la ingesta.
+        Al reconectar conserva el último id visto y reparte todo lo que se
+        registró en el feed mientras no había conexión.
+        """
+        resync = self.change_baseline
+        try:
+            if not resync:
+                self.last_change_id = await self.pool.fetchval(
+                    "SELECT COALESCE(MAX(id), 0) FROM cambios_conocimiento"
+                )
+                self.change_baseline = True
+            self.change_conn = await asyncpg.connect(self.db_url)
+            await self.change_conn.add_listener(self.change_channel, self._on_notify)
+            self.change_conn.add_termination_listener(self._on_listen_lost)
+            self.change_lost.clear()
+        except asyncpg.UndefinedTableError as e:
+            # Base sin migration_002: el bot funciona igual, sin feed de cambios
+            await self._close_change_conn()
+            logger.warning("⚠️ Feed de cambios no disponible: %s", e)
+            return False
+        except Exception as e:
+            await self._close_change_conn()
+            logger.warning("⚠️ No se pudo escuchar el feed de cambios: %s", e)
+            self._start_change_watch()
+            return False
+
+        logger.info("👂 Escuchando cambios de conocimiento desde id %d", self.last_change_id)
+        self._start_change_watch()
+        if resync:
+            await self._dispatch_changes()
+        return True
+
+    def _start_change_watch(self):
+        if self.change_watch_task is None or self.change_watch_task.done():
+            self.change_watch_task = asyncio.create_task(self._watch_changes())
+
+    def _on_listen_lost(self, connection):
+        logger.warning("⚠️ Se cerró la conexión LISTEN del feed de cambios")
+        self.change_lost.set()
+
+    async def _listen_alive(self) -> bool:
+        if self.change_conn is None or self.change_conn.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(self.change_conn.execute("SELECT 1"), timeout=5)
+            return True
+        except Exception as e:
+            logger.warning("⚠️ Conexión LISTEN sin respuesta: %s", e)
+            return False
+
+    async def _watch_changes(self):
+        """
+        Vigila la conexión LISTEN: se despierta al cerrarse (termination listener)
+        o cada change_check_interval, y si no responde reconecta y resincroniza.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self.change_lost.wait(), timeout=self.change_check_interval)
+            except asyncio.TimeoutError:
+                pass
+            if await self._listen_alive():
+                continue
+            await self._close_change_conn()
+            logger.info("🔌 Reconectando al feed de cambios (último id %d)", self.last_change_id)
+            if not await self._listen_changes():
+                # Reintento en el próximo intervalo, no en un bucle apretado
+                self.change_lost.clear()
+
+    async def _close_change_conn(self):
+        conn, self.change_conn = self.change_conn, None
+        if conn is None:
+            return
+        conn.remove_termination_listener(self._on_listen_lost)
+        try:
+            await conn.close(timeout=5)
+        except Exception as e:
+            conn.terminate()
+            logger.error("❌ Error al cerrar conexión LISTEN: %s", e)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            rango = json.loads(payload)
+        except (TypeError, ValueError):
+            rango = {}
+        task = asyncio.create_task(self._dispatch_changes(rango.get("hasta")))
+        self.change_tasks.add(task)
+        task.add_done_callback(self.change_tasks.discard)
+
+    async def _dispatch_changes(self, hasta=None):
+        """Lee del feed los cambios posteriores al último visto y los reparte"""
+        async with self.change_lock:
+            await self._read_changes(hasta)
+
+    async def _read_changes(self, hasta=None):
+        try:
+            async with self.pool.acquire() as conn:
+                cambios = await conn.fetch(
+                    """
+                    SELECT id, fragmento_id, operacion, fuente, hash_contenido
+                    FROM cambios_conocimiento
+                    WHERE id > $1 AND ($2::BIGINT IS NULL OR id <= $2)
+                    ORDER BY id
+                    """,
+                    self.last_change_id, hasta
+                )
+                if not cambios:
+                    return
+                self.last_change_id = cambios[-1]["id"]
+                self.stats["fragments"] = await conn.fetchval(
+                    "SELECT COUNT(*) FROM fragmentos_conocimiento"
+                )
+        except Exception as e:
+            logger.error("❌ Error leyendo cambios de conocimiento: %s", e)
+            return
+
+        logger.info("🔄 %d cambios de conocimiento | Fragmentos: %d", len(cambios), self.stats["fragments"])
+        for callback in self.change_listeners:
+            try:
+                await callback(cambios)
+            except Exception as e:
+                logger.error("❌ Error en listener de cambios: %s", e)
+
+    def _schedule_spelling_rebuild(self):
+        if self.spelling_task is None or self.spelling_task.done():
+            self.spelling_task = asyncio.create_task(self._build_spelling())
+
+    async def _build_spelling(self, batch_size: int = 5000):
+        """Construye el índice SymSpell en segundo plano y lo reemplaza al terminar"""
+        start = time.perf_counter()
+        stale_at_start = self.spelling_stale
+        frequencies: Dict[str, int] = defaultdict(int)
+
+        def count(rows):
+            for r in rows:
+                for word in corpus_words(r["contenido"], r["descripcion"], " ".join(r["palabras_clave"] or [])):
+                    frequencies[word] += 1
+
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    cursor = await conn.cursor(
+                        "SELECT contenido, descripcion, palabras_clave FROM fragmentos_conocimiento"
+                    )
+                    while True:
+                        rows = await cursor.fetch(batch_size)
+                        if not rows:
+                            break
+                        # Tokenizar fuera del event loop
+                        await asyncio.to_thread(count, rows)
+            index = await asyncio.to_thread(SymSpellIndex.from_counts, frequencies, max_words=SPELL_MAX_WORDS)
+        except Exception as e:
+            logger.warning("⚠️ Corrector ortográfico no disponible: %s", e)
+            return
+
+        self.spelling = index
+        self.spelling_stale -= stale_at_start
+        logger.info(
+            "🔤 Corrector ortográfico: %d palabras (%d fuera del tope) en %.1fs",
+            len(index), index.stats["skipped_words"], time.perf_counter() - start
+        )
+
+    async def _update_spelling(self, cambios: List[asyncpg.Record]):
+        """
+        Suma el vocabulario de los fragmentos nuevos/actualizados. Los borrados no
+        traen el texto: se acumulan y, pasado un 10% del corpus, se reconstruye.
+        """
+        if self.spelling is None:
+            return
+        nuevos = [c for c in cambios if c["operacion"] in ("insert", "update")]
+        self.spelling_stale += sum(1 for c in cambios if c["operacion"] != "insert")
+
+        if nuevos:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT f.contenido, f.descripcion, f.palabras_clave
+                    FROM fragmentos_conocimiento f
+                    JOIN unnest($1::TEXT[], $2::TEXT[]) AS c(fuente, hash)
+                      ON f.fuente = c.fuente AND f.hash_contenido = c.hash::CHAR(64)
+                    """,
+                    [c["fuente"] for c in nuevos], [c["hash_contenido"] for c in nuevos]
+                )
+            for r in rows:
+                self.spelling.add_words(
+                    corpus_words(r["contenido"], r["descripcion"], " ".join(r["palabras_clave"] or []))
+                )
+
+        if self.spelling_stale > max(100, self.stats["fragments"] // 10):
+            logger.info("🔤 %d fragmentos borrados/actualizados: reconstruyendo corrector", self.spelling_stale)
+            self._schedule_spelling_rebuild()
+
     async def disconnect(self):
         """Cerrar conexión pool al apagar"""
+        if self.spelling_task and not self.spelling_task.done():
+            self.spelling_task.cancel()
+        if self.change_watch_task and not self.change_watch_task.done():
+            self.change_watch_task.cancel()
+        for task in list(self.change_tasks):
+            task.cancel()
+        await self._close_change_conn()
         if self.pool:
             try:
                 await self.pool.close()
@@ -165,6 +403,14 @@ class PostgresRetriever:
 
         terms = [w for w in words if len(w) >= 3 and w not in stopwords]
 
+        if self.spelling is not None:
+            # Corregir antes de detectar carrera: "fisca" debe contar como "fisica"
+            protected = self.explicit_carrera_terms | self.list_queries_keywords
+            corrected = self.spelling.correct_terms(terms, protected)
+            if corrected != terms:
+                logger.debug("🔤 Corrección: %s → %s", terms, corrected)
+            terms = corrected
+
         is_carrera_query = False
         if any(term in self.explicit_carrera_terms for term in terms):
             is_carrera_query = True
@@ -192,9 +438,109 @@ class PostgresRetriever:
                  return True
         return False
 
+    async def _search(
+        self, conn, terms: List[str], is_carrera_query: bool, is_general_query: bool,
+        limit: int, faculties: Optional[List[str]] = None
+    ) -> List[asyncpg.Record]:
+        """Consulta de fragmentos; con `faculties` solo se recorren esas particiones"""
+        params = []
+        faculty_filter = ""
+        if faculties:
+            params.append(faculties)
+            faculty_filter = "facultad = ANY($1::TEXT[])"
+
+        if not terms and not is_general_query:
+            params.append(limit)
+            rows = await conn.fetch(
+                f"""
+                SELECT id, contenido, categoria, facultad, palabras_clave, descripcion -- Añadido descripcion
+                FROM fragmentos_conocimiento
+                {"WHERE " + faculty_filter if faculty_filter else ""}
+                ORDER BY usado_count DESC
+                LIMIT ${len(params)}
+                """,
+                *params
+            )
+        elif is_general_query:
+            logger.debug("Consulta general detectada, buscando carreras o becas...")
+            params.append(limit)
+            rows = await conn.fetch(
+                f"""
+                SELECT id, contenido, categoria, facultad, palabras_clave, descripcion -- Añadido descripcion
+                FROM fragmentos_conocimiento
+                WHERE LOWER(categoria) LIKE ANY(ARRAY['%carrera%', '%beca%'])
+                {"AND " + faculty_filter if faculty_filter else ""}
+                ORDER BY usado_count DESC, relevancia DESC
+                LIMIT ${len(params)}
+                """,
+                *params
+            )
+        else:
+            # --- Lógica de búsqueda principal, ahora incluyendo 'descripcion' ---
+            similarity_conditions = []
+            ilike_conditions = []
+            keyword_conditions = []
+
+            for i, term in enumerate(terms):
+                # ILIKE: Buscar en contenido Y descripcion (si existe y no es NULL)
+                # La cláusula OR maneja el caso de descripcion NULL
+                ilike_conditions.append(f"(contenido ILIKE unaccent(${len(params) + 1}) OR (descripcion IS NOT NULL AND descripcion ILIKE unaccent(${len(params) + 1})))")
+                params.append(f"%{term}%")
+
+                # Similarity: Calcular similitud en contenido Y descripcion, tomar el máximo
+                # COALESCE maneja el caso de que descripcion sea NULL, devolviendo 0 para similarity
+                similarity_conditions.append(f"GREATEST(similarity(unaccent(contenido), unaccent(${len(params) + 1}::text)), COALESCE(similarity(unaccent(descripcion), unaccent(${len(params) + 1}::text)), 0)) > 0.3")
+                params.append(term)
+
+                # Keyword: Buscar en palabras_clave
+                keyword_conditions.append(f"${len(params) + 1} = ANY(palabras_clave)")
+                params.append(term)
+
+            all_conditions = " OR ".join(ilike_conditions + similarity_conditions + keyword_conditions)
+
+            # Parámetro para similarity en ORDER BY
+            params.append(terms[0])
+            similarity_param = f"${len(params)}"
+            similarity_order = (
+                f"GREATEST(similarity(unaccent(contenido), unaccent({similarity_param}::text)), "
+                f"COALESCE(similarity(unaccent(descripcion), unaccent({similarity_param}::text)), 0), 0) DESC"
+            )
+
+            if is_carrera_query:
+                 order_clause = f"""
+                     CASE
+                         WHEN contenido ILIKE '%carrera%' THEN 1
+                         WHEN contenido ILIKE '%licenciatura%' THEN 2
+                         WHEN contenido ILIKE '%profesorado%' THEN 3
+                         WHEN contenido ILIKE '%tecnicatura%' THEN 4
+                         ELSE 5
+                     END,
+                     {similarity_order},
+                     usado_count DESC
+                 """
+            else:
+                order_clause = f"{similarity_order}, usado_count DESC"
+
+            params.append(limit)
+
+            if faculty_filter:
+                all_conditions = f"{faculty_filter} AND ({all_conditions})"
+
+            sql = f"""
+            SELECT id, contenido, categoria, facultad, palabras_clave, descripcion -- Añadido descripcion
+            FROM fragmentos_conocimiento
+            WHERE {all_conditions}
+            ORDER BY {order_clause}
+            LIMIT ${len(params)}
+            """
+            rows = await conn.fetch(sql, *params)
+        return rows
+
     async def retrieve(
-        self, query: str, limit: int = 20
+        self, query: str, limit: int = 20, track_usage: bool = True,
+        cleaned: Optional[Tuple[List[str], bool]] = None
     ) -> Tuple[str, List[SearchResult], ResponseMode]:
+        """cleaned: resultado de _clean_query_terms(query) si quien llama ya lo calculó"""
         self.stats["queries"] += 1
         if not await self.connect():
             await asyncio.sleep(1)
@@ -202,87 +548,37 @@ class PostgresRetriever:
                 return "Error de base de datos.", [], ResponseMode.FALLBACK
 
         try:
-            terms, is_carrera_query = self._clean_query_terms(query)
+            terms, is_carrera_query = cleaned if cleaned is not None else self._clean_query_terms(query)
             is_general_query = self._is_general_list_query(query)
 
+            route = self.router.route(query)
+            self.last_route = route
+            logger.debug("🧭 Ruteo '%s': %s", query[:40], route.describe())
+
+            route_label = "facultad" if route.faculties else "global"
+            sql_start = time.perf_counter()
             async with self.pool.acquire() as conn:
-                if not terms and not is_general_query:
-                    rows = await conn.fetch(
-                        """
-                        SELECT id, contenido, categoria, facultad, palabras_clave, descripcion -- Añadido descripcion
-                        FROM fragmentos_conocimiento
-                        ORDER BY usado_count DESC
-                        LIMIT $1
-                        """,
-                        limit
-                    )
-                elif is_general_query:
-                    logger.debug(f"Consulta general detectada: '{query}', buscando carreras o becas...")
-                    rows = await conn.fetch(
-                        """
-                        SELECT id, contenido, categoria, facultad, palabras_clave, descripcion -- Añadido descripcion
-                        FROM fragmentos_conocimiento
-                        WHERE LOWER(categoria) LIKE ANY(ARRAY['%carrera%', '%beca%'])
-                        ORDER BY usado_count DESC, relevancia DESC
-                        LIMIT $1
-                        """,
-                        limit
+                trace_id = current_trace.get()
+                if trace_id:
+                    # Visible en pg_stat_activity y en el log de consultas lentas (%a)
+                    await conn.execute("SELECT set_config('application_name', $1, false)", f"unsa_bot/{trace_id}")
+                with span("sql", route=route_label) as attrs:
+                    rows = await self._search(
+                        conn, terms, is_carrera_query, is_general_query, limit, route.faculties
                     )
-                else:
-                    # --- Lógica de búsqueda principal, ahora incluyendo 'descripcion' ---
-                    similarity_conditions = []
-                    ilike_conditions = []
-                    keyword_conditions = []
-                    params = []
-
-                    for i, term in enumerate(terms):
-                        # ILIKE: Buscar en contenido Y descripcion (si existe y no es NULL)
-                        # La cláusula OR maneja el caso de descripcion NULL
-                        ilike_conditions.append(f"(contenido ILIKE unaccent(${len(params) + 1}) OR (descripcion IS NOT NULL AND descripcion ILIKE unaccent(${len(params) + 1})))")
-                        params.append(f"%{term}%")
-
-                        # Similarity: Calcular similitud en contenido Y descripcion, tomar el máximo
-                        # COALESCE maneja el caso de que descripcion sea NULL, devolviendo 0 para similarity
-                        similarity_conditions.append(f"GREATEST(similarity(unaccent(contenido), unaccent(${len(params) + 1}::text)), COALESCE(similarity(unaccent(descripcion), unaccent(${len(params) + 1}::text)), 0)) > 0.3")
-                        params.append(term)
-
-                        # Keyword: Buscar en palabras_clave
-                        keyword_conditions.append(f"${len(params) + 1} = ANY(palabras_clave)")
-                        params.append(term)
-
-                    all_conditions = " OR ".join(ilike_conditions + similarity_conditions + keyword_conditions)
-
-                    if is_carrera_query:
-                         order_clause = """
-                             CASE
-                                 WHEN contenido ILIKE '%carrera%' THEN 1
-                                 WHEN contenido ILIKE '%licenciatura%' THEN 2
-                                 WHEN contenido ILIKE '%profesorado%' THEN 3
-                                 WHEN contenido ILIKE '%tecnicatura%' THEN 4
-                                 ELSE 5
-                             END,
-                             GREATEST(similarity(unaccent(contenido), unaccent(${len(params) + 1}::text)), COALESCE(similarity(unaccent(descripcion), unaccent(${len(params) + 1}::text)), 0), 0) DESC,
-                             usado_count DESC
-                         """
-                         params.append(terms[0]) # Parámetro para similarity en ORDER BY
-                         similarity_param_index = len(params)
-                    else:
-                        order_clause = "GREATEST(similarity(unaccent(contenido), unaccent(${len(params) + 1}::text)), COALESCE(similarity(unaccent(descripcion), unaccent(${len(params) + 1}::text)), 0), 0) DESC, usado_count DESC"
-                        params.append(terms[0]) # Parámetro para similarity en ORDER BY
-                        similarity_param_index = len(params)
-
-                    params.append(limit)
-
-                    sql = f"""
-                    SELECT id, contenido, categoria, facultad, palabras_clave, descripcion -- Añadido descripcion
-                    FROM fragmentos_conocimiento
-                    WHERE {all_conditions}
-                    ORDER BY {order_clause}
-                    LIMIT ${similarity_param_index}
-                    """
-                    rows = await conn.fetch(sql, *params)
+                    attrs["rows"] = len(rows)
+                if not rows and route.faculties:
+                    # Detección errónea o facultad sin datos: se busca en todas
+                    self.router.stats["fallbacks"] += 1
+                    route_label = "reintento"
+                    with span("sql", route=route_label) as attrs:
+                        rows = await self._search(conn, terms, is_carrera_query, is_general_query, limit)
+                        attrs["rows"] = len(rows)
 
                 if not rows:
+                    RETRIEVAL_SECONDS.observe(
+                        time.perf_counter() - sql_start, mode=ResponseMode.FALLBACK.value, route=route_label
+                    )
                     return "No se encontró información.", [], ResponseMode.FALLBACK
 
                 # Mapear resultados, ahora incluyendo la descripcion
@@ -299,11 +595,17 @@ class PostgresRetriever:
                     for r in rows
                 ]
 
-                for r in results:
-                    await conn.execute(
-                        "UPDATE fragmentos_conocimiento SET usado_count = usado_count + 1 WHERE id = $1",
-                        r.id
-                    )
+                if track_usage:
+                    # Un solo UPDATE; facultad (clave de partición) poda las particiones a tocar
+                    with span("sql_uso", rows=len(results)):
+                        await conn.execute(
+                            """
+                            UPDATE fragmentos_conocimiento SET usado_count = usado_count + 1
+                            WHERE id = ANY($1) AND facultad = ANY($2::TEXT[])
+                            """,
+                            [r.id for r in results], sorted({r.faculty for r in results})
+                        )
+                sql_seconds = time.perf_counter() - sql_start
 
                 context = "\n".join(r.content for r in results)
                 total_len = sum(len(r.content) for r in results)
@@ -315,6 +617,7 @@ class PostgresRetriever:
                 else:
                     mode = ResponseMode.LLM
 
+                RETRIEVAL_SECONDS.observe(sql_seconds, mode=mode.value, route=route_label)
                 return context, results, mode
         except Exception as e:
             self.stats["errors"] += 1
@@ -0,0 +1,171 @@
+# ./frontend/bot/semantic_cache.py
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .config import logger
+from .models import SearchResult
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+
+@dataclass
+class CacheEntry:
+    scope: str
+    slot: int
+    answer: str
+    fragment_ids: frozenset
+
+
+class SemanticAnswerCache:
+    """
+    Caché de respuestas del LLM por similitud de la pregunta.
+    La pregunta se embebe en CPU (sentence-transformers, vectores normalizados) y
+    solo se compara contra preguntas respondidas con el mismo contexto (mismo
+    conjunto de fragmentos): el ámbito reduce la búsqueda a pocas filas de una
+    matriz float16 preasignada, con desalojo LRU por slot.
+    """
+    def __init__(self, model_name: str, threshold: float = 0.9, max_entries: int = 2000,
+                 enabled: bool = True):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled and SentenceTransformer is not None
+        self.model = None
+        self.vectors: Optional[np.ndarray] = None           # (max_entries, dim) float16
+        self.entries: "OrderedDict[int, CacheEntry]" = OrderedDict()  # slot → entrada, orden LRU
+        self.scopes: Dict[str, Set[int]] = {}
+        self.free_slots: List[int] = list(range(max_entries - 1, -1, -1))
+        self._load_lock = asyncio.Lock()
+        self._warmup_task: Optional[asyncio.Task] = None
+        self.stats = {
+            "embeds": 0, "lookups": 0, "hits": 0, "stores": 0, "evictions": 0, "invalidated": 0,
+            "embed_ms": 0.0, "search_ms": 0.0, "max_lookup_ms": 0.0,
+        }
+        if enabled and SentenceTransformer is None:
+            logger.warning("⚠️ sentence-transformers no instalado: caché semántica desactivada")
+
+    @staticmethod
+    def scope(results: List[SearchResult]) -> str:
+        """Ámbito = conjunto de fragmentos del contexto (independiente del orden)"""
+        ids = sorted(str(r.id) for r in results)
+        return hashlib.sha1(",".join(ids).encode()).hexdigest()
+
+    async def warmup(self):
+        """Carga el modelo fuera del event loop (primera vez)"""
+        if not self.enabled or self.model is not None:
+            return
+        async with self._load_lock:
+            if self.model is not None:
+                return
+            start = time.perf_counter()
+            try:
+                self.model = await asyncio.to_thread(SentenceTransformer, self.model_name, device="cpu")
+            except Exception as e:
+                self.enabled = False
+                logger.error("❌ No se pudo cargar el modelo de embeddings %s: %s", self.model_name, e)
+                return
+            dim = self.model.get_sentence_embedding_dimension()
+            self.vectors = np.zeros((self.max_entries, dim), dtype=np.float16)
+            logger.info("🧠 Caché semántica lista: %s (%d dims) en %.1fs",
+                        self.model_name, dim, time.perf_counter() - start)
+
+    def _start_warmup(self):
+        """Lanza la carga en segundo plano si nadie la inició (main_async la lanza al arrancar)"""
+        if self._warmup_task is None and not self._load_lock.locked():
+            self._warmup_task = asyncio.create_task(self.warmup())
+
+    def _embed(self, text: str) -> np.ndarray:
+        return self.model.encode([text], normalize_embeddings=True, convert_to_numpy=True)[0].astype(np.float32)
+
+    async def embed(self, question: str) -> Optional[np.ndarray]:
+        """Embedding de la pregunta (no depende del contexto: puede correr junto a la recuperación)"""
+        if not self.enabled:
+            return None
+        if self.model is None:
+            # Nunca se espera al modelo: mientras carga (o se descarga) la pregunta es un miss
+            self._start_warmup()
+            return None
+        start = time.perf_counter()
+        try:
+            vector = await asyncio.to_thread(self._embed, question)
+        except Exception as e:
+            # La caché es un atajo: si falla el embedding, la pregunta sigue como un miss
+            logger.error("❌ Error calculando embedding para la caché semántica: %s", e)
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stats["embeds"] += 1
+        self.stats["embed_ms"] += elapsed
+        self.stats["max_lookup_ms"] = max(self.stats["max_lookup_ms"], elapsed)
+        return vector
+
+    def search(self, vector: Optional[np.ndarray], scope: str) -> Optional[str]:
+        """Respuesta reutilizable entre las preguntas del mismo ámbito, o None"""
+        if vector is None:
+            return None
+        start = time.perf_counter()
+        answer = None
+        slots = self.scopes.get(scope)
+        if slots:
+            candidates = np.fromiter(slots, dtype=np.int64, count=len(slots))
+            scores = self.vectors[candidates].astype(np.float32) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                slot = int(candidates[best])
+                self.entries.move_to_end(slot)
+                answer = self.entries[slot].answer
+                self.stats["hits"] += 1
+        self.stats["lookups"] += 1
+        self.stats["search_ms"] += (time.perf_counter() - start) * 1000
+        return answer
+
+    async def lookup(self, question: str, scope: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """(respuesta reutilizable o None, embedding de la pregunta para store())"""
+        vector = await self.embed(question)
+        return self.search(vector, scope), vector
+
+    def store(self, scope: str, vector: Optional[np.ndarray], answer: str, results: List[SearchResult]):
+        if vector is None or not answer:
+            return
+        if not self.free_slots:
+            self._evict(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+        slot = self.free_slots.pop()
+        self.vectors[slot] = vector
+        self.entries[slot] = CacheEntry(scope, slot, answer, frozenset(str(r.id) for r in results))
+        self.scopes.setdefault(scope, set()).add(slot)
+        self.stats["stores"] += 1
+
+    def _evict(self, slot: int):
+        entry = self.entries.pop(slot)
+        slots = self.scopes[entry.scope]
+        slots.discard(slot)
+        if not slots:
+            del self.scopes[entry.scope]
+        self.free_slots.append(slot)
+
+    async def on_changes(self, cambios):
+        """Listener del feed de cambios: descarta respuestas cuyo contexto cambió"""
+        changed = {c["fragmento_id"] for c in cambios if c["operacion"] in ("update", "delete")}
+        stale = [slot for slot, e in self.entries.items() if e.fragment_ids & changed]
+        for slot in stale:
+            self._evict(slot)
+        self.stats["invalidated"] += len(stale)
+
+    def summary(self) -> dict:
+        lookups = max(self.stats["lookups"], 1)
+        return {
+            "size": len(self.entries),
+            "hit_rate": self.stats["hits"] / lookups,
+            "avg_embed_ms": self.stats["embed_ms"] / max(self.stats["embeds"], 1),
+            "avg_search_ms": self.stats["search_ms"] / lookups,
+            **self.stats,
+        }
@@ -0,0 +1,144 @@
+# ./frontend/bot/spelling.py
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Palabras del corpus: minúsculas sin acentos (igual que _clean_query_terms)
+WORD_RE = re.compile(r"[a-z]+")
+
+
+def normalize_word_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def corpus_words(*texts: Optional[str]) -> Set[str]:
+    """Vocabulario único de uno o varios textos de un fragmento"""
+    words = set()
+    for text in texts:
+        if text:
+            words.update(WORD_RE.findall(normalize_word_text(text)))
+    return words
+
+
+def osa_distance(a: str, b: str, max_distance: int) -> int:
+    """Damerau-Levenshtein restringida (transposiciones adyacentes); max_distance+1 si la supera"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            row_min = min(row_min, cur[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SymSpellIndex:
+    """
+    Índice de borrados tipo SymSpell sobre el vocabulario del corpus.
+    Cada palabra se indexa por los borrados (hasta max_distance) de su prefijo;
+    una consulta genera los borrados de su propio prefijo y solo compara contra
+    esas candidatas, sin recorrer el diccionario.
+    Acotado en memoria: prefijo de prefix_length letras y como mucho max_words
+    palabras en el índice de borrados (las que excedan se ignoran hasta el
+    próximo rebuild, que conserva las más frecuentes).
+    """
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7, max_words: int = 50_000,
+                 min_length: int = 3, max_length: int = 24):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.max_words = max_words
+        self.min_length = min_length
+        self.max_length = max_length
+        self.counts: Dict[str, int] = {}            # palabra → fragmentos que la contienen
+        self.deletes: Dict[str, List[str]] = defaultdict(list)
+        self.stats = {"lookups": 0, "corrections": 0, "skipped_words": 0, "lookup_us": 0.0}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def _delete_variants(self, word: str, max_distance: int = None) -> Set[str]:
+        prefix = word[:self.prefix_length]
+        variants = {prefix}
+        frontier = {prefix}
+        for _ in range(self.max_distance if max_distance is None else max_distance):
+            nxt = set()
+            for w in frontier:
+                if len(w) <= 1:
+                    continue
+                for i in range(len(w)):
+                    nxt.add(w[:i] + w[i + 1:])
+            variants |= nxt
+            frontier = nxt
+        return variants
+
+    def add_words(self, words: Iterable[str]):
+        """Suma una aparición (por fragmento) de cada palabra"""
+        for word in words:
+            if not self.min_length <= len(word) <= self.max_length:
+                continue
+            if word in self.counts:
+                self.counts[word] += 1
+                continue
+            if len(self.counts) >= self.max_words:
+                self.stats["skipped_words"] += 1
+                continue
+            self.counts[word] = 1
+            for variant in self._delete_variants(word):
+                self.deletes[variant].append(word)
+
+    @classmethod
+    def from_counts(cls, frequencies: Dict[str, int], **kwargs) -> "SymSpellIndex":
+        """Índice completo; con tope de palabras se quedan las más frecuentes"""
+        index = cls(**kwargs)
+        ranked = sorted(
+            ((w, c) for w, c in frequencies.items() if index.min_length <= len(w) <= index.max_length),
+            key=lambda kv: -kv[1]
+        )
+        index.stats["skipped_words"] = max(0, len(ranked) - index.max_words)
+        for word, count in ranked[:index.max_words]:
+            index.counts[word] = count
+            for variant in index._delete_variants(word):
+                index.deletes[variant].append(word)
+        return index
+
+    def lookup(self, term: str) -> Tuple[str, int]:
+        """(corrección, distancia); el término sin cambios si es conocido o no hay candidata"""
+        start = time.perf_counter()
+        self.stats["lookups"] += 1
+        try:
+            if term in self.counts or not term.isalpha():
+                return term, 0
+            # Términos cortos toleran un solo error: con dos casi todo es candidato
+            max_distance = 1 if len(term) <= 5 else self.max_distance
+            best, best_distance, best_count = term, max_distance + 1, 0
+            seen = set()
+            for variant in self._delete_variants(term, max_distance):
+                for candidate in self.deletes.get(variant, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = osa_distance(term, candidate, max_distance)
+                    count = self.counts[candidate]
+                    if distance < best_distance or (distance == best_distance and count > best_count):
+                        best, best_distance, best_count = candidate, distance, count
+            if best_distance > max_distance:
+                return term, 0
+            self.stats["corrections"] += 1
+            return best, best_distance
+        finally:
+            self.stats["lookup_us"] += (time.perf_counter() - start) * 1e6
+
+    def correct_terms(self, terms: List[str], protected: Set[str] = frozenset()) -> List[str]:
+        return [t if t in protected else self.lookup(t)[0] for t in terms]
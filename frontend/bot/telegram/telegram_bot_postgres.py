@@ -10,29 +10,47 @@ import asyncio
 import aiohttp
 import hashlib
 import time
-import re
 import signal
 import sys
 from collections import defaultdict
-from typing import Optional
+from typing import List, Optional, Set
 import yaml
 from pathlib import Path
 
 from telegram import Update
 from telegram.constants import ChatAction
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
-from telegram.error import TimedOut, NetworkError  # Importar errores de red
 
 # Importaciones desde los módulos
 from ..config import (
-    TOKEN, DEBUG_MODE, INFERENCE_API_URL, DATABASE_URL,
+    TOKEN, DEBUG_MODE, DATABASE_URL, USE_SERVER_TEMPLATES,
+    INFERENCE_REPLICAS, INFERENCE_STICKY_KEY, INFERENCE_MAX_FAILURES,
+    INFERENCE_EJECT_SECONDS, INFERENCE_HEALTH_INTERVAL,
     REQUEST_TIMEOUT, RETRY_ATTEMPTS, RETRY_DELAY,
-    RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_REQUESTS,
+    RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_REQUESTS, LLM_TRUNCATION,
+    STATS_FLUSH_INTERVAL, FAQ_RELOAD_INTERVAL, GREETING_REPEAT_WINDOW,
+    DEBOUNCE_WINDOW, DEBOUNCE_MAX_WAIT, DEBOUNCE_COMPLETE_WORDS,
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_WORKERS, METRICS_HOST, METRICS_PORT,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE,
     logger
 )
 from ..models import ResponseMode, SearchResult
-from ..utils import RateLimiter, anonymize_message, escape_md
+from ..utils import RateLimiter, anonymize_message, escape_md, parse_retry_after
 from ..retriever import PostgresRetriever
+from ..inference_client import InferencePool
+from common.log_pipeline import SAMPLED
+from common.tracing import TRACE_HEADER
+from ..query_stats import QueryStatsAggregator
+from ..faq import FaqStore
+from ..semantic_cache import SemanticAnswerCache
+from ..greetings import GreetingPool, greeting_tokens, is_greeting, is_small_talk
+from ..debounce import MessageDebouncer
+from ..pipeline import Classification, Decision, PipelineMetrics, StageTimer
+from ..outbound import OutboundDispatcher
+from ..tracing import current_trace, new_trace, span
+from ..metrics import (
+    REGISTRY, HANDLER_SECONDS, LLM_SECONDS, RETRIEVAL_SECONDS, TELEGRAM_SEND_SECONDS, start_metrics_server
+)
 
 
 # ----------------------------------------------------------------------
@@ -70,11 +88,74 @@ class BotManager:
         self.prompts = prompts['llm']
         self.start_time = time.time()
         self.user_stats = {"messages": 0, "users": set()}
-        self.last_message_time = {}
         self.limiter = RateLimiter(RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_REQUESTS)
         self.session: Optional[aiohttp.ClientSession] = None
+        self.inference = InferencePool(
+            INFERENCE_REPLICAS,
+            max_failures=INFERENCE_MAX_FAILURES,
+            eject_seconds=INFERENCE_EJECT_SECONDS
+        )
         self.stop_event = asyncio.Event()
+        self.typing_tasks: Set[asyncio.Task] = set()  # "escribiendo…" en curso (referencia fuerte)
         self.last_results_by_user = {}
+        self.query_stats = QueryStatsAggregator(
+            lambda: self.retriever.pool if self.retriever.connected else None,
+            flush_interval=STATS_FLUSH_INTERVAL
+        )
+        self.faq = FaqStore(
+            lambda: self.retriever.pool if self.retriever.connected else None,
+            get_spelling=lambda: self.retriever.spelling,
+            reload_interval=FAQ_RELOAD_INTERVAL
+        )
+        self.retriever.on_knowledge_change(self.faq.on_changes)
+        self.semantic_cache = SemanticAnswerCache(
+            SEMANTIC_CACHE_MODEL,
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            max_entries=SEMANTIC_CACHE_SIZE,
+            enabled=SEMANTIC_CACHE_ENABLED
+        )
+        self.retriever.on_knowledge_change(self.semantic_cache.on_changes)
+        self.greetings = GreetingPool(repeat_window=GREETING_REPEAT_WINDOW)
+        self.pipeline_metrics = PipelineMetrics()
+        self.outbound = OutboundDispatcher(
+            global_rate=OUTBOUND_GLOBAL_RATE, chat_rate=OUTBOUND_CHAT_RATE, workers=OUTBOUND_WORKERS
+        )
+        self.debouncer = MessageDebouncer(
+            self._process_message, window=DEBOUNCE_WINDOW, max_wait=DEBOUNCE_MAX_WAIT,
+            complete_words=DEBOUNCE_COMPLETE_WORDS
+        )
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """Gauges y contadores leídos al momento del scrape desde el estado existente"""
+        def db_pool():
+            pool = self.retriever.pool if self.retriever.connected else None
+            if pool is None:
+                return {}
+            idle = pool.get_idle_size()
+            return {("in_use",): pool.get_size() - idle, ("idle",): idle, ("max",): pool.get_max_size()}
+
+        def http_session():
+            if self.session is None or self.session.closed:
+                return {}
+            in_flight = sum(r.outstanding for r in self.inference.replicas)
+            return {("in_flight",): in_flight, ("limit",): self.session.connector.limit}
+
+        REGISTRY.callback("bot_db_pool_connections", "Conexiones del pool asyncpg", db_pool, ("state",))
+        REGISTRY.callback("bot_http_session_connections", "Solicitudes al servidor de inferencia y límite del conector aiohttp",
+                          http_session, ("state",))
+        REGISTRY.callback("bot_outbound_queue_depth", "Mensajes en la cola de salida a Telegram",
+                          lambda: {(): self.outbound.depth()})
+        REGISTRY.callback("bot_cache_lookups_total", "Consultas a cada caché", lambda: {
+            ("semantic",): self.semantic_cache.stats["lookups"],
+            ("faq",): self.faq.stats["hits"] + self.faq.stats["misses"],
+        }, ("cache",), kind="counter")
+        REGISTRY.callback("bot_cache_hits_total", "Aciertos de cada caché", lambda: {
+            ("semantic",): self.semantic_cache.stats["hits"],
+            ("faq",): self.faq.stats["hits"],
+        }, ("cache",), kind="counter")
+        REGISTRY.callback("bot_uptime_seconds", "Segundos desde el arranque del bot",
+                          lambda: {(): time.time() - self.start_time})
 
     # Preguntas sobre el bot mismo
     ABOUT_TRIGGERS = {
@@ -112,30 +193,12 @@ y actualmente se dedica al desarrollo de arquitectura (Agentes de IA) para Intel
 
 """
 
-    async def _safe_reply(self, update: Update, text: str, parse_mode: str = None, max_retries: int = 3):
+    async def _safe_reply(self, update: Update, text: str, parse_mode: str = None):
         """
-        Envía un mensaje de forma segura con reintentos en caso de timeout o error de red.
+        Encola la respuesta sin esperar el envío: límites de Telegram, troceo de
+        textos largos y reintentos quedan a cargo de la cola de salida.
         """
-        for attempt in range(max_retries):
-            try:
-                if parse_mode:
-                    await update.message.reply_text(text, parse_mode=parse_mode)
-                else:
-                    await update.message.reply_text(text)
-                return  # Éxito, salimos
-            except (TimedOut, NetworkError) as e:
-                logger.warning(f"Error de red al enviar mensaje (intento {attempt+1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    # Esperar antes de reintentar (backoff simple)
-                    await asyncio.sleep(1 * (attempt + 1))
-                else:
-                    # Último intento falló, registramos y no podemos hacer más
-                    logger.error(f"No se pudo enviar mensaje después de {max_retries} intentos: {text[:100]}...")
-                    # Opcional: notificar por otro lado, pero no tenemos contexto
-            except Exception as e:
-                # Otros errores no relacionados con red, no reintentamos
-                logger.error(f"Error inesperado al enviar mensaje: {e}")
-                break
+        self.outbound.enqueue(update.effective_chat.id, text, parse_mode)
 
     async def init_session(self):
         """Inicializa la sesión HTTP persistente"""
@@ -155,6 +218,7 @@ y actualmente se dedica al desarrollo de arquitectura (Agentes de IA) para Intel
 
     async def close_resources(self):
         """Cierra todos los recursos limpiamente"""
+        await self.debouncer.close()
         tasks = [
             self.close_session(),
             self.retriever.disconnect()
@@ -171,35 +235,86 @@ y actualmente se dedica al desarrollo de arquitectura (Agentes de IA) para Intel
         logger.info("🛑 Recibida señal de parada, cerrando recursos...")
         self.stop_event.set()
 
-    def _build_prompt(self, question: str, context: str) -> str:
-        return self.prompts['main'].format(context=context, question=question)
+    def _render_prompt(self, template: str, variables: dict) -> str:
+        return self.prompts[template].format(**variables)
 
-    async def _call_llm(self, prompt: str, user_hash: str) -> str:
+    async def _call_llm(self, template: str, variables: dict, user_hash: str, temperature: float = 0.2) -> str:
+        """
+        Llama al servidor de inferencia con el nombre de la plantilla y sus variables.
+        Si el servidor no conoce la plantilla, se envía el prompt completo a /generate.
+        Cada intento va a una réplica distinta cuando hay más de una.
+        """
         max_retries = RETRY_ATTEMPTS
         base_delay = RETRY_DELAY
+        use_templates = USE_SERVER_TEMPLATES
+        sticky_key = template if INFERENCE_STICKY_KEY == "template" else user_hash
+        tried = set()
+        trace_headers = {TRACE_HEADER: current_trace.get()} if current_trace.get() else None
 
         for attempt in range(max_retries + 1):
+            if len(tried) >= len(self.inference.replicas):
+                tried.clear()
+
             try:
                 if self.session is None or self.session.closed:
                     await self.init_session()
 
-                async with self.session.post(
-                    INFERENCE_API_URL,
-                    json={
-                        "prompt": prompt,
-                        "user_id": user_hash,
-                        "max_tokens": 500,
-                        "temperature": 0.2
-                    }
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        answer = data.get("response", "").strip()
-                        if answer:
-                            return answer
-                        logger.warning(f"Respuesta vacía de IA en intento {attempt+1}")
-                    else:
-                        logger.warning(f"Error HTTP {resp.status} en intento {attempt+1}")
+                if use_templates:
+                    path = "/generate_template"
+                    payload = {"template": template, "variables": variables}
+                else:
+                    path = "/generate"
+                    payload = {"prompt": self._render_prompt(template, variables)}
+                payload.update({
+                    "user_id": user_hash,
+                    "max_tokens": 500,
+                    "temperature": temperature,
+                    "truncation": LLM_TRUNCATION
+                })
+
+                backoff = 0.0
+                async with self.inference.acquire(sticky_key, exclude=tried) as replica:
+                    tried.add(replica.base_url)
+                    try:
+                        with LLM_SECONDS.time(template=template, status="error") as labels, \
+                                span("llm", template=template, replica=replica.base_url, attempt=attempt + 1) as attrs:
+                            async with self.session.post(replica.url(path), json=payload, headers=trace_headers) as resp:
+                                labels["status"] = attrs["status"] = resp.status
+                                if resp.status == 404 and use_templates:
+                                    logger.warning(f"Plantilla '{template}' no disponible en el servidor, enviando prompt completo")
+                                    use_templates = False
+                                    tried.discard(replica.base_url)
+                                    continue
+                                if resp.status in (413, 422):
+                                    # Error determinista (prompt demasiado largo o inválido): reintentar no sirve
+                                    detail = await resp.text()
+                                    logger.warning(f"Solicitud rechazada por el servidor (HTTP {resp.status}): {detail[:200]}")
+                                    break
+                                if resp.status == 200:
+                                    self.inference.report_success(replica)
+                                    data = await resp.json()
+                                    answer = data.get("response", "").strip()
+                                    if answer:
+                                        return answer
+                                    logger.warning(f"Respuesta vacía de IA en intento {attempt+1}")
+                                elif resp.status == 503:
+                                    # Servidor saturado o en warmup: respetar Retry-After (segundos o fecha HTTP)
+                                    logger.warning(f"Servidor de IA {replica.base_url} no disponible (HTTP 503) en intento {attempt+1}")
+                                    if attempt < max_retries and len(self.inference.replicas) == 1:
+                                        backoff = parse_retry_after(
+                                            resp.headers.get("Retry-After"), base_delay * (attempt + 1), REQUEST_TIMEOUT
+                                        )
+                                else:
+                                    self.inference.report_failure(replica)
+                                    logger.warning(f"Error HTTP {resp.status} de {replica.base_url} en intento {attempt+1}")
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        self.inference.report_failure(replica)
+                        raise
+                if backoff:
+                    # Espera fuera de la medición de ida y vuelta, en lugar de la espera normal
+                    logger.info(f"Esperando {backoff:.1f}s (Retry-After) antes de reintento {attempt+2}/{max_retries+1}")
+                    await asyncio.sleep(backoff)
+                    continue
 
             except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 logger.warning(f"Error de conexión en intento {attempt+1}: {e}")
@@ -242,6 +357,7 @@ y actualmente se dedica al desarrollo de arquitectura (Agentes de IA) para Intel
             "/help – Esta ayuda\n"
             "/stats – Estadísticas del bot\n"
             "/diagnose – Estado del sistema\n"
+            "/route – Ver a qué facultad se dirige una consulta\n"
             "/about – Información sobre el bot\n\n"
             "*También podés escribir tu consulta directamente.*\n"
             "Ejemplos:\n"
@@ -263,6 +379,16 @@ y actualmente se dedica al desarrollo de arquitectura (Agentes de IA) para Intel
         "de que se trabaja"
     }
 
+    def _query_type(self, msg: str, is_carrera_query: bool) -> str:
+        """Tipo de consulta para estadisticas_anonimas"""
+        if self.is_explanatory_question(msg):
+            return "explicativa"
+        if is_carrera_query:
+            return "carrera"
+        if self.retriever._is_general_list_query(msg):
+            return "listado"
+        return "general"
+
     def is_explanatory_question(self, msg: str) -> bool:
         msg = msg.lower()
         return any(t in msg for t in self.EXPLANATORY_TRIGGERS)
@@ -277,144 +403,237 @@ y actualmente se dedica al desarrollo de arquitectura (Agentes de IA) para Intel
 
         msg = update.message.text.strip()
         user_id = update.effective_user.id
+        # Traza del update: la heredan (al crearse) las tareas del debouncer, la
+        # recuperación, el LLM y la cola de salida; se quita al volver al despachador
+        trace_token = new_trace()
+        try:
+            if not self.limiter.is_allowed(user_id):
+                await self._safe_reply(
+                    update,
+                    "⏳ Has excedido el límite de solicitudes. "
+                    "Por favor, espera unos minutos antes de volver a intentarlo."
+                )
+                return
 
-        if not self.limiter.is_allowed(user_id):
-            await self._safe_reply(
-                update,
-                "⏳ Has excedido el límite de solicitudes. "
-                "Por favor, espera unos minutos antes de volver a intentarlo."
-            )
-            return
+            chat_id = update.effective_chat.id
+            if chat_id not in self.debouncer.bursts:
+                # Fuera del camino crítico: no se espera la ida y vuelta a Telegram
+                task = asyncio.create_task(self._send_typing(context.bot, chat_id))
+                self.typing_tasks.add(task)
+                task.add_done_callback(self.typing_tasks.discard)
 
-        # Detectar preguntas sobre el bot
-        msg_lower = msg.lower()
-        if any(trigger in msg_lower for trigger in self.ABOUT_TRIGGERS):
-            await self._safe_reply(update, self.ABOUT_MESSAGE, parse_mode="Markdown")
-            return
+            # Una pregunta escrita en varios mensajes seguidos se procesa como una sola
+            self.debouncer.submit(chat_id, update, context, msg)
+        finally:
+            current_trace.reset(trace_token)
 
-        now = time.time()
-        last = self.last_message_time.get(user_id, 0)
-        if now - last < 1.5:
-            return
-        self.last_message_time[user_id] = now
+    async def _send_typing(self, bot, chat_id: int):
+        try:
+            await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+        except Exception as e:
+            logger.debug("Indicador de escritura no enviado: %s", e)
 
-        user_hash = hashlib.md5(str(user_id).encode()).hexdigest()[:8]
-        self.user_stats["users"].add(user_hash)
-        self.user_stats["messages"] += 1
+    async def _process_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE, msg: str, parts: int = 1):
+        """
+        Pipeline de una ráfaga de mensajes (ya unida por el debouncer):
+        classify → retrieve → decide → generate → send, con a lo sumo una
+        llamada al LLM y el tiempo de cada etapa registrado.
+        """
+        if self.stop_event.is_set():
+            return
 
-        logger.info("📩 Usuario %s: %s", user_hash, anonymize_message(msg))
+        timer = StageTimer()
+        user_hash = hashlib.md5(str(update.effective_user.id).encode()).hexdigest()[:8]
+        route, mode, results = "consulta", None, []
+        try:
+            with timer.stage("classify"):
+                cls = self._classify(msg, user_hash)
+            route = cls.kind
+
+            if cls.kind != "about":
+                self.user_stats["users"].add(user_hash)
+                self.user_stats["messages"] += 1
+                logger.info("📩 Usuario %s [%s] (%d msj): %s", user_hash, current_trace.get(), parts,
+                            anonymize_message(msg), extra=SAMPLED)
+
+            context_text, question_vector = "", None
+            with timer.stage("retrieve"):
+                if cls.kind in ("explicativa", "consulta"):
+                    context_text, results, mode, question_vector = await self._retrieve_stage(msg, cls, user_hash)
+
+            with timer.stage("decide"):
+                decision = self._decide(msg, cls, update.effective_chat.id, context_text, results, mode,
+                                        question_vector)
+
+            answer, parse_mode, outcome = decision.reply, decision.parse_mode, cls.kind
+            if decision.template:
+                with timer.stage("generate"):
+                    try:
+                        answer = await self._call_llm(decision.template, decision.variables, user_hash)
+                    except Exception as e:
+                        logger.error("❌ API error: %s", str(e))
+                        answer = ""
+                if answer:
+                    outcome = "llm"
+                    if decision.cache_scope:
+                        self.semantic_cache.store(decision.cache_scope, question_vector, answer, decision.results)
+                else:
+                    logger.info(f"Falló IA para usuario {user_hash}, usando fallback directo")
+                    answer, parse_mode, outcome = decision.fallback, "Markdown", "respaldo"
+            elif mode is not None:
+                outcome = {"direct": "directa", "fallback": "sin datos"}.get(mode.value, "cache")
+        except Exception as e:
+            # El usuario siempre recibe respuesta: lo recuperado hasta el error o un aviso
+            logger.error("❌ Error inesperado en el pipeline (%s): %s", route, str(e))
+            answer, parse_mode, outcome = self._error_fallback(results), "Markdown", "error"
 
-        await context.bot.send_chat_action(
-            chat_id=update.effective_chat.id,
-            action=ChatAction.TYPING
-        )
+        with timer.stage("send"):
+            await self._safe_reply(update, answer, parse_mode=parse_mode)
 
-        GREETINGS = {"hola", "buenas", "buen", "hey", "saludos",
-                     "como va", "hi", "holaa", "holaaa"
-                     }
-        msg_norm = re.sub(r"[^\w\s]", "", msg.lower())
-        tokens = msg_norm.split()
-        is_greeting = any(t in GREETINGS for t in tokens)
+        self.pipeline_metrics.observe(timer, outcome)
+        HANDLER_SECONDS.observe(timer.total_ms() / 1000, mode=mode.value if mode else "none", route=route)
+        timer.finish(route=route, outcome=outcome)
+        logger.info("⏱️ %s [%s] [%s] %s", user_hash, current_trace.get(), outcome, timer.describe(), extra=SAMPLED)
 
-        if is_greeting:
-            prompt = self.prompts['greeting'].format(msg=msg)
-            answer = await self._call_llm(prompt, user_hash)
+    def _classify(self, msg: str, user_hash: str) -> Classification:
+        """Etapa 1: tipo de mensaje y respuestas que no necesitan la base de datos"""
+        msg_lower = msg.lower()
+        if any(trigger in msg_lower for trigger in self.ABOUT_TRIGGERS):
+            return Classification("about", "about")
 
-            if answer:
-                await self._safe_reply(update, answer)
-            else:
-                await self._safe_reply(
-                    update,
-                    "👋 YoguI A, el asistente no oficial te saluda.\n\n"
-                    "Podés preguntarme sobre becas, carreras, inscripciones o trámites.\n"
-                    "Usá /help para ver los comandos."
-                )
-            return
+        # Saludo puro: respuesta pregenerada sin LLM. Un saludo con una consulta
+        # ("hola, ¿qué becas hay?") sigue el camino normal de la consulta.
+        tokens = greeting_tokens(msg)
+        if is_greeting(tokens) and is_small_talk(tokens):
+            return Classification("saludo", "saludo")
 
         if self.is_explanatory_question(msg):
-            prev_results = self.last_results_by_user.get(user_hash)
-            if prev_results:
-                careers_list = "\n".join(f"- {r.content}" for r in prev_results)
-                prompt = self.prompts['explanatory_with_prev'].format(
-                    careers_list=careers_list, msg=msg
-                )
-                answer = await self._call_llm(prompt, user_hash)
-                if answer:
-                    await self._safe_reply(update, answer)
-                    return
+            return Classification(
+                "explicativa", "explicativa", prev_results=self.last_results_by_user.get(user_hash)
+            )
 
-        context_text, results, mode = await self.retriever.retrieve(msg, limit=20)
+        # Respuesta precalculada (faq_precompute): sin base de datos ni LLM
+        faq_key = self.faq.key(msg)
+        # Términos limpios una sola vez: los usan el tipo de consulta y la recuperación
+        cleaned = self.retriever._clean_query_terms(msg)
+        kind = "faq" if self.faq.match(faq_key) else "consulta"
+        return Classification(kind, self._query_type(msg, cleaned[1]), faq_key, cleaned=cleaned)
+
+    async def _retrieve_stage(self, msg: str, cls: Classification, user_hash: str):
+        """Etapa 2: recuperación y, en paralelo, el embedding para la caché semántica"""
+        if cls.kind == "explicativa" and cls.prev_results:
+            # Explicación sobre las carreras de la respuesta anterior: no hace falta buscar
+            return "", [], None, None
+        if cls.kind == "consulta":
+            (context_text, results, mode), question_vector = await asyncio.gather(
+                self.retriever.retrieve(msg, limit=20, cleaned=cls.cleaned),
+                self.semantic_cache.embed(msg)
+            )
+        else:
+            (context_text, results, mode), question_vector = await self.retriever.retrieve(msg, limit=20), None
 
+        if mode != ResponseMode.FALLBACK:
+            self.faq.record_miss(cls.faq_key, msg)
         if results and any("Carrera" in r.content for r in results):
             self.last_results_by_user[user_hash] = results
-
-        if self.is_explanatory_question(msg):
-            prev_results = self.last_results_by_user.get(user_hash)
-            if prev_results:
-                palabras_pregunta = set(msg.lower().split())
-                filtered_careers = []
-                for r in prev_results:
-                    if any(p in r.content.lower() for p in palabras_pregunta) or len(palabras_pregunta) < 4:
-                        filtered_careers.append(r)
-                if not filtered_careers:
-                    filtered_careers = prev_results[:3]
-                careers_list = "\n".join(f"- {r.content}" for r in filtered_careers)
-                prompt = self.prompts['explanatory_with_new'].format(
-                    careers_list=careers_list, msg=msg
-                )
-                answer = await self._call_llm(prompt, user_hash)
-                if answer:
-                    await self._safe_reply(update, answer)
-                    return
-
-        if mode == ResponseMode.FALLBACK:
-            await self._safe_reply(
-                update,
-                "No tengo información específica sobre eso.\nVisitá https://www.unsa.edu.ar"
+        return context_text, results, mode, question_vector
+
+    def _decide(self, msg: str, cls: Classification, chat_id: int, context_text: str, results: List[SearchResult],
+                mode: Optional[ResponseMode], question_vector) -> Decision:
+        """Etapa 3: respuesta lista o la única plantilla a generar"""
+        if cls.kind == "about":
+            self.query_stats.record("about")
+            return Decision(reply=self.ABOUT_MESSAGE, parse_mode="Markdown")
+        if cls.kind == "saludo":
+            self.query_stats.record("saludo")
+            return Decision(reply=self.greetings.pick(chat_id))
+        if cls.kind == "faq":
+            self.query_stats.record(cls.query_type, mode=ResponseMode.DIRECT)
+            return Decision(reply=self.faq.answers[cls.faq_key].answer)
+
+        no_data = Decision(reply="No tengo información específica sobre eso.\nVisitá https://www.unsa.edu.ar")
+
+        if cls.kind == "explicativa":
+            if cls.prev_results:
+                careers = cls.prev_results
+                template = 'explanatory_with_prev'
+                self.query_stats.record("explicativa", careers, ResponseMode.LLM)
+            else:
+                self.query_stats.record("explicativa", results, mode)
+                if mode == ResponseMode.FALLBACK or not results:
+                    return no_data
+                careers = self._relevant_careers(msg, results)
+                template = 'explanatory_with_new'
+            return Decision(
+                template=template,
+                variables={"careers_list": "\n".join(f"- {r.content}" for r in careers), "msg": msg},
+                fallback=self._db_fallback(careers),
+                results=careers
             )
-            return
 
+        self.query_stats.record(cls.query_type, results, mode)
+        if mode == ResponseMode.FALLBACK:
+            return no_data
         if mode == ResponseMode.DIRECT:
-            if self.is_explanatory_question(msg):
-                careers_list = "\n".join(f"- {r.content}" for r in results)
-                prompt = self.prompts['explanatory_with_new'].format(
-                    careers_list=careers_list, msg=msg
-                )
-                answer = await self._call_llm(prompt, user_hash)
-                if answer:
-                    await self._safe_reply(update, answer)
-                    return
-            response = self.retriever.build_direct_response(results)
-            await self._safe_reply(update, response)
-            return
-
-        try:
-            prompt = self._build_prompt(msg, context_text)
-            answer = await self._call_llm(prompt, user_hash)
-
-            if answer:
-                await self._safe_reply(update, answer)
-                return
+            return Decision(reply=self.retriever.build_direct_response(results), mode=mode)
+
+        # Misma pregunta (parafraseada) con el mismo contexto: se reutiliza la respuesta
+        cache_scope = self.semantic_cache.scope(results)
+        cached = self.semantic_cache.search(question_vector, cache_scope)
+        if cached:
+            return Decision(reply=cached, mode=mode)
+        return Decision(
+            template='main',
+            variables={"context": context_text, "question": msg},
+            fallback=self._db_fallback(results),
+            cache_scope=cache_scope,
+            results=results,
+            mode=mode
+        )
 
-            logger.info(f"Falló IA para usuario {user_hash}, usando fallback directo")
-            fallback_response = (
-                "⚠️ *Servicio de IA temporalmente no disponible*\n\n"
-                f"{escape_md(self.retriever.build_direct_response(results))}\n\n"
-                "_Información obtenida directamente de la base de datos_"
-            )
-            await self._safe_reply(update, fallback_response, parse_mode="Markdown")
+    def _relevant_careers(self, msg: str, results: List[SearchResult]) -> List[SearchResult]:
+        """Carreras de los resultados que menciona la pregunta (o las primeras)"""
+        palabras_pregunta = set(msg.lower().split())
+        if len(palabras_pregunta) < 4:
+            return results
+        filtered = [r for r in results if any(p in r.content.lower() for p in palabras_pregunta)]
+        return filtered or results[:3]
+
+    def _db_fallback(self, results: List[SearchResult]) -> str:
+        return (
+            "⚠️ *Servicio de IA temporalmente no disponible*\n\n"
+            f"{escape_md(self.retriever.build_direct_response(results))}\n\n"
+            "_Información obtenida directamente de la base de datos_"
+        )
 
-        except Exception as e:
-            logger.error("❌ API error: %s", str(e))
-            fallback_response = (
-                "⚠️ *Ocurrió un error inesperado*\n\n"
-                f"{escape_md(self.retriever.build_direct_response(results))}\n\n"
-                "_Información obtenida directamente de la base de datos_"
-            )
-            await self._safe_reply(update, fallback_response, parse_mode="Markdown")
+    def _error_fallback(self, results: List[SearchResult]) -> str:
+        if not results:
+            return "⚠️ *Ocurrió un error inesperado*\n\nPor favor, espera unos minutos antes de volver a intentarlo."
+        return (
+            "⚠️ *Ocurrió un error inesperado*\n\n"
+            f"{escape_md(self.retriever.build_direct_response(results))}\n\n"
+            "_Información obtenida directamente de la base de datos_"
+        )
 
     async def stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         r = self.retriever.stats
+        q = self.query_stats.stats
+        sc = self.semantic_cache.summary()
+        d = self.debouncer.stats
+        o = self.outbound.stats
+        stage_lines = "".join(
+            f"• {name}: {m['avg_ms']:.0f}ms prom. / {m['p95_ms']:.0f}ms p95 / {m['max_ms']:.0f}ms máx.\n"
+            for name, m in self.pipeline_metrics.summary().items()
+        ) or "• Sin mensajes procesados\n"
+        outcomes = ", ".join(f"{k}: {v}" for k, v in sorted(self.pipeline_metrics.outcomes.items()))
+        latency_lines = "".join(
+            f"• {label}: " + " / ".join(f"{h.percentile(q) * 1000:.0f}" for q in (0.5, 0.95, 0.99))
+            + f" ms ({h.count()} muestras)\n"
+            for label, h in (
+                ("Mensaje completo", HANDLER_SECONDS), ("SQL recuperación", RETRIEVAL_SECONDS),
+                ("LLM", LLM_SECONDS), ("Envío a Telegram", TELEGRAM_SEND_SECONDS),
+            )
+        )
         uptime = time.time() - self.start_time
         hours, remainder = divmod(int(uptime), 3600)
         minutes, _ = divmod(remainder, 60)
@@ -429,37 +648,76 @@ y actualmente se dedica al desarrollo de arquitectura (Agentes de IA) para Intel
             f"• Errores: {r['errors']}\n\n"
             f"*Usuarios:*\n"
             f"• Únicos: {len(self.user_stats['users'])}\n"
-            f"• Mensajes: {self.user_stats['messages']}\n\n"
+            f"• Consultas: {self.user_stats['messages']}\n"
+            f"• Mensajes recibidos: {d['messages']} ({d['merged']} unidos en ráfagas, "
+            f"{self.debouncer.calls_saved} ejecuciones ahorradas, ráfaga máx. {d['max_burst']}, "
+            f"{d['immediate']} sin espera)\n\n"
+            f"*Analítica anónima:*\n"
+            f"• Registradas: {q['recorded']} (pendientes: {len(self.query_stats.pending)} buckets)\n"
+            f"• Volcados: {q['flushes']} ({q['rows_flushed']} filas, {q['flush_errors']} errores)\n\n"
+            f"*Respuestas precalculadas:*\n"
+            f"• Cargadas: {len(self.faq.answers)} (invalidadas: {self.faq.stats['invalidated']})\n"
+            f"• Aciertos: {self.faq.stats['hits']} | Sin respuesta: {self.faq.stats['misses']}\n\n"
+            f"*Caché semántica:*\n"
+            f"• Entradas: {sc['size']}/{self.semantic_cache.max_entries} (desalojos: {sc['evictions']})\n"
+            f"• Aciertos: {sc['hits']}/{sc['lookups']} ({sc['hit_rate']:.0%})\n"
+            f"• Latencia: {sc['avg_embed_ms']:.1f}ms embedding + {sc['avg_search_ms']:.2f}ms búsqueda "
+            f"(máx {sc['max_lookup_ms']:.0f}ms)\n\n"
+            f"*Pipeline por etapa:*\n{stage_lines}"
+            f"• Respuestas: {outcomes or '-'}\n\n"
+            f"*Latencias (p50 / p95 / p99):*\n{latency_lines}\n"
+            f"*Cola de salida:*\n"
+            f"• En cola: {self.outbound.depth()} | Enviados: {o['sent']} trozos de {o['enqueued']} mensajes\n"
+            f"• Latencia de envío: {self.outbound.latency_percentile(0.5):.0f}ms p50 / "
+            f"{self.outbound.latency_percentile(0.95):.0f}ms p95 / {o['max_latency_ms']:.0f}ms máx.\n"
+            f"• Flood waits: {o['flood_waits']} | Reintentos: {o['retries']} | Fallidos: {o['failed']} | "
+            f"Descartados: {o['dropped']}\n\n"
             f"*Rate Limit:* {RATE_LIMIT_MAX_REQUESTS} solicitudes por {RATE_LIMIT_WINDOW} segundos",
             parse_mode="Markdown"
         )
 
     async def diagnose(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         r = self.retriever.stats
+        route = self.retriever.router.stats
+        index = self.retriever.spelling
+        if index is None:
+            spelling = "construyendo…" if self.retriever.connected else "no disponible"
+        else:
+            lookups = max(index.stats["lookups"], 1)
+            spelling = (
+                f"{len(index)} palabras, {index.stats['corrections']} correcciones "
+                f"({index.stats['lookup_us'] / lookups:.0f}µs por término)"
+            )
         db_status = "🟢 Conectado" if self.retriever.connected else "🔴 Error"
-        ia_status = "🟢 OK"
+        ia_lines = []
 
         try:
             if self.session is None or self.session.closed:
                 await self.init_session()
-            base_url = INFERENCE_API_URL.rsplit('/', 1)[0]
-            health_url = f"{base_url}/health"
-            async with self.session.get(health_url, timeout=aiohttp.ClientTimeout(total=5)) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    status_msg = data.get("status", "unknown")
-                    queue_load = data.get("queue_load_percent", 0)
-                    ia_status = f"🟢 {status_msg} - {queue_load}% cola"
+            await self.inference.refresh_health(self.session)
+            for replica in self.inference.snapshot():
+                if not replica["ready"]:
+                    icon, state = "🟡", "warmup"
+                elif replica["available"]:
+                    icon, state = "🟢", f"{replica['server_load']} en curso"
                 else:
-                    ia_status = f"🔴 Error HTTP {resp.status}"
+                    icon, state = "🔴", "expulsada"
+                ia_lines.append(
+                    f"• {icon} {replica['url']} - {state} "
+                    f"({replica['requests']} solicitudes, {replica['failures']} fallos)"
+                )
         except Exception as e:
-            ia_status = f"🔴 Sin conexión: {str(e)[:50]}"
+            ia_lines.append(f"🔴 Sin conexión: {str(e)[:50]}")
+        ia_status = "\n" + "\n".join(ia_lines)
 
         await self._safe_reply(
             update,
             "🩺 *Diagnóstico del sistema*\n\n"
             f"*PostgreSQL:* {db_status}\n"
-            f"• Fragmentos: {r['fragments']}\n\n"
+            f"• Fragmentos: {r['fragments']}\n"
+            f"• Ruteo por facultad: {route['routed']} podadas, {route['global']} globales, "
+            f"{route['fallbacks']} reintentos\n"
+            f"• Corrector: {spelling}\n\n"
             f"*Servicio de IA:* {ia_status}\n\n"
             f"*Modo debug:* {'🟢 ON' if DEBUG_MODE else '⚫ OFF'}\n"
             f"*Rate limit:* {RATE_LIMIT_MAX_REQUESTS} solicitudes/{RATE_LIMIT_WINDOW}s\n"
@@ -467,6 +725,15 @@ y actualmente se dedica al desarrollo de arquitectura (Agentes de IA) para Intel
             parse_mode="Markdown"
         )
 
+    async def route(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Muestra qué particiones de facultad consultaría un texto"""
+        text = " ".join(context.args or [])
+        if not text:
+            await self._safe_reply(update, "Uso: /route <consulta>")
+            return
+        decision = self.retriever.router.route(text)
+        await self._safe_reply(update, f"🧭 Particiones: {decision.describe()}")
+
 
 # ==================== MAIN ====================
 
@@ -487,6 +754,13 @@ async def main_async():
             manager.init_session(),
             return_exceptions=True
         )
+        health_task = asyncio.create_task(
+            manager.inference.health_loop(lambda: manager.session, manager.stop_event, INFERENCE_HEALTH_INTERVAL)
+        )
+        stats_task = asyncio.create_task(manager.query_stats.run(manager.stop_event))
+        faq_task = asyncio.create_task(manager.faq.run(manager.stop_event))
+        warmup_task = asyncio.create_task(manager.semantic_cache.warmup())
+        metrics_runner = await start_metrics_server(REGISTRY, METRICS_HOST, METRICS_PORT)
 
         app = Application.builder().token(TOKEN).build()
 
@@ -495,6 +769,7 @@ async def main_async():
         app.add_handler(CommandHandler("stats", manager.stats))
         app.add_handler(CommandHandler("diagnose", manager.diagnose))
         app.add_handler(CommandHandler("about", manager.about))
+        app.add_handler(CommandHandler("route", manager.route))
         app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, manager.handle_message))
 
         logger.info("🤖 Bot YoguI A iniciado correctamente")
@@ -504,8 +779,17 @@ async def main_async():
             await app.initialize()
             await app.start()
             await app.updater.start_polling(drop_pending_updates=True)
+            manager.outbound.start(app.bot)
 
             await manager.stop_event.wait()
+            await health_task
+            await stats_task  # último volcado antes de cerrar el pool
+            await faq_task
+            warmup_task.cancel()
+            await manager.debouncer.close()
+            await manager.outbound.close()  # vaciar respuestas pendientes antes de detener el bot
+            if metrics_runner:
+                await metrics_runner.cleanup()
 
             await app.updater.stop()
             await app.stop()
@@ -0,0 +1,43 @@
+# ./frontend/bot/tracing.py
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Optional
+
+from common.tracing import span_record
+
+from .config import TRACE_ENABLED
+
+# Traza del mensaje en curso; las tareas creadas durante el mensaje la heredan
+current_trace: ContextVar[str] = ContextVar("trace_id", default="")
+
+span_logger = logging.getLogger("unsa_bot.spans")
+
+
+def new_trace() -> Token:
+    """Fija un id de traza nuevo en el contexto actual (token para current_trace.reset)"""
+    return current_trace.set(uuid.uuid4().hex[:16])
+
+
+def emit_span(name: str, start: float, duration_ms: float, trace_id: Optional[str] = None, **attrs):
+    """
+    Registra un span compacto: t=traza, p=proceso, n=nombre, ts=inicio (epoch),
+    ms=duración, más atributos. Sin traza activa no se registra nada.
+    """
+    trace_id = trace_id or current_trace.get()
+    if not TRACE_ENABLED or not trace_id:
+        return
+    span_logger.info(span_record(trace_id, "bot", name, start, duration_ms, **attrs))
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Mide el bloque como span; los atributos pueden completarse dentro (dict mutable)"""
+    start = time.time()
+    began = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        emit_span(name, start, (time.perf_counter() - began) * 1000, **attrs)
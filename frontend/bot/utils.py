@@ -1,6 +1,8 @@
 import re
 import time
 from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from typing import Optional
 
 def anonymize_message(msg: str) -> str:
     """Anonimiza mensajes para logging respetando privacidad"""
@@ -36,3 +38,20 @@ def escape_md(text: str) -> str:
     """Escapa caracteres especiales de Markdown para Telegram"""
     escape_chars = r'([_*[\]()~`>#+\-=|{}.!])'
     return re.sub(escape_chars, r'\\\1', text)
+
+
+def parse_retry_after(value: Optional[str], default: float, cap: float) -> float:
+    """
+    Segundos de un encabezado Retry-After (número o fecha HTTP), entre 0 y `cap`.
+    Si falta o no se puede interpretar, se usa `default`.
+    """
+    if not value:
+        return min(default, cap)
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError):
+            return min(default, cap)
+    return min(max(seconds, 0.0), cap)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark del balanceo entre réplicas de inferencia (sin GPU)
+Levanta N servidores stub locales con latencia y concurrencia fijas y mide
+el throughput del InferencePool del bot con 1..N réplicas.
+
+Uso: python scripts/bench_inference_replicas.py --replicas 4 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("TELEGRAM_TOKEN", "bench")
+
+from frontend.bot.inference_client import InferencePool  # noqa: E402
+
+
+def make_stub_app(latency: float, concurrency: int) -> web.Application:
+    """Servidor stub con el mismo contrato que /generate y /health"""
+    semaphore = asyncio.Semaphore(concurrency)
+    state = {"in_flight": 0}
+
+    async def generate(request):
+        await request.json()
+        state["in_flight"] += 1
+        try:
+            async with semaphore:
+                await asyncio.sleep(latency)
+        finally:
+            state["in_flight"] -= 1
+        return web.json_response({"response": "ok", "tokens_used": 1, "processing_time": latency})
+
+    async def health(request):
+        return web.json_response({"status": "healthy", "concurrent_requests": state["in_flight"]})
+
+    app = web.Application()
+    app.router.add_post("/generate", generate)
+    app.router.add_post("/generate_template", generate)
+    app.router.add_get("/health", health)
+    return app
+
+
+async def start_stubs(count: int, base_port: int, latency: float, concurrency: int):
+    runners = []
+    for i in range(count):
+        runner = web.AppRunner(make_stub_app(latency, concurrency), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", base_port + i).start()
+        runners.append(runner)
+    return runners
+
+
+async def run_load(pool: InferencePool, total: int, users: int, parallel: int) -> float:
+    semaphore = asyncio.Semaphore(parallel)
+    async with aiohttp.ClientSession() as session:
+        async def one(i: int):
+            async with semaphore:
+                async with pool.acquire(f"user{i % users}") as replica:
+                    async with session.post(replica.url("/generate"), json={"prompt": "hola"}) as resp:
+                        await resp.read()
+                        pool.report_success(replica)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start
+
+
+async def main_async(args):
+    runners = await start_stubs(args.replicas, args.port, args.latency, args.concurrency)
+    try:
+        print(f"{'réplicas':>9} {'req/s':>9} {'tiempo':>8}")
+        for n in range(1, args.replicas + 1):
+            urls = [f"http://127.0.0.1:{args.port + i}" for i in range(n)]
+            pool = InferencePool(urls)
+            elapsed = await run_load(pool, args.requests, args.users, args.parallel)
+            print(f"{n:>9} {args.requests / elapsed:>9.1f} {elapsed:>7.2f}s")
+            print("          " + ", ".join(f"{r['url'].rsplit(':', 1)[-1]}={r['requests']}" for r in pool.snapshot()))
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de balanceo entre réplicas de inferencia")
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--parallel", type=int, default=64, help="solicitudes simultáneas del cliente")
+    parser.add_argument("--latency", type=float, default=0.2, help="segundos por solicitud en el stub")
+    parser.add_argument("--concurrency", type=int, default=4, help="slots concurrentes por réplica")
+    parser.add_argument("--port", type=int, default=18000)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
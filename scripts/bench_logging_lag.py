@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark del lag del event loop al loguear con un disco lento
+Compara un FileHandler síncrono (como antes en config.py) contra el pipeline
+QueueHandler + QueueListener de common/log_pipeline.py.
+
+Uso: python scripts/bench_logging_lag.py --disk-delay 0.005 --lines 2000
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from common.log_pipeline import setup_logging, SAMPLED  # noqa: E402
+
+
+class SlowFileHandler(logging.FileHandler):
+    """FileHandler que simula un disco lento (fsync/IO bloqueante)"""
+    def __init__(self, path: Path, delay: float):
+        super().__init__(path, encoding="utf-8")
+        self.delay = delay
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        super().emit(record)
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.01) -> list:
+    """Mide cuánto se atrasa un sleep periódico respecto de lo esperado"""
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append((loop.time() - start - interval) * 1000)
+    return lags
+
+
+async def run_scenario(lines: int, handlers_per_message: int) -> list:
+    logger = logging.getLogger("bench")
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(measure_lag(stop))
+
+    async def handler(i: int):
+        # Simula un handle_message: varias líneas de log entre awaits
+        for _ in range(handlers_per_message):
+            logger.info("📩 Usuario %s: mensaje de prueba %d", f"u{i % 50}", i, extra=SAMPLED)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(handler(i) for i in range(lines // handlers_per_message)))
+    stop.set()
+    return await monitor
+
+
+def report(name: str, lags: list, elapsed: float):
+    lags = sorted(lags) or [0.0]
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{name:<12} tiempo={elapsed:6.2f}s  lag medio={statistics.mean(lags):7.2f}ms  "
+          f"p99={p99:7.2f}ms  máx={lags[-1]:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lag del event loop con logging síncrono vs en cola")
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--per-message", type=int, default=4, help="líneas de log por mensaje simulado")
+    parser.add_argument("--disk-delay", type=float, default=0.002, help="segundos por escritura en disco")
+    parser.add_argument("--json", action="store_true", help="salida JSON estructurada")
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 1. Handler síncrono en el logger raíz
+        root = logging.getLogger()
+        sync_handler = SlowFileHandler(Path(tmp) / "sync.log", args.disk_delay)
+        root.handlers = [sync_handler]
+        root.setLevel(logging.INFO)
+        start = time.perf_counter()
+        lags = asyncio.run(run_scenario(args.lines, args.per_message))
+        report("síncrono", lags, time.perf_counter() - start)
+        sync_handler.close()
+
+        # 2. Pipeline en cola (el hilo listener absorbe la latencia del disco)
+        listener = setup_logging(
+            logging.INFO,
+            handlers=[SlowFileHandler(Path(tmp) / "queue.log", args.disk_delay)],
+            json_format=args.json,
+            sample_rate=args.sample_rate
+        )
+        start = time.perf_counter()
+        lags = asyncio.run(run_scenario(args.lines, args.per_message))
+        report("en cola", lags, time.perf_counter() - start)
+        listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark de recuperación (PostgresRetriever._search) a escala
+Carga el corpus sintético (database/corpus_sintetico.py) en 10k, 100k y 1M
+fragmentos y corre una mezcla fija de consultas por cada estrategia de _search
+(carrera, listado general, término, frecuentes) con y sin poda por facultad.
+Por grupo registra latencia, filas leídas, bloques y el plan de EXPLAIN ANALYZE.
+
+El SQL se toma del retriever real (no hay copias aquí): un cambio en _search o
+en los índices se ve en la próxima corrida. Con --json y --comparar los
+resultados de dos commits quedan lado a lado.
+
+Uso:
+  python scripts/bench_retrieval.py --database-url postgresql://.../unsa_bench
+  python scripts/bench_retrieval.py --database-url ... --filas 10000,100000 --json antes.json
+  python scripts/bench_retrieval.py --database-url ... --json despues.json --comparar antes.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import List
+
+import asyncpg
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "database"))
+os.environ.setdefault("TELEGRAM_TOKEN", "bench")
+os.environ.setdefault("TRACE_ENABLED", "false")
+
+from corpus_sintetico import cargar, contar, generar_consulta  # noqa: E402
+from frontend.bot.retriever import PostgresRetriever  # noqa: E402
+
+# Cubren cada rama de _search además de las consultas generadas con la semilla
+CONSULTAS_FIJAS = [
+    "qué carreras hay", "lista de becas", "cuales carreras existen", "becas disponibles",
+    "cuánto dura la licenciatura en física", "título de ingeniería civil", "carrera de enfermería",
+    "profesorado en historia", "requisitos beca progresar", "certificado de alumno regular",
+    "mesas de examen", "comedor universitario", "inscripción a materias en exactas",
+    "trámites en tartagal", "ok",
+]
+
+NODOS_SCAN = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+
+
+class SqlRecorder:
+    """Conexión que anota el SQL y los parámetros que arma _search"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.calls = []
+
+    async def fetch(self, sql, *params):
+        self.calls.append((sql, params))
+        return await self.conn.fetch(sql, *params)
+
+
+def strategy(terms: List[str], is_carrera: bool, is_general: bool) -> str:
+    """Rama de _search que toma la consulta (mismo orden de decisión)"""
+    if not terms and not is_general:
+        return "frecuentes"
+    if is_general:
+        return "listado"
+    return "carrera" if is_carrera else "termino"
+
+
+def plan_stats(plan: dict) -> dict:
+    """Filas leídas (devueltas + descartadas por filtro), bloques y particiones recorridas"""
+    scanned, relations, nodes = 0, [], []
+
+    def walk(node):
+        nonlocal scanned
+        kind = node.get("Node Type", "")
+        if kind in NODOS_SCAN:
+            loops = node.get("Actual Loops", 1)
+            scanned += (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)
+                        + node.get("Rows Removed by Index Recheck", 0)) * loops
+            relation = node.get("Relation Name", "")
+            relations.append(relation)
+            nodes.append(f"{kind} {node.get('Index Name', relation)}".strip())
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    return {
+        "filas_leidas": scanned,
+        "bloques": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "particiones": len(set(relations)),
+        "plan": " + ".join(sorted(set(nodes))),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def measure_query(conn, retriever: PostgresRetriever, query: str, limit: int, repeats: int) -> List[dict]:
+    """Una medición por ruta: con la poda del router (si detecta facultad) y global"""
+    terms, is_carrera = retriever._clean_query_terms(query)
+    is_general = retriever._is_general_list_query(query)
+    route = retriever.router.route(query)
+    routes = [("facultad", route.faculties)] if route.faculties else []
+    routes.append(("global", None))
+
+    results = []
+    for route_label, faculties in routes:
+        recorder = SqlRecorder(conn)
+        rows = await retriever._search(recorder, terms, is_carrera, is_general, limit, faculties)
+        sql, params = recorder.calls[-1]
+        # Las repeticiones reusan el statement preparado, como las conexiones del pool del bot
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            await conn.fetch(sql, *params)
+            timings.append((time.perf_counter() - start) * 1000)
+        explain = await conn.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", *params)
+        plan = json.loads(explain)[0]
+        result = {
+            "consulta": query, "estrategia": strategy(terms, is_carrera, is_general), "ruta": route_label,
+            "ms": statistics.median(timings), "filas": len(rows), "plan_ms": plan.get("Execution Time", 0.0),
+        }
+        result.update(plan_stats(plan["Plan"]))
+        result["explain"] = plan
+        results.append(result)
+    return results
+
+
+def aggregate(size: int, measurements: List[dict]) -> List[dict]:
+    groups = defaultdict(list)
+    for m in measurements:
+        groups[(m["estrategia"], m["ruta"])].append(m)
+    summary = []
+    for (name, route), group in sorted(groups.items()):
+        times = [m["ms"] for m in group]
+        slowest = max(group, key=lambda m: m["ms"])
+        plans = defaultdict(int)
+        for m in group:
+            plans[m["plan"]] += 1
+        summary.append({
+            "filas_corpus": size, "estrategia": name, "ruta": route, "consultas": len(group),
+            "p50_ms": statistics.median(times), "p95_ms": percentile(times, 0.95), "max_ms": max(times),
+            "filas_leidas": statistics.fmean(m["filas_leidas"] for m in group),
+            "bloques": statistics.fmean(m["bloques"] for m in group),
+            "particiones": max(m["particiones"] for m in group),
+            "plan": max(plans, key=plans.get),
+            "mas_lenta": {"consulta": slowest["consulta"], "ms": slowest["ms"], "explain": slowest["explain"]},
+        })
+    return summary
+
+
+def print_summary(summary: List[dict]):
+    print(f"  {'estrategia':<11} {'ruta':<9} {'n':>4} {'p50':>9} {'p95':>9} {'filas leídas':>13} "
+          f"{'bloques':>8} {'part.':>5}  plan")
+    for g in summary:
+        print(f"  {g['estrategia']:<11} {g['ruta']:<9} {g['consultas']:>4} {g['p50_ms']:>7.1f}ms "
+              f"{g['p95_ms']:>7.1f}ms {g['filas_leidas']:>13,.0f} {g['bloques']:>8,.0f} {g['particiones']:>5}  "
+              f"{g['plan'][:70]}")
+
+
+def print_comparison(current: List[dict], previous_path: Path):
+    """p50 y plan contra otra corrida (mismas filas, estrategia y ruta)"""
+    previous = json.loads(previous_path.read_text(encoding="utf-8"))
+    before = {(g["filas_corpus"], g["estrategia"], g["ruta"]): g for g in previous["grupos"]}
+    print(f"\n⚖️  Contra {previous_path} (commit {previous.get('commit') or '?'})")
+    print(f"  {'filas':>9} {'estrategia':<11} {'ruta':<9} {'antes':>9} {'ahora':>9} {'cambio':>8}")
+    for g in current:
+        old = before.get((g["filas_corpus"], g["estrategia"], g["ruta"]))
+        if not old:
+            continue
+        delta = g["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        plan = "" if old["plan"] == g["plan"] else f"  plan: {old['plan'][:40]} → {g['plan'][:40]}"
+        print(f"  {g['filas_corpus']:>9,} {g['estrategia']:<11} {g['ruta']:<9} {old['p50_ms']:>7.1f}ms "
+              f"{g['p50_ms']:>7.1f}ms {delta:>+7.0%}{plan}")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def main_async(args):
+    sizes = sorted(int(s) for s in args.filas.split(","))
+    rng = random.Random(args.semilla)
+    queries = CONSULTAS_FIJAS + [generar_consulta(rng)[0] for _ in range(args.consultas)]
+    retriever = PostgresRetriever(args.database_url)
+
+    conn = await asyncpg.connect(args.database_url)
+    groups = []
+    try:
+        version = await conn.fetchval("SHOW server_version")
+        print(f"🔬 PostgreSQL {version} | {len(queries)} consultas | {args.repeticiones} repeticiones | "
+              f"semilla {args.semilla}")
+        for size in sizes:
+            loaded = await contar(conn, args.semilla)
+            if loaded != size:
+                start = time.perf_counter()
+                # Misma secuencia para cualquier tamaño: solo se agregan las filas que faltan
+                await cargar(conn, size, args.semilla, desde=loaded if loaded < size else 0)
+                print(f"\n🌱 {size:,} fragmentos sintéticos en {time.perf_counter() - start:.1f}s")
+            total = await conn.fetchval("SELECT COUNT(*) FROM fragmentos_conocimiento")
+            print(f"\n📦 Corpus: {size:,} sintéticos ({total:,} en la tabla)")
+
+            measurements = []
+            for query in queries:
+                measurements += await measure_query(conn, retriever, query, args.limite, args.repeticiones)
+            summary = aggregate(size, measurements)
+            print_summary(summary)
+            groups += summary
+
+        if args.comparar:
+            print_comparison(groups, args.comparar)
+        if args.json:
+            report = {
+                "commit": _git_commit(), "postgres": version,
+                "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()
+                           if k != "database_url"},
+                "grupos": groups,
+            }
+            args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"\n💾 Resultados y planes en {args.json}")
+    finally:
+        if not args.conservar:
+            await conn.execute("DELETE FROM fragmentos_conocimiento WHERE fuente = $1", f"sintetico_{args.semilla}")
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de recuperación sobre el corpus sintético")
+    parser.add_argument("--database-url", required=True,
+                        help="PostgreSQL de pruebas (se le cargan y borran fragmentos sintéticos)")
+    parser.add_argument("--filas", default="10000,100000,1000000", help="tamaños del corpus sintético")
+    parser.add_argument("--semilla", type=int, default=42, help="semilla del corpus y de las consultas")
+    parser.add_argument("--consultas", type=int, default=60, help="consultas generadas además de las fijas")
+    parser.add_argument("--repeticiones", type=int, default=5, help="ejecuciones por consulta (se toma la mediana)")
+    parser.add_argument("--limite", type=int, default=20, help="LIMIT de _search (el del bot)")
+    parser.add_argument("--json", type=Path, help="guardar resultados y planes")
+    parser.add_argument("--comparar", type=Path, help="JSON de otra corrida para comparar")
+    parser.add_argument("--conservar", action="store_true", help="no borrar el corpus sintético al terminar")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args))
+    except (OSError, asyncpg.PostgresError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,7 +20,7 @@ echo "⚡ Iniciando servicios..."
 
 # Servidor de inferencia (en background)
 echo "🤖 Iniciando servidor de inferencia..."
-nohup python3 backend/inference_server.py > logs/inference.log 2>&1 &
+nohup python3 -m backend.inference_server > logs/inference.log 2>&1 &
 INFERENCE_PID=$!
 
 # Bot (en foreground)
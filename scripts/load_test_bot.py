@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de punta a punta del bot (sin Telegram ni GPU)
+Inyecta updates en BotManager.handle_message desde usuarios virtuales en lazo
+cerrado (mandan, esperan la respuesta, vuelven a mandar) contra:
+  - una API de Telegram falsa local (getMe, sendMessage, sendChatAction),
+  - el servidor de inferencia con ENGINE_BACKEND=mock y latencia configurable,
+  - un PostgreSQL local sembrado con el corpus sintético (database/corpus_sintetico.py).
+
+Sube la concurrencia por niveles y reporta throughput, percentiles de latencia
+(inyección → último sendMessage) por ResponseMode y por resultado del pipeline,
+y el punto de saturación. Misma semilla → mismas consultas por usuario y nivel.
+La caché semántica queda desactivada salvo SEMANTIC_CACHE_ENABLED=true en el entorno.
+
+Uso:
+  python scripts/load_test_bot.py --database-url postgresql://.../unsa_loadtest --corpus 100000
+  python scripts/load_test_bot.py --database-url ... --concurrency 1,4,16,64 --duration 30 --json carga.json
+  python scripts/load_test_bot.py --database-url ... --replay frontend/logs/bot_postgres.log
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "database"))
+
+from corpus_sintetico import cargar, contar, generar_consulta  # noqa: E402
+
+TOKEN = "123456:loadtest"
+
+# Chat del usuario virtual que inyectó el update; las tareas del debouncer lo heredan
+virtual_chat: ContextVar[Optional[int]] = ContextVar("virtual_chat", default=None)
+
+
+@dataclass
+class Pending:
+    """Mensaje en vuelo de un usuario virtual"""
+    started: float
+    future: asyncio.Future
+    expected: int = 0            # trozos encolados para este chat
+    received: int = 0            # sendMessage recibidos por la API falsa
+    mode: str = "?"
+    outcome: str = "?"
+
+
+@dataclass
+class Sample:
+    level: int
+    started: float
+    latency_ms: float
+    mode: str
+    outcome: str
+    ok: bool
+
+
+@dataclass
+class LoadState:
+    pending: Dict[int, Pending] = field(default_factory=dict)
+    samples: List[Sample] = field(default_factory=list)
+    sent: int = 0
+    actions: int = 0
+
+
+# ==================== TELEGRAM FALSO ====================
+
+def make_telegram_app(state: LoadState, latency: float) -> web.Application:
+    """Responde lo mínimo que python-telegram-bot necesita para Bot, Message y User"""
+    me = {"id": 1, "is_bot": True, "first_name": "YoguI", "username": "yogui_loadtest_bot",
+          "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+    async def api(request):
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        method = request.match_info["method"]
+        if latency:
+            await asyncio.sleep(latency)
+
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": me})
+        if method == "sendChatAction":
+            state.actions += 1
+            return web.json_response({"ok": True, "result": True})
+        if method == "sendMessage":
+            chat_id = int(params["chat_id"])
+            state.sent += 1
+            pending = state.pending.get(chat_id)
+            if pending:
+                pending.received += 1
+                if pending.expected and pending.received >= pending.expected and not pending.future.done():
+                    pending.future.set_result(time.perf_counter())
+            return web.json_response({"ok": True, "result": {
+                "message_id": state.sent, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": me, "text": params.get("text", ""),
+            }})
+        return web.json_response({"ok": True, "result": True})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api)
+    return app
+
+
+# ==================== SERVIDOR DE INFERENCIA STUB ====================
+
+async def start_inference_stub(args) -> subprocess.Popen:
+    """El servidor real con el motor mock: mismas plantillas, cola y métricas que en producción"""
+    env = dict(os.environ)
+    env.update({
+        "ENGINE_BACKEND": "mock", "PORT": str(args.inference_port), "WARMUP_ENABLED": "false",
+        "MOCK_TTFT": str(args.llm_ttft), "MOCK_TOKENS_PER_SECOND": str(args.llm_tps),
+        "MOCK_OUTPUT_TOKENS": str(args.llm_tokens), "MOCK_MAX_CONCURRENCY": str(args.llm_concurrency),
+    })
+    output = None if args.verbose else subprocess.DEVNULL
+    process = subprocess.Popen([sys.executable, "-m", "backend.inference_server"],
+                               cwd=ROOT, env=env, stdout=output, stderr=output)
+    url = f"http://127.0.0.1:{args.inference_port}/health"
+    async with aiohttp.ClientSession() as session:
+        for _ in range(150):
+            if process.poll() is not None:
+                raise RuntimeError(f"El servidor de inferencia terminó con código {process.returncode}")
+            try:
+                async with session.get(url) as resp:
+                    if resp.status == 200:
+                        return process
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("El servidor de inferencia no respondió /health en 30s")
+
+
+# ==================== TRÁFICO ====================
+
+def load_replay(path: Path) -> List[str]:
+    """Una consulta por línea, o las líneas '📩 Usuario ... (n msj): texto' del log del bot"""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if "📩" in line:
+                _, _, line = line.partition("): ")
+            if line and not line.startswith("#"):
+                queries.append(line)
+    return queries
+
+
+def next_message(rng: random.Random, replay: Optional[List[str]], burst_ratio: float) -> List[str]:
+    """Partes de un mensaje; a veces partido en dos (ejercita el debouncer)"""
+    if replay:
+        text = rng.choice(replay)
+    else:
+        text, _ = generar_consulta(rng)
+    words = text.split()
+    if len(words) >= 4 and rng.random() < burst_ratio:
+        cut = rng.randint(1, len(words) - 1)
+        return [" ".join(words[:cut]), " ".join(words[cut:])]
+    return [text]
+
+
+def make_update(user_id: int, text: str):
+    """Lo que handle_message y el pipeline leen de un Update"""
+    return SimpleNamespace(
+        message=SimpleNamespace(text=text),
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=user_id),
+    )
+
+
+async def wait_chat_idle(manager, chat_id: int, timeout: float):
+    """Tras un timeout, espera a que la respuesta tardía salga para no atribuirla al próximo mensaje"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and (
+        chat_id in manager.debouncer.bursts or chat_id in manager.debouncer.running
+        or chat_id in manager.outbound.chat_queues
+    ):
+        await asyncio.sleep(0.05)
+
+
+async def virtual_user(manager, bot, state: LoadState, args, level: int, index: int,
+                       replay: Optional[List[str]], until: float):
+    rng = random.Random(f"{args.seed}-{level}-{index}")
+    user_id = 10_000_000 + index
+    context = SimpleNamespace(bot=bot, args=[])
+    loop = asyncio.get_running_loop()
+
+    while time.perf_counter() < until:
+        parts = next_message(rng, replay, args.burst_ratio)
+        pending = state.pending[user_id] = Pending(time.perf_counter(), loop.create_future())
+        token = virtual_chat.set(user_id)
+        try:
+            for i, part in enumerate(parts):
+                if i:
+                    await asyncio.sleep(args.burst_gap)
+                await manager.handle_message(make_update(user_id, part), context)
+        finally:
+            virtual_chat.reset(token)
+
+        try:
+            finished = await asyncio.wait_for(asyncio.shield(pending.future), timeout=args.timeout)
+            ok = True
+        except asyncio.TimeoutError:
+            finished, ok = time.perf_counter(), False
+        state.samples.append(Sample(level, pending.started, (finished - pending.started) * 1000,
+                                    pending.mode, pending.outcome, ok))
+        del state.pending[user_id]
+        if not ok:
+            await wait_chat_idle(manager, user_id, args.timeout)
+        if args.think_time:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+def instrument(manager, state: LoadState):
+    """
+    Engancha el bot sin modificarlo: cuenta los trozos encolados por chat y toma
+    el modo y el resultado que el pipeline registra al terminar cada mensaje.
+    """
+    from frontend.bot.metrics import HANDLER_SECONDS
+    from frontend.bot.outbound import split_message
+
+    enqueue = manager.outbound.enqueue
+
+    def counting_enqueue(chat_id, text, parse_mode=None):
+        pending = state.pending.get(chat_id)
+        if pending:
+            pending.expected += len(split_message(text))
+        return enqueue(chat_id, text, parse_mode)
+
+    observe_outcome = manager.pipeline_metrics.observe
+
+    def record_outcome(timer, outcome):
+        pending = state.pending.get(virtual_chat.get())
+        if pending:
+            pending.outcome = outcome
+        return observe_outcome(timer, outcome)
+
+    observe_handler = HANDLER_SECONDS.observe
+
+    def record_mode(seconds, **labels):
+        pending = state.pending.get(virtual_chat.get())
+        if pending:
+            pending.mode = labels.get("mode", "?")
+        return observe_handler(seconds, **labels)
+
+    manager.outbound.enqueue = counting_enqueue
+    manager.pipeline_metrics.observe = record_outcome
+    HANDLER_SECONDS.observe = record_mode
+
+
+# ==================== REPORTE ====================
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(samples: List[Sample], duration: float) -> dict:
+    ok = [s.latency_ms for s in samples if s.ok]
+    return {
+        "mensajes": len(samples),
+        "errores": sum(1 for s in samples if not s.ok),
+        "msj_s": len(ok) / duration if duration else 0.0,
+        "p50_ms": percentile(ok, 0.50),
+        "p95_ms": percentile(ok, 0.95),
+        "p99_ms": percentile(ok, 0.99),
+        "media_ms": statistics.fmean(ok) if ok else 0.0,
+    }
+
+
+def breakdown(samples: List[Sample], key: str) -> Dict[str, dict]:
+    groups = defaultdict(list)
+    for s in samples:
+        groups[getattr(s, key)].append(s)
+    return {name: summarize(group, 0) for name, group in sorted(groups.items())}
+
+
+def find_saturation(levels: List[dict], slo_ms: float, min_gain: float) -> Optional[dict]:
+    """Primer nivel donde duplicar usuarios ya casi no suma throughput o el p95 pasa el SLO"""
+    for previous, current in zip(levels, levels[1:]):
+        gain = current["msj_s"] / previous["msj_s"] - 1 if previous["msj_s"] else 0.0
+        if gain < min_gain:
+            return {"concurrencia": current["concurrencia"], "motivo": f"throughput +{gain:.0%}",
+                    "msj_s_max": max(previous["msj_s"], current["msj_s"])}
+        if slo_ms and current["p95_ms"] > slo_ms:
+            return {"concurrencia": current["concurrencia"], "motivo": f"p95 {current['p95_ms']:.0f}ms > SLO",
+                    "msj_s_max": previous["msj_s"]}
+    return None
+
+
+def print_groups(title: str, groups: Dict[str, dict]):
+    print(f"    {title}")
+    for name, g in groups.items():
+        print(f"      {name:<12} {g['mensajes']:>6} {g['p50_ms']:>8.0f}ms {g['p95_ms']:>7.0f}ms "
+              f"{g['p99_ms']:>7.0f}ms  errores={g['errores']}")
+
+
+# ==================== MAIN ====================
+
+def configure_env(args):
+    """La configuración del bot se lee al importar: se fija antes de importarlo"""
+    os.environ["TELEGRAM_TOKEN"] = TOKEN
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["INFERENCE_API_URLS"] = args.inference_url or f"http://127.0.0.1:{args.inference_port}"
+    os.environ["RATE_LIMIT_MAX_REQUESTS"] = str(10 ** 9)
+    os.environ["METRICS_PORT"] = "0"
+    if not args.telegram_limits:
+        # Sin los límites de Telegram se mide el bot; con ellos, lo que verían los usuarios
+        os.environ["OUTBOUND_GLOBAL_RATE"] = "100000"
+        os.environ["OUTBOUND_CHAT_RATE"] = "100000"
+    os.environ["TRACE_ENABLED"] = "true" if args.trace else "false"
+    os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "false")
+    if args.debounce is not None:
+        os.environ["DEBOUNCE_WINDOW"] = str(args.debounce)
+
+
+async def seed_corpus(args):
+    import asyncpg
+
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        if await contar(conn, args.seed) != args.corpus:
+            start = time.perf_counter()
+            rows = await cargar(conn, args.corpus, args.seed)
+            print(f"🌱 Corpus sintético: {rows} fragmentos (semilla {args.seed}) en {time.perf_counter() - start:.1f}s")
+        else:
+            print(f"🌱 Corpus sintético ya cargado: {args.corpus} fragmentos (semilla {args.seed})")
+    finally:
+        await conn.close()
+
+
+async def main_async(args):
+    configure_env(args)
+    import logging
+    from telegram import Bot
+    from telegram.request import HTTPXRequest
+    from frontend.bot.config import logger
+    from frontend.bot.retriever import PostgresRetriever
+    from frontend.bot.telegram.telegram_bot_postgres import BotManager, load_prompts
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+    if args.corpus:
+        await seed_corpus(args)
+
+    replay = load_replay(args.replay) if args.replay else None
+    levels = [int(c) for c in args.concurrency.split(",")]
+    state = LoadState()
+
+    stub = None if args.inference_url else await start_inference_stub(args)
+    runner = web.AppRunner(make_telegram_app(state, args.telegram_latency), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.telegram_port).start()
+    bot = Bot(TOKEN, base_url=f"http://127.0.0.1:{args.telegram_port}/bot",
+              request=HTTPXRequest(connection_pool_size=max(levels) + 16))
+    manager = None
+    tasks = []
+    try:
+        await bot.initialize()
+        manager = BotManager(PostgresRetriever(args.database_url), prompts=load_prompts())
+        await manager.init_session()
+        if not await manager.retriever.connect():
+            raise RuntimeError("No se pudo conectar a PostgreSQL")
+        tasks = [
+            asyncio.create_task(manager.inference.health_loop(lambda: manager.session, manager.stop_event, 5)),
+            asyncio.create_task(manager.query_stats.run(manager.stop_event)),
+            asyncio.create_task(manager.faq.run(manager.stop_event)),
+        ]
+        manager.outbound.start(bot)
+        instrument(manager, state)
+
+        source = f"replay {args.replay} ({len(replay)} consultas)" if replay else "consultas sintéticas"
+        print(f"🚦 {source} | semilla {args.seed} | niveles {levels} | "
+              f"{args.warmup:.0f}s calentamiento + {args.duration:.0f}s por nivel")
+        print(f"{'usuarios':>8} {'msj/s':>8} {'p50':>9} {'p95':>8} {'p99':>8} {'mensajes':>9} {'errores':>8}")
+
+        results = []
+        for level in levels:
+            state.samples = []
+            start = time.perf_counter()
+            measure_from = start + args.warmup
+            until = measure_from + args.duration
+            await asyncio.gather(*(
+                virtual_user(manager, bot, state, args, level, i, replay, until) for i in range(level)
+            ))
+            measured = [s for s in state.samples if s.started >= measure_from]
+            summary = summarize(measured, args.duration)
+            summary.update(concurrencia=level, por_modo=breakdown(measured, "mode"),
+                           por_resultado=breakdown(measured, "outcome"))
+            results.append(summary)
+            print(f"{level:>8} {summary['msj_s']:>8.1f} {summary['p50_ms']:>7.0f}ms {summary['p95_ms']:>6.0f}ms "
+                  f"{summary['p99_ms']:>6.0f}ms {summary['mensajes']:>9} {summary['errores']:>8}")
+            if args.details:
+                print_groups("por ResponseMode", summary["por_modo"])
+                print_groups("por resultado", summary["por_resultado"])
+
+        saturation = find_saturation(results, args.slo, args.min_gain)
+        if saturation:
+            print(f"\n📉 Saturación con {saturation['concurrencia']} usuarios ({saturation['motivo']}); "
+                  f"máximo sostenido ≈ {saturation['msj_s_max']:.1f} msj/s")
+        else:
+            print("\n📈 Sin saturación en los niveles probados: subir --concurrency")
+
+        if args.json:
+            report = {"config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+                      "commit": _git_commit(), "niveles": results, "saturacion": saturation}
+            args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"💾 Resultados en {args.json}")
+    finally:
+        if manager:
+            manager.stop_event.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await manager.debouncer.close()
+            await manager.outbound.close(timeout=5)
+            await manager.close_resources()
+        await bot.shutdown()
+        await runner.cleanup()
+        if stub:
+            stub.terminate()
+            stub.wait(timeout=10)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de punta a punta del bot")
+    parser.add_argument("--database-url", required=True,
+                        help="PostgreSQL de pruebas (se le cargan fragmentos sintéticos con --corpus)")
+    parser.add_argument("--corpus", type=int, default=0, help="fragmentos sintéticos a sembrar (0 = no sembrar)")
+    parser.add_argument("--seed", type=int, default=42, help="semilla del corpus y de las consultas")
+    parser.add_argument("--replay", type=Path, help="consultas anonimizadas (una por línea o log del bot)")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32,64", help="usuarios virtuales por nivel")
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos medidos por nivel")
+    parser.add_argument("--warmup", type=float, default=5.0, help="segundos descartados al inicio de cada nivel")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pausa media entre mensajes de un usuario (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="segundos máximos de espera por respuesta")
+    parser.add_argument("--burst-ratio", type=float, default=0.1, help="fracción de mensajes enviados en dos partes")
+    parser.add_argument("--burst-gap", type=float, default=0.3, help="segundos entre las partes de una ráfaga")
+    parser.add_argument("--debounce", type=float, help="DEBOUNCE_WINDOW del bot (por defecto, el de la config)")
+    parser.add_argument("--telegram-limits", action="store_true",
+                        help="respetar OUTBOUND_GLOBAL_RATE/OUTBOUND_CHAT_RATE de la config (~30 y 1 msj/s)")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="latencia de la API falsa (s)")
+    parser.add_argument("--telegram-port", type=int, default=18443)
+    parser.add_argument("--inference-url", help="usar un servidor de inferencia ya levantado")
+    parser.add_argument("--inference-port", type=int, default=18100)
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="MOCK_TTFT del stub (s)")
+    parser.add_argument("--llm-tps", type=float, default=30.0, help="MOCK_TOKENS_PER_SECOND del stub")
+    parser.add_argument("--llm-tokens", type=int, default=120, help="MOCK_OUTPUT_TOKENS del stub")
+    parser.add_argument("--llm-concurrency", type=int, default=32, help="MOCK_MAX_CONCURRENCY del stub")
+    parser.add_argument("--slo", type=float, default=0.0, help="p95 máximo aceptable en ms (0 = sin SLO)")
+    parser.add_argument("--min-gain", type=float, default=0.10, help="ganancia mínima de throughput por nivel")
+    parser.add_argument("--details", action="store_true", help="desglose por ResponseMode y resultado")
+    parser.add_argument("--json", type=Path, help="guardar resultados (comparables entre commits)")
+    parser.add_argument("--trace", action="store_true", help="registrar spans (frontend/logs/spans.jsonl)")
+    parser.add_argument("--verbose", action="store_true", help="logs del bot y del servidor de inferencia")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -29,7 +29,7 @@ async def main():
         print("✅ Esquema creado")
 
         # Aplicar índices
-        with open("database/schema/indexes.sql", "r") as f:
+        with open("database/schema/02_indexes.sql", "r") as f:
             sql = f.read()
 
         await conn.execute(sql)
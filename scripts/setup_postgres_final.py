@@ -92,7 +92,7 @@ async def setup_postgres():
         print("=" * 60)
         print("\n📋 Próximos pasos:")
         print("1. Iniciar servidor de inferencia:")
-        print("   python3 backend/inference_server.py")
+        print("   python3 -m backend.inference_server")
         print("\n2. Iniciar bot escalable:")
         print("   python3 frontend/telegram_bot_scalable.py")
 
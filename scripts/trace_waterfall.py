@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Une los spans del bot (frontend/logs/spans.jsonl) y del servidor de inferencia
+(backend/logs/spans.jsonl) por id de traza y muestra la cascada de cada mensaje:
+espera de la ráfaga, etapas del pipeline, SQL, cola del servidor, prefill,
+decode y envío a Telegram.
+
+Uso:
+  python scripts/trace_waterfall.py                      # las 10 trazas más lentas
+  python scripts/trace_waterfall.py --trace 3f2a9c0d1e4b5a67
+  python scripts/trace_waterfall.py --min-ms 3000 --top 50
+  python scripts/trace_waterfall.py --summary            # tiempo por span agregado
+"""
+import argparse
+import json
+import statistics
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_FILES = [ROOT / "frontend" / "logs" / "spans.jsonl", ROOT / "backend" / "logs" / "spans.jsonl"]
+BAR_WIDTH = 40
+
+
+def load_spans(paths: List[Path]) -> Dict[str, List[dict]]:
+    traces = defaultdict(list)
+    for path in paths:
+        if not path.exists():
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                if "t" in span and "ts" in span:
+                    traces[span["t"]].append(span)
+    return traces
+
+
+def trace_bounds(spans: List[dict]):
+    start = min(s["ts"] for s in spans)
+    end = max(s["ts"] + s["ms"] / 1000 for s in spans)
+    return start, (end - start) * 1000
+
+
+def print_waterfall(trace_id: str, spans: List[dict]):
+    start, total = trace_bounds(spans)
+    root = next((s for s in spans if s["n"] == "mensaje"), {})
+    print(f"\n🧵 {trace_id}  {total:.0f}ms  {root.get('route', '')} → {root.get('outcome', '')}")
+    scale = BAR_WIDTH / max(total, 1)
+    for s in sorted(spans, key=lambda s: (s["ts"], -s["ms"])):
+        offset = (s["ts"] - start) * 1000
+        lead = int(offset * scale)
+        bar = " " * lead + "█" * max(1, int(s["ms"] * scale))
+        extra = {k: v for k, v in s.items() if k not in ("t", "p", "n", "ts", "ms")}
+        details = " ".join(f"{k}={v}" for k, v in extra.items())
+        print(f"  {s['p'][:10]:<10} {s['n']:<10} +{offset:7.0f}ms {s['ms']:8.1f}ms |{bar:<{BAR_WIDTH}}| {details}")
+
+
+def print_summary(traces: Dict[str, List[dict]]):
+    """Duración por (proceso, span) sobre todas las trazas: dónde se va el tiempo"""
+    durations = defaultdict(list)
+    for spans in traces.values():
+        for s in spans:
+            durations[(s["p"], s["n"])].append(s["ms"])
+    print(f"{'proceso':<10} {'span':<10} {'n':>6} {'p50':>9} {'p95':>9} {'máx':>9}")
+    for (process, name), values in sorted(durations.items(), key=lambda kv: -statistics.median(kv[1])):
+        values.sort()
+        p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+        print(f"{process:<10} {name:<10} {len(values):>6} {statistics.median(values):>8.1f}ms "
+              f"{p95:>7.1f}ms {values[-1]:>7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascada de spans por mensaje (bot + inferencia)")
+    parser.add_argument("files", nargs="*", type=Path, default=DEFAULT_FILES, help="archivos spans.jsonl")
+    parser.add_argument("--trace", help="id de traza (o prefijo)")
+    parser.add_argument("--top", type=int, default=10, help="cantidad de trazas más lentas a mostrar")
+    parser.add_argument("--min-ms", type=float, default=0, help="solo trazas de al menos esta duración")
+    parser.add_argument("--summary", action="store_true", help="percentiles por span en lugar de cascadas")
+    args = parser.parse_args()
+
+    traces = load_spans(args.files)
+    if not traces:
+        print("No se encontraron spans en:", ", ".join(str(p) for p in args.files))
+        return
+
+    if args.trace:
+        traces = {t: s for t, s in traces.items() if t.startswith(args.trace)}
+    if args.summary:
+        print_summary(traces)
+        return
+
+    ranked = sorted(traces.items(), key=lambda kv: trace_bounds(kv[1])[1], reverse=True)
+    ranked = [(t, s) for t, s in ranked if trace_bounds(s)[1] >= args.min_ms]
+    for trace_id, spans in ranked[:args.top]:
+        print_waterfall(trace_id, spans)
+    print(f"\n{len(ranked)} trazas (de {len(traces)}) | mostradas: {min(len(ranked), args.top)}")
+
+
+if __name__ == "__main__":
+    main()